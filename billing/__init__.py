@@ -0,0 +1,14 @@
+"""
+Billing module for the Bible API.
+
+This module provides the durable queue that processes Stripe webhook
+events in the background, the handlers that turn those events into API
+key activations and deactivations, and the metering of requests per
+API key.
+"""
+
+from .events import EVENT_HANDLERS, handle_event
+from .queue import WebhookQueue
+from .usage import UsageMeter
+
+__all__ = ['EVENT_HANDLERS', 'UsageMeter', 'WebhookQueue', 'handle_event']
@@ -0,0 +1,56 @@
+"""
+Handlers for Stripe events.
+
+Each handler applies one event to the database in the caller's session
+and must give the same result when an event is applied twice: Stripe
+delivers events at least once, and the queue retries an event whose
+handler failed.
+"""
+
+import uuid
+from typing import Any, Callable, Dict
+
+ACTIVATING_EVENTS = ("checkout.session.completed",)
+DEACTIVATING_EVENTS = ("invoice.payment_failed", "customer.subscription.deleted")
+
+
+def _email(event: Dict[str, Any]):
+    return event["data"]["object"].get("customer_email")
+
+
+def activate_key(session, event: Dict[str, Any]) -> None:
+    """Give the customer an active API key, reactivating an existing one."""
+    from models import APIKey
+    email = _email(event)
+    if not email:
+        return
+    key = session.query(APIKey).filter_by(user_email=email).first()
+    if key is None:
+        session.add(APIKey(user_email=email, api_key=str(uuid.uuid4()), active=True))
+        # TODO: Stuur API-key per e-mail naar gebruiker
+    else:
+        key.active = True
+
+
+def deactivate_key(session, event: Dict[str, Any]) -> None:
+    """Deactivate the customer's API key, if there is one."""
+    from models import APIKey
+    email = _email(event)
+    if not email:
+        return
+    key = session.query(APIKey).filter_by(user_email=email).first()
+    if key is not None:
+        key.active = False
+
+
+EVENT_HANDLERS: Dict[str, Callable[[Any, Dict[str, Any]], None]] = {
+    **{event_type: activate_key for event_type in ACTIVATING_EVENTS},
+    **{event_type: deactivate_key for event_type in DEACTIVATING_EVENTS},
+}
+
+
+def handle_event(session, event: Dict[str, Any]) -> None:
+    """Apply an event with its handler; other event types are ignored."""
+    handler = EVENT_HANDLERS.get(event.get("type"))
+    if handler is not None:
+        handler(session, event)
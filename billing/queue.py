@@ -0,0 +1,194 @@
+"""
+Durable queue for Stripe webhook events.
+
+The webhook only verifies the signature and stores the event in the
+``webhook_events`` table, so Stripe gets its acknowledgement at once.
+The unique event ID makes a redelivered event a no-op. A background
+worker claims due events in batches, applies them with
+``billing.events.handle_event`` and commits the batch in one
+transaction. If the batch fails, its events are retried one by one so a
+single bad event cannot hold up the others; a failing event is retried
+with exponential backoff and marked failed after ``max_attempts``.
+
+Claims expire, so events held by a worker that died are picked up
+again, and several server processes can share the queue.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from .events import handle_event
+
+# Seconds a claimed batch stays reserved for its worker
+CLAIM_TIMEOUT = 300
+# Backoff after the first failure, doubling per attempt up to MAX_BACKOFF
+BACKOFF = 5.0
+MAX_BACKOFF = 3600.0
+
+
+class WebhookQueue:
+    """Stores webhook events and processes them in a background thread."""
+
+    def __init__(self, session_factory: Callable[[], Any],
+                 handler: Callable[[Any, Dict[str, Any]], None] = handle_event,
+                 batch_size: int = 50, max_attempts: int = 8, poll_interval: float = 5.0):
+        """
+        Initialize a queue; the worker starts with ``start``.
+
+        Args:
+            session_factory: Returns a new SQLAlchemy session
+            handler: Applies one event in a session
+            batch_size: Events claimed and committed together
+            max_attempts: Attempts before an event is marked failed
+            poll_interval: Seconds between checks for due retries
+        """
+        self.session_factory = session_factory
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, event_id: str, event_type: str, payload: str) -> bool:
+        """
+        Store an event for processing.
+
+        Args:
+            event_id: Stripe event ID
+            event_type: Stripe event type
+            payload: Event JSON as received
+
+        Returns:
+            False if the event was already stored (a redelivery)
+        """
+        from sqlalchemy.exc import IntegrityError
+        from models import WebhookEvent
+        session = self.session_factory()
+        try:
+            session.add(WebhookEvent(event_id=event_id, type=event_type, payload=payload,
+                                     created_at=time.time()))
+            session.commit()
+        except IntegrityError:
+            session.rollback()
+            return False
+        finally:
+            session.close()
+        self._wake.set()
+        return True
+
+    def _claim(self, session, now: float) -> List[Any]:
+        from sqlalchemy import and_, or_, select, update
+        from models import WebhookEvent
+        due = or_(
+            and_(WebhookEvent.status == "pending", WebhookEvent.next_attempt_at <= now),
+            and_(WebhookEvent.status == "processing", WebhookEvent.locked_until < now),
+        )
+        ids = session.execute(
+            select(WebhookEvent.id).where(due).order_by(WebhookEvent.id).limit(self.batch_size)
+        ).scalars().all()
+        if not ids:
+            return []
+        # The condition is checked again on update, so two workers never claim the same event
+        token = uuid.uuid4().hex
+        session.execute(
+            update(WebhookEvent).where(WebhookEvent.id.in_(ids), due)
+            .values(status="processing", worker=token, locked_until=now + CLAIM_TIMEOUT)
+        )
+        session.commit()
+        return session.query(WebhookEvent).filter_by(worker=token, status="processing") \
+            .order_by(WebhookEvent.id).all()
+
+    def _apply(self, session, job) -> None:
+        self.handler(session, json.loads(job.payload))
+        job.status = "done"
+        job.attempts += 1
+        job.worker = None
+        job.last_error = None
+
+    def _fail(self, job, error: Exception, now: float) -> None:
+        job.attempts += 1
+        job.worker = None
+        job.last_error = repr(error)[:1000]
+        if job.attempts >= self.max_attempts:
+            job.status = "failed"
+            logging.error(f"Webhook event {job.event_id} failed after {job.attempts} attempts: {error!r}")
+        else:
+            job.status = "pending"
+            job.next_attempt_at = now + min(BACKOFF * 2 ** (job.attempts - 1), MAX_BACKOFF)
+            logging.warning(f"Webhook event {job.event_id} failed, retrying: {error!r}")
+
+    def run_once(self, now: Optional[float] = None) -> int:
+        """
+        Claim and process one batch of due events.
+
+        Returns:
+            Number of events claimed
+        """
+        now = time.time() if now is None else now
+        session = self.session_factory()
+        try:
+            jobs = self._claim(session, now)
+            if not jobs:
+                return 0
+            ids = [job.id for job in jobs]
+            try:
+                for job in jobs:
+                    self._apply(session, job)
+                session.commit()
+                return len(jobs)
+            except Exception:
+                session.rollback()
+            # Retry one by one so only the failing events are delayed
+            from models import WebhookEvent
+            for job_id in ids:
+                job = session.get(WebhookEvent, job_id)
+                try:
+                    self._apply(session, job)
+                    session.commit()
+                except Exception as e:
+                    session.rollback()
+                    job = session.get(WebhookEvent, job_id)
+                    self._fail(job, e, now)
+                    session.commit()
+            return len(ids)
+        finally:
+            session.close()
+
+    def notify(self) -> None:
+        """Wake the worker, e.g. after another process enqueued events."""
+        self._wake.set()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                logging.error(f"Webhook worker error: {e!r}")
+                claimed = 0
+            if claimed < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self) -> None:
+        """Start the background worker once."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._work, name="webhook-worker", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background worker after its current batch."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
@@ -0,0 +1,154 @@
+"""
+Usage metering per API key.
+
+Counting a request must not cost a database write, so requests are
+counted in memory per (API key, endpoint, day). A background thread
+flushes the counters every few seconds in one batched upsert into the
+``api_usage`` table, adding to the stored counts. Reads combine the
+stored counts with the ones not flushed yet.
+"""
+
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# (API key, endpoint, day)
+UsageKey = Tuple[str, str, str]
+
+
+def today() -> str:
+    """Current UTC date, the granularity of the usage table."""
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+class UsageMeter:
+    """In-memory request counters with periodic batched flushes."""
+
+    def __init__(self, session_factory: Callable[[], Any], flush_interval: float = 10.0):
+        """
+        Initialize a meter; the flush thread starts with the first request.
+
+        Args:
+            session_factory: Returns a new SQLAlchemy session
+            flush_interval: Seconds between flushes
+        """
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, api_key: str, endpoint: str, day: Optional[str] = None) -> None:
+        """Count one request."""
+        key = (api_key, endpoint, day or today())
+        with self._lock:
+            self._counts[key] += 1
+        if self._thread is None:
+            self.start()
+
+    def pending(self, api_key: Optional[str] = None) -> Dict[UsageKey, int]:
+        """Counts not flushed yet, for one key or all."""
+        with self._lock:
+            return {key: count for key, count in self._counts.items() if api_key is None or key[0] == api_key}
+
+    def flush(self) -> int:
+        """
+        Add the counted requests to the usage table in one batched upsert.
+
+        On failure the counts are kept for the next flush.
+
+        Returns:
+            Number of rows written
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, Counter()
+            if not counts:
+                return 0
+            from sqlalchemy.dialects.sqlite import insert
+            from models import APIUsage
+            rows = [{"api_key": api_key, "endpoint": endpoint, "day": day, "count": count}
+                    for (api_key, endpoint, day), count in counts.items()]
+            statement = insert(APIUsage)
+            statement = statement.on_conflict_do_update(
+                index_elements=["api_key", "endpoint", "day"],
+                set_={"count": APIUsage.count + statement.excluded.count},
+            )
+            session = None
+            try:
+                session = self.session_factory()
+                session.execute(statement, rows)
+                session.commit()
+            except Exception:
+                if session is not None:
+                    session.rollback()
+                with self._lock:
+                    self._counts.update(counts)
+                raise
+            finally:
+                if session is not None:
+                    session.close()
+            return len(rows)
+
+    def usage(self, api_key: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Request counts of one API key per endpoint and day, flushed or not.
+
+        Args:
+            api_key: The key to report on
+            since: First day to include (ISO date); None for all
+
+        Returns:
+            {"endpoint", "day", "count"} entries, newest day first
+        """
+        from models import APIUsage
+        totals: Counter = Counter()
+        # Not during a flush, which would have the same requests in both places
+        with self._flush_lock:
+            session = self.session_factory()
+            try:
+                query = session.query(APIUsage).filter(APIUsage.api_key == api_key)
+                if since:
+                    query = query.filter(APIUsage.day >= since)
+                for row in query:
+                    totals[(row.endpoint, row.day)] += row.count
+            finally:
+                session.close()
+            pending = self.pending(api_key)
+        for (_, endpoint, day), count in pending.items():
+            if not since or day >= since:
+                totals[(endpoint, day)] += count
+        entries = [{"endpoint": endpoint, "day": day, "count": count} for (endpoint, day), count in totals.items()]
+        entries.sort(key=lambda entry: (entry["day"], entry["endpoint"]))
+        entries.sort(key=lambda entry: entry["day"], reverse=True)
+        return entries
+
+    def _work(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Usage flush failed: {e!r}")
+
+    def start(self) -> None:
+        """Start the flush thread once."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._work, name="usage-flush", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and flush what is left."""
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+        try:
+            self.flush()
+        except Exception as e:
+            logging.error(f"Usage flush failed: {e!r}")
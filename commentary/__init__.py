@@ -0,0 +1,11 @@
+"""
+Commentary module for the Bible API.
+
+Commentaries (e.g. Matthew Henry) are stored on disk in an indexed
+format so that a single verse can be read without loading the whole
+commentary into memory.
+"""
+
+from .store import CommentaryLibrary, CommentaryStore, build_store
+
+__all__ = ['CommentaryLibrary', 'CommentaryStore', 'build_store']
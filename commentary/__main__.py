@@ -0,0 +1,20 @@
+"""
+Build a commentary store from the command line.
+
+Usage: python -m commentary <json_file> <source> [--directory data/commentary]
+"""
+
+import argparse
+import os
+
+from .store import build_store_from_json
+
+arg_parser = argparse.ArgumentParser(description="Build a commentary store from nested JSON.")
+arg_parser.add_argument("json_file", help="{book: {chapter: {verse: text}}} commentary")
+arg_parser.add_argument("source", help="Source name, e.g. matthew-henry")
+arg_parser.add_argument("--directory", default=os.path.join("data", "commentary"))
+args = arg_parser.parse_args()
+
+os.makedirs(args.directory, exist_ok=True)
+count = build_store_from_json(args.json_file, os.path.join(args.directory, args.source))
+print(f"Wrote {count} entries for '{args.source}' to {args.directory}")
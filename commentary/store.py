@@ -0,0 +1,198 @@
+"""
+On-disk commentary store with an offset table.
+
+A commentary source is stored as two files next to each other:
+
+- ``<source>.dat``: the commentary texts, UTF-8, back to back
+- ``<source>.idx``: a header line with the book names of the source by
+  canonical book number, followed by fixed-size records (verse ID,
+  offset, length) sorted by verse ID
+
+Entries use the packed verse IDs from ``corpus.versification`` (verse 0
+holds the introduction of a chapter). Only the offset table is kept in
+memory; reading the commentary on a verse is one seek and one read.
+"""
+
+import json
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from corpus.books import BOOKS, book_number_from_name
+from corpus.versification import split_verse_id, verse_id
+
+MAGIC = b"SCRIPTURA-COMMENTARY 1\n"
+RECORD = struct.Struct("<qQI")
+
+
+def build_store(entries: Iterable[Tuple[int, int, int, str]], book_names: List[Optional[str]], path: str) -> int:
+    """
+    Write a commentary store.
+
+    Args:
+        entries: (book number, chapter, verse, text) tuples; verse 0 is
+            the introduction of a chapter
+        book_names: Book names used by the source, in canonical order;
+            None for books it does not cover
+        path: Path without extension; ``.dat`` and ``.idx`` are written
+
+    Returns:
+        Number of entries written
+    """
+    records = []
+    offset = 0
+    with open(path + ".dat", "wb") as dat:
+        for book, chapter, verse, text in entries:
+            encoded = text.encode("utf-8")
+            dat.write(encoded)
+            records.append((verse_id(book, chapter, verse), offset, len(encoded)))
+            offset += len(encoded)
+    records.sort()
+    with open(path + ".idx", "wb") as idx:
+        idx.write(MAGIC)
+        idx.write(json.dumps(book_names, ensure_ascii=False).encode("utf-8") + b"\n")
+        for record in records:
+            idx.write(RECORD.pack(*record))
+    return len(records)
+
+
+def build_store_from_json(source_path: str, path: str) -> int:
+    """
+    Convert a nested ``{book: {chapter: {verse: text}}}`` JSON commentary.
+
+    Books get their canonical number from their name (English or
+    Statenvertaling, see ``corpus.books``), so a source may cover some
+    books only, in any order.
+
+    Raises:
+        ValueError: If a book name is unknown or two names are the same book
+    """
+    with open(source_path, encoding="utf-8") as f:
+        raw = json.load(f)
+    book_names: List[Optional[str]] = [None] * len(BOOKS)
+    numbers = {}
+    for book in raw:
+        number = book_number_from_name(book)
+        if number is None:
+            raise ValueError(f"Unknown book: {book}")
+        if book_names[number - 1] is not None:
+            raise ValueError(f"Book occurs twice: {book_names[number - 1]}, {book}")
+        book_names[number - 1] = book
+        numbers[book] = number
+
+    def entries():
+        for book, book_number in numbers.items():
+            for chapter, verses in raw[book].items():
+                for verse, text in verses.items():
+                    if text:
+                        yield book_number, int(chapter), int(verse), text
+
+    return build_store(entries(), book_names, path)
+
+
+class CommentaryStore:
+    """Read access to one commentary source."""
+
+    def __init__(self, path: str):
+        """
+        Open a commentary store.
+
+        Args:
+            path: Path without extension
+        """
+        self.path = path
+        with open(path + ".idx", "rb") as idx:
+            if idx.readline() != MAGIC:
+                raise ValueError(f"Not a commentary index: {path}.idx")
+            self.book_names: List[Optional[str]] = json.loads(idx.readline().decode("utf-8"))
+            table = idx.read()
+        self._ids = array('q')
+        self._offsets = array('Q')
+        self._lengths = array('I')
+        for packed, offset, length in RECORD.iter_unpack(table):
+            self._ids.append(packed)
+            self._offsets.append(offset)
+            self._lengths.append(length)
+        self._dat = open(path + ".dat", "rb")
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def close(self) -> None:
+        self._dat.close()
+
+    def book_name(self, number: int) -> Optional[str]:
+        """Return the name this source uses for a book number, or None."""
+        if 1 <= number <= len(self.book_names):
+            return self.book_names[number - 1]
+        return None
+
+    def _read(self, index: int) -> str:
+        with self._lock:
+            self._dat.seek(self._offsets[index])
+            return self._dat.read(self._lengths[index]).decode("utf-8")
+
+    def verse(self, book: int, chapter: int, verse: int) -> Optional[str]:
+        """
+        Return the commentary on a verse.
+
+        Args:
+            book: Book number (1-66)
+            chapter: Chapter number
+            verse: Verse number; 0 for the chapter introduction
+
+        Returns:
+            The commentary text, or None if there is none
+        """
+        packed = verse_id(book, chapter, verse)
+        index = bisect_left(self._ids, packed)
+        if index < len(self._ids) and self._ids[index] == packed:
+            return self._read(index)
+        return None
+
+    def chapter(self, book: int, chapter: int) -> Dict[int, str]:
+        """
+        Return all commentary on a chapter.
+
+        Returns:
+            Mapping of verse number (0 = introduction) to text, in order
+        """
+        start = bisect_left(self._ids, verse_id(book, chapter, 0))
+        end = bisect_left(self._ids, verse_id(book, chapter + 1, 0))
+        return {split_verse_id(self._ids[i])[2]: self._read(i) for i in range(start, end)}
+
+
+class CommentaryLibrary:
+    """All commentary sources in a directory, opened on first use."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._stores: Dict[str, CommentaryStore] = {}
+        self._lock = threading.Lock()
+
+    def sources(self) -> List[str]:
+        """Return the names of the available sources."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name[:-len(".idx")]
+            for name in os.listdir(self.directory)
+            if name.endswith(".idx")
+        )
+
+    def get(self, source: str) -> Optional[CommentaryStore]:
+        """Return the store of a source, or None if it does not exist."""
+        store = self._stores.get(source)
+        if store is not None:
+            return store
+        if source not in self.sources():
+            return None
+        with self._lock:
+            if source not in self._stores:
+                self._stores[source] = CommentaryStore(os.path.join(self.directory, source))
+            return self._stores[source]
+
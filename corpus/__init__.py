@@ -0,0 +1,16 @@
+"""
+Corpus module for the Bible API.
+
+This module holds the precomputed tables that are built once per Bible
+version when it is loaded, such as the versification structure and the mapping of verse
+numbers between versions, the streaming ingestion that builds them and
+the reloadable snapshot that holds them.
+"""
+
+from .ingest import build_version, load_version
+from .snapshot import CorpusHandle, CorpusSnapshot
+from .structure import BibleStructure
+from .versification import VersificationMap
+
+__all__ = ['BibleStructure', 'CorpusHandle', 'CorpusSnapshot', 'VersificationMap',
+           'build_version', 'load_version']
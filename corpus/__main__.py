@@ -0,0 +1,35 @@
+"""
+Add a Bible translation from the command line.
+
+Usage: python -m corpus <source> <version> [--format json|ndjson|csv|osis|usfm]
+
+The source is streamed into the compact store ``data/versions/<version>.ndjson``,
+which the API loads at startup.
+"""
+
+import argparse
+import os
+
+from .ingest import READERS, detect_format, write_compact
+
+arg_parser = argparse.ArgumentParser(description="Convert a Bible file into the compact verse store.")
+arg_parser.add_argument("source", help="Bible file, or a directory of USFM files")
+arg_parser.add_argument("version", help="Version name, e.g. kjv")
+arg_parser.add_argument("--format", choices=sorted(READERS), help="Source format (default: from extension)")
+arg_parser.add_argument("--name", help="Display name stored in the metadata")
+arg_parser.add_argument("--versification", help="Versification scheme (english, sv, hebrew)")
+arg_parser.add_argument("--directory", default=os.path.join("data", "versions"))
+args = arg_parser.parse_args()
+
+meta = {}
+reader = READERS[args.format or detect_format(args.source)]
+records = reader(args.source, meta)
+if args.name:
+    meta["name"] = args.name
+if args.versification:
+    meta["versification"] = args.versification
+
+os.makedirs(args.directory, exist_ok=True)
+path = os.path.join(args.directory, args.version.lower() + ".ndjson")
+count = write_compact(records, path, meta)
+print(f"Wrote {count} verses of '{args.version}' to {path}")
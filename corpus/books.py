@@ -0,0 +1,144 @@
+"""
+Canonical list of the 66 books.
+
+Each entry holds the OSIS code, the USFM code and the English name of a
+book, in canonical order, so book number N is ``BOOKS[N - 1]``.
+``DUTCH_NAMES`` holds the Statenvertaling names in the same order, and
+``DUTCH_ABBREVIATIONS`` their common abbreviations.
+"""
+
+import unicodedata
+from typing import Dict, Optional, Tuple
+
+BOOKS: Tuple[Tuple[str, str, str], ...] = (
+    ("Gen", "GEN", "Genesis"),
+    ("Exod", "EXO", "Exodus"),
+    ("Lev", "LEV", "Leviticus"),
+    ("Num", "NUM", "Numbers"),
+    ("Deut", "DEU", "Deuteronomy"),
+    ("Josh", "JOS", "Joshua"),
+    ("Judg", "JDG", "Judges"),
+    ("Ruth", "RUT", "Ruth"),
+    ("1Sam", "1SA", "1 Samuel"),
+    ("2Sam", "2SA", "2 Samuel"),
+    ("1Kgs", "1KI", "1 Kings"),
+    ("2Kgs", "2KI", "2 Kings"),
+    ("1Chr", "1CH", "1 Chronicles"),
+    ("2Chr", "2CH", "2 Chronicles"),
+    ("Ezra", "EZR", "Ezra"),
+    ("Neh", "NEH", "Nehemiah"),
+    ("Esth", "EST", "Esther"),
+    ("Job", "JOB", "Job"),
+    ("Ps", "PSA", "Psalms"),
+    ("Prov", "PRO", "Proverbs"),
+    ("Eccl", "ECC", "Ecclesiastes"),
+    ("Song", "SNG", "Song of Solomon"),
+    ("Isa", "ISA", "Isaiah"),
+    ("Jer", "JER", "Jeremiah"),
+    ("Lam", "LAM", "Lamentations"),
+    ("Ezek", "EZK", "Ezekiel"),
+    ("Dan", "DAN", "Daniel"),
+    ("Hos", "HOS", "Hosea"),
+    ("Joel", "JOL", "Joel"),
+    ("Amos", "AMO", "Amos"),
+    ("Obad", "OBA", "Obadiah"),
+    ("Jonah", "JON", "Jonah"),
+    ("Mic", "MIC", "Micah"),
+    ("Nah", "NAM", "Nahum"),
+    ("Hab", "HAB", "Habakkuk"),
+    ("Zeph", "ZEP", "Zephaniah"),
+    ("Hag", "HAG", "Haggai"),
+    ("Zech", "ZEC", "Zechariah"),
+    ("Mal", "MAL", "Malachi"),
+    ("Matt", "MAT", "Matthew"),
+    ("Mark", "MRK", "Mark"),
+    ("Luke", "LUK", "Luke"),
+    ("John", "JHN", "John"),
+    ("Acts", "ACT", "Acts"),
+    ("Rom", "ROM", "Romans"),
+    ("1Cor", "1CO", "1 Corinthians"),
+    ("2Cor", "2CO", "2 Corinthians"),
+    ("Gal", "GAL", "Galatians"),
+    ("Eph", "EPH", "Ephesians"),
+    ("Phil", "PHP", "Philippians"),
+    ("Col", "COL", "Colossians"),
+    ("1Thess", "1TH", "1 Thessalonians"),
+    ("2Thess", "2TH", "2 Thessalonians"),
+    ("1Tim", "1TI", "1 Timothy"),
+    ("2Tim", "2TI", "2 Timothy"),
+    ("Titus", "TIT", "Titus"),
+    ("Phlm", "PHM", "Philemon"),
+    ("Heb", "HEB", "Hebrews"),
+    ("Jas", "JAS", "James"),
+    ("1Pet", "1PE", "1 Peter"),
+    ("2Pet", "2PE", "2 Peter"),
+    ("1John", "1JN", "1 John"),
+    ("2John", "2JN", "2 John"),
+    ("3John", "3JN", "3 John"),
+    ("Jude", "JUD", "Jude"),
+    ("Rev", "REV", "Revelation"),
+)
+
+DUTCH_NAMES: Tuple[str, ...] = (
+    "Genesis", "Exodus", "Leviticus", "Numeri", "Deuteronomium", "Jozua", "Richteren", "Ruth",
+    "1 Samuël", "2 Samuël", "1 Koningen", "2 Koningen", "1 Kronieken", "2 Kronieken", "Ezra",
+    "Nehemia", "Esther", "Job", "Psalmen", "Spreuken", "Prediker", "Hooglied", "Jesaja", "Jeremia",
+    "Klaagliederen", "Ezechiël", "Daniël", "Hosea", "Joël", "Amos", "Obadja", "Jona", "Micha",
+    "Nahum", "Habakuk", "Sefanja", "Haggaï", "Zacharia", "Maleachi",
+    "Mattheüs", "Markus", "Lukas", "Johannes", "Handelingen", "Romeinen", "1 Korinthe",
+    "2 Korinthe", "Galaten", "Efeze", "Filippenzen", "Kolossenzen", "1 Thessalonicenzen",
+    "2 Thessalonicenzen", "1 Timotheüs", "2 Timotheüs", "Titus", "Filemon", "Hebreeën", "Jakobus",
+    "1 Petrus", "2 Petrus", "1 Johannes", "2 Johannes", "3 Johannes", "Judas", "Openbaring",
+)
+
+# Common Dutch abbreviations, in the same order; ambiguous short words
+# such as "Op" and "Am" are left out
+DUTCH_ABBREVIATIONS: Tuple[Tuple[str, ...], ...] = (
+    ("Gen",), ("Ex", "Exod"), ("Lev",), ("Num",), ("Deut",), ("Joz",), ("Richt", "Ri"), (),
+    ("1 Sam",), ("2 Sam",), ("1 Kon",), ("2 Kon",), ("1 Kron",), ("2 Kron",), (),
+    ("Neh",), ("Est",), (), ("Ps", "Psalm"), ("Spr",), ("Pred",), ("Hoogl",), ("Jes",), ("Jer",),
+    ("Klaagl",), ("Ez", "Ezech"), ("Dan",), ("Hos",), (), (), ("Obad",), (), ("Mi",),
+    ("Nah",), ("Hab",), ("Sef",), ("Hag",), ("Zach",), ("Mal",),
+    ("Matt", "Mat", "Mt"), ("Mark", "Mc", "Mk"), ("Luk", "Lc", "Lk"), ("Joh",), ("Hand",), ("Rom",),
+    ("1 Kor",), ("2 Kor",), ("Gal",), ("Ef",), ("Fil",), ("Kol",), ("1 Tess", "1 Thess"),
+    ("2 Tess", "2 Thess"), ("1 Tim",), ("2 Tim",), ("Tit",), ("Filem",), ("Hebr",), ("Jak",),
+    ("1 Petr",), ("2 Petr",), ("1 Joh",), ("2 Joh",), ("3 Joh",), ("Jud",), ("Openb", "Opb"),
+)
+
+
+def _name_key(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(char for char in decomposed if char.isalnum()).casefold()
+
+
+_BY_OSIS: Dict[str, int] = {osis: number for number, (osis, _, _) in enumerate(BOOKS, 1)}
+_BY_USFM: Dict[str, int] = {usfm: number for number, (_, usfm, _) in enumerate(BOOKS, 1)}
+_BY_NAME: Dict[str, int] = {
+    _name_key(name): number
+    for number, (codes, dutch, abbreviations) in enumerate(zip(BOOKS, DUTCH_NAMES, DUTCH_ABBREVIATIONS), 1)
+    for name in (*codes, dutch, *abbreviations)
+}
+
+
+def book_number_from_osis(code: str) -> Optional[int]:
+    """Return the book number of an OSIS code (e.g. "Gen"), or None."""
+    return _BY_OSIS.get(code)
+
+
+def book_number_from_usfm(code: str) -> Optional[int]:
+    """Return the book number of a USFM code (e.g. "GEN"), or None."""
+    return _BY_USFM.get(code.upper())
+
+
+def english_name(number: int) -> str:
+    """Return the English name of a book number."""
+    return BOOKS[number - 1][2]
+
+
+def book_number_from_name(name: str) -> Optional[int]:
+    """
+    Return the book number of an English or Statenvertaling name, a Dutch
+    abbreviation, or an OSIS or USFM code, ignoring case, accents, spaces
+    and dots; None if unknown.
+    """
+    return _BY_NAME.get(_name_key(name))
@@ -0,0 +1,102 @@
+"""
+Bulk export of loaded versions.
+
+An export streams the verses of a version, or of one book, in canonical
+order as NDJSON, CSV or a JSON array. Verses are encoded in batches by a
+generator, so a whole translation is never built up in memory, and an
+export can start at any verse to resume an interrupted download.
+
+For mirrors that want everything, ``write_artifact`` writes a whole
+version once as gzip-compressed NDJSON; that file can be served as is,
+including byte ranges.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+from typing import Iterable, Iterator
+
+from .ingest import Record
+
+EXPORT_FORMATS = ("ndjson", "csv", "json")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+}
+
+# Verses encoded per chunk of the stream
+BATCH_SIZE = 512
+
+FIELDS = ("book", "chapter", "verse", "text")
+
+
+def _batches(records: Iterable[Record]) -> Iterator[list]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ndjson_line(record: Record) -> str:
+    return json.dumps(dict(zip(FIELDS, record)), ensure_ascii=False) + "\n"
+
+
+def export_chunks(records: Iterable[Record], fmt: str = "ndjson") -> Iterator[bytes]:
+    """
+    Encode verse records for a streaming response.
+
+    Args:
+        records: (book, chapter, verse, text) records
+        fmt: One of ``EXPORT_FORMATS``
+
+    Yields:
+        UTF-8 encoded chunks of the export
+    """
+    if fmt == "ndjson":
+        for batch in _batches(records):
+            yield "".join(map(_ndjson_line, batch)).encode("utf-8")
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for batch in _batches(records):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+    elif fmt == "json":
+        separator = "["
+        for batch in _batches(records):
+            items = ",".join(json.dumps(dict(zip(FIELDS, record)), ensure_ascii=False) for record in batch)
+            yield (separator + items).encode("utf-8")
+            separator = ","
+        yield ("]" if separator == "," else "[]").encode("utf-8")
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def write_artifact(records: Iterable[Record], path: str) -> int:
+    """
+    Write records as gzip-compressed NDJSON, replacing ``path`` atomically.
+
+    Returns:
+        Size of the written file in bytes
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as raw:
+        # mtime=0 keeps the file identical for identical input
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as f:
+            for chunk in export_chunks(records, "ndjson"):
+                f.write(chunk)
+    os.replace(temporary, path)
+    return os.path.getsize(path)
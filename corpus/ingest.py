@@ -0,0 +1,439 @@
+"""
+Streaming ingestion of Bible texts.
+
+Readers turn a source file into a stream of (book, chapter, verse, text)
+records without loading the whole file: JSON (the ``{"metadata": ...,
+"verses": [...]}`` layout of ``data/statenvertaling.json``), the compact
+NDJSON store, CSV, OSIS XML and USFM. ``ingest`` feeds one stream into
+any number of sinks (the verse store and the search index) in a single
+pass, so the raw file is never held in memory next to the built store.
+"""
+
+import csv
+import glob
+import json
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from parsing.segments import SegmentTable
+from search.index import SearchIndex
+from search.normalize import DEFAULT_NORMALIZER, Normalizer
+
+from .books import book_number_from_osis, book_number_from_usfm, english_name
+from .structure import BibleStructure
+from .versification import VersificationMap, scheme_for_version
+
+Record = Tuple[str, str, str, str]
+
+CHUNK_SIZE = 1 << 16
+
+_decoder = json.JSONDecoder()
+
+
+class _JSONStream:
+    """Pulls JSON values one at a time from a file in fixed-size chunks."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> None:
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the JSON stream")
+        self.pos += 1
+
+    def skip(self, char: str) -> bool:
+        if self.peek() == char:
+            self.pos += 1
+            return True
+        return False
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return obj
+
+
+def read_json(path: str, meta: Optional[dict] = None) -> Iterator[Record]:
+    """
+    Stream the verses of a ``{"metadata": {...}, "verses": [...]}`` file.
+
+    Args:
+        path: JSON file
+        meta: Dictionary that receives the "metadata" object
+
+    Yields:
+        (book, chapter, verse, text) records
+    """
+    with open(path, encoding="utf-8") as f:
+        stream = _JSONStream(f)
+        stream.expect("{")
+        while not stream.skip("}"):
+            key = stream.value()
+            stream.expect(":")
+            if key == "verses":
+                stream.expect("[")
+                while not stream.skip("]"):
+                    verse = stream.value()
+                    yield (
+                        verse.get("book_name"),
+                        str(verse.get("chapter")),
+                        str(verse.get("verse")),
+                        verse.get("text"),
+                    )
+                    stream.skip(",")
+            else:
+                value = stream.value()
+                if key == "metadata" and meta is not None:
+                    meta.update(value)
+            stream.skip(",")
+
+
+def read_ndjson(path: str, meta: Optional[dict] = None) -> Iterator[Record]:
+    """Stream a compact store written by ``write_compact``."""
+    with open(path, encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        if meta is not None:
+            meta.update(header.get("metadata", {}))
+        for line in f:
+            if line.strip():
+                book, chapter, verse, text = json.loads(line)
+                yield book, chapter, verse, text
+
+
+def read_csv(path: str, meta: Optional[dict] = None) -> Iterator[Record]:
+    """Stream a CSV file with book (or book_name), chapter, verse and text columns."""
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            book = row.get("book") or row.get("book_name")
+            yield book, str(row["chapter"]).strip(), str(row["verse"]).strip(), row["text"]
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _osis_record(osis_id: str, parts: List[str]) -> Optional[Record]:
+    code, chapter, verse = osis_id.split(".")[:3]
+    number = book_number_from_osis(code)
+    text = " ".join("".join(parts).split())
+    if number is None or not text:
+        return None
+    return english_name(number), chapter, verse, text
+
+
+class _OSISWalker:
+    """Collects verse texts from OSIS elements, container or milestone style."""
+
+    # Elements whose text is not part of the verse text
+    SKIP = {"note", "title", "rdg"}
+
+    def __init__(self):
+        self.current: Optional[str] = None
+        self.parts: List[str] = []
+        self.records: List[Record] = []
+
+    def flush(self) -> None:
+        if self.current:
+            record = _osis_record(self.current, self.parts)
+            if record:
+                self.records.append(record)
+        self.current = None
+        self.parts = []
+
+    def walk(self, elem) -> None:
+        for child in elem:
+            tag = _local(child.tag)
+            if tag == "verse":
+                if child.get("sID") or child.get("eID"):
+                    self.flush()
+                    if child.get("sID"):
+                        self.current = child.get("osisID") or child.get("sID")
+                elif child.get("osisID"):
+                    self.flush()
+                    self.current = child.get("osisID")
+                    self.parts.append("".join(_text(child)))
+                    self.flush()
+            elif tag not in self.SKIP:
+                if self.current and child.text:
+                    self.parts.append(child.text)
+                self.walk(child)
+            if self.current and child.tail:
+                self.parts.append(child.tail)
+
+
+def _text(elem) -> Iterator[str]:
+    if elem.text:
+        yield elem.text
+    for child in elem:
+        if _local(child.tag) not in _OSISWalker.SKIP:
+            yield from _text(child)
+        if child.tail:
+            yield child.tail
+
+
+def read_osis(path: str, meta: Optional[dict] = None) -> Iterator[Record]:
+    """
+    Stream an OSIS XML file.
+
+    Chapters are processed and cleared as soon as they have been parsed,
+    so memory stays bounded by the size of one chapter (or one book for
+    files that only use chapter milestones).
+    """
+    walker = _OSISWalker()
+    for event, elem in ElementTree.iterparse(path, events=("end",)):
+        tag = _local(elem.tag)
+        if tag == "title" and meta is not None and "name" not in meta and elem.text:
+            meta["name"] = elem.text.strip()
+        if (tag == "chapter" and len(elem)) or (tag == "div" and elem.get("type") == "book"):
+            walker.walk(elem)
+            if tag == "div":
+                walker.flush()
+            elem.clear()
+            yield from walker.records
+            walker.records = []
+
+
+_USFM_NOTE_RE = re.compile(r"\\(f|fe|x)\s.*?\\\1\*")
+_USFM_ATTRIBUTE_RE = re.compile(r"\|[^\\]*")
+_USFM_MARKER_RE = re.compile(r"\\\+?[a-z0-9]+(?:\*|\s)?")
+_USFM_VERSE_RE = re.compile(r"\\v\s+(\S+)\s*")
+# Paragraph-level markers whose line content is not verse text
+_USFM_SKIP = {"id", "ide", "h", "toc1", "toc2", "toc3", "mt", "mt1", "mt2", "mt3",
+              "ms", "ms1", "mr", "s", "s1", "s2", "s3", "r", "d", "rem", "sts", "cl"}
+
+
+def _clean_usfm(text: str) -> str:
+    text = _USFM_NOTE_RE.sub("", text)
+    text = _USFM_ATTRIBUTE_RE.sub("", text)
+    return _USFM_MARKER_RE.sub("", text)
+
+
+def read_usfm(path: str, meta: Optional[dict] = None) -> Iterator[Record]:
+    """Stream a USFM file, or every .usfm/.sfm file in a directory."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "*.usfm")) + glob.glob(os.path.join(path, "*.sfm")))
+    else:
+        files = [path]
+    for file in files:
+        book = chapter = verse = None
+        parts: List[str] = []
+        with open(file, encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.strip()
+                marker = line[1:].split(" ", 1)[0] if line.startswith("\\") else ""
+                if marker == "id":
+                    number = book_number_from_usfm(line[4:7])
+                    book = english_name(number) if number else None
+                    continue
+                if marker == "c":
+                    if verse and parts:
+                        yield book, chapter, verse, " ".join(" ".join(parts).split())
+                    chapter, verse, parts = line[2:].strip(), None, []
+                    continue
+                if marker in _USFM_SKIP or not book:
+                    continue
+                pieces = _USFM_VERSE_RE.split(line)
+                # pieces: [text before first \v, number, text, number, text, ...]
+                if verse and pieces[0]:
+                    parts.append(_clean_usfm(pieces[0]))
+                for i in range(1, len(pieces), 2):
+                    if verse and parts:
+                        yield book, chapter, verse, " ".join(" ".join(parts).split())
+                    verse, parts = pieces[i], [_clean_usfm(pieces[i + 1])]
+        if book and verse and parts:
+            yield book, chapter, verse, " ".join(" ".join(parts).split())
+
+
+READERS: Dict[str, Callable[..., Iterator[Record]]] = {
+    "json": read_json,
+    "ndjson": read_ndjson,
+    "csv": read_csv,
+    "osis": read_osis,
+    "usfm": read_usfm,
+}
+
+_EXTENSIONS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+    ".xml": "osis",
+    ".osis": "osis",
+    ".usfm": "usfm",
+    ".sfm": "usfm",
+}
+
+
+def detect_format(path: str) -> str:
+    """Guess the reader for a path from its extension (directories are USFM)."""
+    if os.path.isdir(path):
+        return "usfm"
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in _EXTENSIONS:
+        raise ValueError(f"Unknown Bible file format: {path}")
+    return _EXTENSIONS[extension]
+
+
+class VersionBuilder:
+    """Sink that builds the nested verse data and structure of a version."""
+
+    def __init__(self):
+        self.data: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self._max_verses: Dict[str, Dict[str, int]] = {}
+
+    def add(self, book: str, chapter: str, verse: str, text: str) -> None:
+        chapters = self.data.get(book)
+        if chapters is None:
+            chapters = self.data[book] = {}
+            self._max_verses[book] = {}
+        verses = chapters.get(chapter)
+        if verses is None:
+            verses = chapters[chapter] = {}
+            self._max_verses[book][chapter] = 0
+        verses[verse] = text
+        if verse.isdigit() and int(verse) > self._max_verses[book][chapter]:
+            self._max_verses[book][chapter] = int(verse)
+
+    def structure(self) -> BibleStructure:
+        return BibleStructure(self._max_verses)
+
+
+def ingest(records: Iterable[Record], sinks: Iterable[Any]) -> int:
+    """
+    Feed every record to every sink in a single pass.
+
+    Args:
+        records: (book, chapter, verse, text) records
+        sinks: Objects with an ``add(book, chapter, verse, text)`` method
+
+    Returns:
+        Number of records ingested
+    """
+    adders = [sink.add for sink in sinks]
+    count = 0
+    for book, chapter, verse, text in records:
+        if not book or not text:
+            continue
+        for add in adders:
+            add(book, chapter, verse, text)
+        count += 1
+    return count
+
+
+def build_version(records: Iterable[Record], version_key: str, meta: Dict[str, Any],
+                  normalizer: Optional[Normalizer] = None,
+                  segments: Optional[SegmentTable] = None) -> Dict[str, Any]:
+    """
+    Build a version entry with its structure, versification map and search index.
+
+    Args:
+        records: (book, chapter, verse, text) records in canonical order
+        version_key: Name of the version
+        meta: Metadata of the version (readers may fill it while streaming)
+        normalizer: Folds verses and book names for search and lookup;
+            defaults to ``DEFAULT_NORMALIZER``
+        segments: Verse segment table with the version's overrides;
+            defaults to computed splits only
+
+    Returns:
+        Version entry with "meta", "data", "structure", "verse_map",
+        "search_index", "book_lookup" (folded book name -> book name)
+        and "segments"
+    """
+    normalizer = normalizer or DEFAULT_NORMALIZER
+    builder = VersionBuilder()
+    search_index = SearchIndex(normalizer)
+    ingest(records, (builder, search_index))
+    structure = builder.structure()
+    book_lookup: Dict[str, str] = {}
+    for name in builder.data:
+        book_lookup.setdefault(normalizer.fold(name), name)
+    return {
+        "meta": meta,
+        "data": builder.data,
+        "structure": structure,
+        "verse_map": VersificationMap(structure, scheme_for_version(version_key, meta)),
+        "search_index": search_index,
+        "book_lookup": book_lookup,
+        "segments": segments or SegmentTable(),
+    }
+
+
+def load_version(path: str, version_key: str, fmt: Optional[str] = None,
+                 normalizer: Optional[Normalizer] = None,
+                 segments: Optional[SegmentTable] = None) -> Dict[str, Any]:
+    """
+    Load a Bible version from a file in a single streaming pass.
+
+    Args:
+        path: Source file (or USFM directory)
+        version_key: Name of the version
+        fmt: Reader name from ``READERS``; guessed from the path if omitted
+        normalizer: See ``build_version``
+        segments: See ``build_version``
+
+    Returns:
+        Version entry, see ``build_version``
+    """
+    meta: Dict[str, Any] = {}
+    reader = READERS[fmt or detect_format(path)]
+    return build_version(reader(path, meta), version_key, meta, normalizer, segments)
+
+
+def write_compact(records: Iterable[Record], path: str, meta: Dict[str, Any]) -> int:
+    """
+    Write records to the compact NDJSON store read by ``read_ndjson``.
+
+    Readers may still fill in ``meta`` while records stream (e.g. the
+    OSIS work title), so the records go to a temporary file first and
+    the metadata line is written in front of them at the end.
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    body_path = path + ".tmp"
+    with open(body_path, "w", encoding="utf-8") as body:
+        for book, chapter, verse, text in records:
+            if not book or not text:
+                continue
+            body.write(json.dumps([book, chapter, verse, text], ensure_ascii=False) + "\n")
+            count += 1
+    with open(path, "w", encoding="utf-8") as out, open(body_path, encoding="utf-8") as body:
+        out.write(json.dumps({"metadata": meta}, ensure_ascii=False) + "\n")
+        for line in body:
+            out.write(line)
+    os.remove(body_path)
+    return count
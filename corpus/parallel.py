@@ -0,0 +1,96 @@
+"""
+Parallel passages across several Bible versions.
+
+A reference is parsed once, in the first (source) version. Its verses
+are translated to canonical verse IDs once, and every other version
+looks those IDs up through its own versification map. The per-version
+lookups run concurrently.
+
+Where the reference cuts a verse ("Habakuk 3:19a"), the matching verse of
+every other version is cut to the same segments, split at that version's
+own clause boundaries (see ``parsing.segments``).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from parsing.results import Verse
+from parsing.segments import SEGMENT_LETTERS, SegmentTable, segment_span
+
+# Shared by all requests; one task per version in a request
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="parallel")
+
+
+def _canonical_ids(verses: Sequence[Verse], source: Dict[str, Any]) -> List[Optional[int]]:
+    verse_map = source["verse_map"]
+    ids = []
+    for verse in verses:
+        if verse.ref is None:
+            ids.append(None)
+        else:
+            ids.append(verse_map.to_canonical(verse.ref[0], verse.ref[1], verse.verse))
+    return ids
+
+
+def _column(version: Dict[str, Any], canonical_ids: List[Optional[int]],
+            segments: List[Optional[str]]) -> List[Optional[dict]]:
+    """Look up the verse matching every canonical ID in one version, cut to the same segments."""
+    verse_map = version["verse_map"]
+    data = version["data"]
+    table = version.get("segments") or SegmentTable()
+    column = []
+    for packed, letters in zip(canonical_ids, segments):
+        location = verse_map.from_canonical(packed) if packed is not None else None
+        text = None
+        if location is not None:
+            book, chapter, verse = location
+            text = data.get(book, {}).get(chapter, {}).get(verse)
+        if text is None:
+            column.append(None)
+            continue
+        entry = {"book": book, "chapter": chapter, "verse": verse, "text": text}
+        if letters:
+            offsets = table.offsets(book, chapter, verse, text)
+            start, end, entry["segment"] = segment_span(text, offsets, SEGMENT_LETTERS.index(letters[0]),
+                                                        SEGMENT_LETTERS.index(letters[-1]))
+            entry["text"] = text[start:end]
+        column.append(entry)
+    return column
+
+
+def align_versions(verses: Sequence[Verse], versions: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Align the verses of a parsed passage with the same verses in other versions.
+
+    Args:
+        verses: Verses parsed from the first version in ``versions``
+        versions: Ordered mapping of version key to loaded version data
+            (with "data" and "verse_map")
+
+    Returns:
+        One row per source verse, with the canonical verse ID and, per
+        version, the matching verse or None when it has no counterpart;
+        cut verses carry their "segment" letters
+    """
+    keys = list(versions)
+    source_key = keys[0]
+    canonical_ids = _canonical_ids(verses, versions[source_key])
+    segments = [verse.segment for verse in verses]
+
+    others = keys[1:]
+    columns = dict(zip(others, _executor.map(
+        lambda key: _column(versions[key], canonical_ids, segments), others
+    )))
+
+    rows = []
+    for index, verse in enumerate(verses):
+        book, chapter = verse.ref if verse.ref is not None else (None, None)
+        row_verses = {
+            source_key: {"book": book, "chapter": chapter, "verse": verse.verse, "text": verse.text}
+        }
+        if verse.segment:
+            row_verses[source_key]["segment"] = verse.segment
+        for key in others:
+            row_verses[key] = columns[key][index]
+        rows.append({"canonical": canonical_ids[index], "verses": row_verses})
+    return rows
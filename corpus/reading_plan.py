@@ -0,0 +1,169 @@
+"""
+Reading plans balanced by length.
+
+A plan splits a scope (document ranges, see ``search.scope``) into a
+number of days of about equal reading length, in characters or words.
+Prefix sums of the verse lengths are computed once per version, so the
+end of each day is found by binary search and a plan takes
+O(days log n) after a pass over the ranges of the scope. Each day is
+returned as references in the form ``ReferenceParser`` reads.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Dict, List, Sequence
+
+from search.index import SearchIndex
+from search.scope import Range
+
+UNITS = ("chars", "words")
+
+
+class VerseLengths:
+    """Prefix sums of the verse lengths of one version, per unit."""
+
+    def __init__(self, index: SearchIndex):
+        """
+        Compute the prefix sums; ``sums[unit][doc]`` is the length of all
+        documents before ``doc``.
+
+        Args:
+            index: Search index of the version
+        """
+        self.sums: Dict[str, array] = {
+            "chars": array('Q', accumulate((len(text) for text in index.texts), initial=0)),
+            "words": array('Q', accumulate((index.word_count(doc) for doc in range(len(index))), initial=0)),
+        }
+
+    def plan(self, scope: Sequence[Range], days: int, unit: str = "chars") -> List[int]:
+        """
+        Split a scope into days of about equal length.
+
+        Args:
+            scope: Sorted, non-overlapping document ranges
+            days: Number of days
+            unit: One of ``UNITS``
+
+        Returns:
+            ``days + 1`` positions in the scope (0 to the number of
+            verses); day ``i`` reads positions ``[p[i], p[i + 1])``
+
+        Raises:
+            ValueError: If the unit is unknown or the scope has fewer
+                verses than days
+        """
+        if unit not in self.sums:
+            raise ValueError(f"Unknown unit: {unit}")
+        sums = self.sums[unit]
+        # Verses and length of the scope before each range
+        counts = list(accumulate((end - start for start, end in scope), initial=0))
+        bases = list(accumulate((sums[end] - sums[start] for start, end in scope), initial=0))
+        size = counts[-1]
+        if days < 1 or days > size:
+            raise ValueError(f"Cannot split {size} verses into {days} days")
+        last = len(scope) - 1
+
+        def length_before(position: int) -> int:
+            index = min(bisect_right(counts, position) - 1, last)
+            start = scope[index][0]
+            return bases[index] + sums[start + position - counts[index]] - sums[start]
+
+        def position_at(target: float) -> int:
+            index = max(min(bisect_right(bases, target) - 1, last), 0)
+            start, end = scope[index]
+            doc = bisect_left(sums, sums[start] + target - bases[index], start, end)
+            position = counts[index] + doc - start
+            # Of the verse boundaries around the target, take the nearer one
+            if position and target - length_before(position - 1) < length_before(position) - target:
+                position -= 1
+            return position
+
+        total = bases[-1]
+        positions = [0]
+        for day in range(1, days):
+            position = position_at(total * day / days)
+            # Every day reads at least one verse
+            position = min(max(position, positions[-1] + 1), size - (days - day))
+            positions.append(position)
+        positions.append(size)
+        return positions
+
+    def length(self, ranges: Sequence[Range], unit: str = "chars") -> int:
+        """Total length of document ranges."""
+        sums = self.sums[unit]
+        return sum(sums[end] - sums[start] for start, end in ranges)
+
+
+def positions_to_ranges(scope: Sequence[Range], counts: Sequence[int], first: int, last: int) -> List[Range]:
+    """
+    Document ranges of the scope positions ``[first, last)``.
+
+    Args:
+        scope: Document ranges
+        counts: Verses in the scope before each range, and the total
+        first: First position
+        last: Position after the last one
+    """
+    ranges = []
+    index = bisect_right(counts, first) - 1
+    while first < last:
+        start = scope[index][0]
+        stop = min(last, counts[index + 1])
+        ranges.append((start + first - counts[index], start + stop - counts[index]))
+        first = stop
+        index += 1
+    return ranges
+
+
+def compact_references(index: SearchIndex, ranges: Sequence[Range]) -> List[str]:
+    """
+    Shortest references covering document ranges, one per book run.
+
+    Returns:
+        References like "Genesis 1:1-3:24" or "Psalmen 23:1-6"
+    """
+    references = []
+    for start, end in ranges:
+        while start < end:
+            book = index.refs[start][0]
+            stop = min(end, index.book_range(book)[1])
+            _, first_chapter, first_verse = index.refs[start]
+            _, last_chapter, last_verse = index.refs[stop - 1]
+            if (first_chapter, first_verse) == (last_chapter, last_verse):
+                references.append(f"{book} {first_chapter}:{first_verse}")
+            elif first_chapter == last_chapter:
+                references.append(f"{book} {first_chapter}:{first_verse}-{last_verse}")
+            else:
+                references.append(f"{book} {first_chapter}:{first_verse}-{last_chapter}:{last_verse}")
+            start = stop
+    return references
+
+
+def reading_plan(index: SearchIndex, lengths: VerseLengths, scope: Sequence[Range], days: int,
+                 unit: str = "chars") -> List[Dict[str, Any]]:
+    """
+    Build a reading plan.
+
+    Args:
+        index: Search index of the version
+        lengths: Prefix sums of the same version
+        scope: Document ranges to read
+        days: Number of days
+        unit: One of ``UNITS``
+
+    Returns:
+        {"day", "references", "verses", "length"} per day
+    """
+    positions = lengths.plan(scope, days, unit)
+    counts = list(accumulate((end - start for start, end in scope), initial=0))
+    plan = []
+    for day, (first, last) in enumerate(zip(positions, positions[1:]), 1):
+        ranges = positions_to_ranges(scope, counts, first, last)
+        plan.append({
+            "day": day,
+            "references": compact_references(index, ranges),
+            "verses": last - first,
+            "length": lengths.length(ranges, unit),
+        })
+    return plan
@@ -0,0 +1,163 @@
+"""
+Reloadable corpus snapshots.
+
+All loaded versions, with their structures and indexes, form one
+immutable ``CorpusSnapshot``. A ``CorpusHandle`` holds the current
+snapshot; a reload builds and warms a new snapshot in a background
+thread and then swaps the reference in one assignment. Requests that
+took the old snapshot keep using it until they finish.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+Versions = Dict[str, Dict[str, Any]]
+
+
+def fingerprint(paths: Iterable[str]) -> str:
+    """
+    Fingerprint source files by path, size and modification time.
+
+    Missing files are included by name, so adding a file also changes
+    the fingerprint.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8"))
+        except OSError:
+            digest.update(f"{path}:missing\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CorpusSnapshot:
+    """One immutable generation of the loaded versions."""
+
+    def __init__(self, versions: Versions, generation: int, source_fingerprint: str):
+        """
+        Initialize a snapshot.
+
+        Args:
+            versions: Version entries keyed by version name
+            generation: Sequence number, 1 for the first snapshot
+            source_fingerprint: Fingerprint of the files it was built from
+        """
+        self.versions = versions
+        self.generation = generation
+        self.source_fingerprint = source_fingerprint
+        self.loaded_at = time.time()
+        # Short tag that changes with every reload; part of response ETags
+        self.etag = f"{generation}-{source_fingerprint[:12]}"
+        # Response caches computed from this snapshot, keyed by name
+        self.caches: Dict[str, Any] = {}
+
+
+def warm_snapshot(snapshot: CorpusSnapshot) -> None:
+    """Build the lazily computed parts of a snapshot before it serves traffic."""
+    for version in snapshot.versions.values():
+        structure = version.get("structure")
+        if structure is not None:
+            structure.etag()
+
+
+class CorpusHandle:
+    """Versioned reference to the current corpus snapshot."""
+
+    def __init__(self, loader: Callable[[], Versions], sources: Callable[[], List[str]],
+                 warmups: Optional[List[Callable[[CorpusSnapshot], None]]] = None):
+        """
+        Initialize the handle; nothing is loaded until ``load`` is called.
+
+        Args:
+            loader: Builds all version entries from disk
+            sources: Returns the source file paths the loader reads
+            warmups: Called with every new snapshot before it is swapped in
+        """
+        self.loader = loader
+        self.sources = sources
+        self.warmups = list(warmups or [warm_snapshot])
+        self._snapshot: Optional[CorpusSnapshot] = None
+        self._reload_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def current(self) -> CorpusSnapshot:
+        """Return the current snapshot, loading the first one if needed."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    def _build(self) -> CorpusSnapshot:
+        source_fingerprint = fingerprint(self.sources())
+        generation = self._snapshot.generation + 1 if self._snapshot else 1
+        snapshot = CorpusSnapshot(self.loader(), generation, source_fingerprint)
+        for warmup in self.warmups:
+            warmup(snapshot)
+        return snapshot
+
+    def load(self) -> CorpusSnapshot:
+        """Build, warm and publish a snapshot, blocking until it is ready."""
+        with self._reload_lock:
+            if self._snapshot is None:
+                self._snapshot = self._build()
+            return self._snapshot
+
+    def reload(self, force: bool = False) -> Optional[CorpusSnapshot]:
+        """
+        Build a new snapshot and swap it in.
+
+        Args:
+            force: Reload even if the source files did not change
+
+        Returns:
+            The new snapshot, or None if nothing changed or a reload is
+            already running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            return None
+        try:
+            old = self._snapshot
+            if not force and old is not None and old.source_fingerprint == fingerprint(self.sources()):
+                return None
+            started = time.monotonic()
+            snapshot = self._build()
+            self._snapshot = snapshot
+            logging.info(
+                f"Corpus reloaded: generation {snapshot.generation} "
+                f"({time.monotonic() - started:.2f}s)"
+            )
+            return snapshot
+        except Exception:
+            logging.exception("Corpus reload failed; keeping the current snapshot")
+            return None
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, force: bool = False) -> threading.Thread:
+        """Start ``reload`` in a daemon thread and return the thread."""
+        thread = threading.Thread(target=self.reload, kwargs={"force": force},
+                                  name="corpus-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def watch(self, interval: float) -> None:
+        """Poll the source files every ``interval`` seconds and reload on change."""
+        if self._watcher is not None:
+            return
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                self.reload()
+
+        self._watcher = threading.Thread(target=poll, name="corpus-watch", daemon=True)
+        self._watcher.start()
@@ -0,0 +1,160 @@
+"""
+Versification structure of a Bible version.
+
+Built once at load time so that questions like "how many chapters does
+this book have" or "what is the last verse of this chapter" are simple
+lookups instead of scans over the verse keys.
+
+Every verse slot of a version also gets an ordinal: its position when
+all chapters are laid out back to back (Genesis 1:1 is 0). Ordinals
+are what the compact per-version tables are indexed by.
+"""
+
+import hashlib
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from parsing.results import encode_json
+
+
+class BibleStructure:
+    """Chapters per book and verses per chapter for one version."""
+
+    def __init__(self, books: Dict[str, Dict[str, int]]):
+        """
+        Initialize the structure table.
+
+        Args:
+            books: Ordered mapping of book name to an ordered mapping of
+                chapter number (as a string) to its last verse number
+        """
+        self.books = books
+        self._encoded: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+        # Ordinal layout: first ordinal of every chapter, in order
+        self._names = list(books)
+        self._book_numbers = {book: number for number, book in enumerate(books, 1)}
+        self._chapter_starts: Dict[Tuple[str, str], int] = {}
+        self._starts = array('l')
+        self._chapters: List[Tuple[str, str]] = []
+        total = 0
+        for book, chapters in books.items():
+            for chapter, max_verse in chapters.items():
+                self._chapter_starts[(book, chapter)] = total
+                self._starts.append(total)
+                self._chapters.append((book, chapter))
+                total += max_verse
+        self.total_verses = total
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Dict[str, Dict[str, str]]]) -> "BibleStructure":
+        """
+        Build the table from nested ``{book: {chapter: {verse: text}}}`` data.
+
+        Args:
+            data: Verse texts of one version
+
+        Returns:
+            The structure of that version
+        """
+        books = {}
+        for book, chapters in data.items():
+            counts = {}
+            for chapter, verses in chapters.items():
+                numbers = [int(v) for v in verses if v.isdigit()]
+                counts[chapter] = max(numbers) if numbers else 0
+            books[book] = counts
+        return cls(books)
+
+    def book_names(self) -> List[str]:
+        """Return the book names in canonical order."""
+        return list(self._names)
+
+    def chapter_count(self, book: str) -> int:
+        """Return the number of chapters in a book (0 if unknown)."""
+        return len(self.books.get(book, ()))
+
+    def max_verse(self, book: str, chapter: Union[str, int]) -> Optional[int]:
+        """Return the last verse number of a chapter, or None if unknown."""
+        return self.books.get(book, {}).get(str(chapter))
+
+    def book_number(self, book: str) -> Optional[int]:
+        """Return the 1-based position of a book, or None if unknown."""
+        return self._book_numbers.get(book)
+
+    def book_name(self, number: int) -> Optional[str]:
+        """Return the book at a 1-based position, or None."""
+        if 1 <= number <= len(self._names):
+            return self._names[number - 1]
+        return None
+
+    def ordinal(self, book: str, chapter: Union[str, int], verse: Union[str, int]) -> Optional[int]:
+        """
+        Return the ordinal of a verse slot.
+
+        Args:
+            book: Book name as used by this version
+            chapter: Chapter number
+            verse: Verse number
+
+        Returns:
+            The ordinal, or None if the verse is outside the structure
+        """
+        chapter = str(chapter)
+        start = self._chapter_starts.get((book, chapter))
+        if start is None:
+            return None
+        verse = int(verse)
+        if not 1 <= verse <= self.books[book][chapter]:
+            return None
+        return start + verse - 1
+
+    def chapter_span(self, book: str, chapter: Union[str, int]) -> Optional[Tuple[int, int]]:
+        """Return the (first, last + 1) ordinals of a chapter, or None."""
+        chapter = str(chapter)
+        start = self._chapter_starts.get((book, chapter))
+        if start is None:
+            return None
+        return start, start + self.books[book][chapter]
+
+    def reference(self, ordinal: int) -> Tuple[str, str, str]:
+        """
+        Return the (book, chapter, verse) of an ordinal.
+
+        Raises:
+            IndexError: If the ordinal is outside the structure
+        """
+        if not 0 <= ordinal < self.total_verses:
+            raise IndexError(ordinal)
+        # Empty chapters share their start with the next chapter, so the
+        # rightmost match is always the chapter that holds the ordinal
+        index = bisect_right(self._starts, ordinal) - 1
+        book, chapter = self._chapters[index]
+        return book, chapter, str(ordinal - self._starts[index] + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the structure as a JSON-ready dictionary."""
+        return {
+            "books": [
+                {
+                    "name": book,
+                    "chapters": len(chapters),
+                    "verses": dict(chapters),
+                }
+                for book, chapters in self.books.items()
+            ]
+        }
+
+    def encoded(self) -> bytes:
+        """Return the JSON encoding of ``to_dict``, built only once."""
+        if self._encoded is None:
+            self._encoded = encode_json(self.to_dict())
+        return self._encoded
+
+    def etag(self) -> str:
+        """Return a strong ETag for the encoded structure."""
+        if self._etag is None:
+            self._etag = '"' + hashlib.sha256(self.encoded()).hexdigest()[:32] + '"'
+        return self._etag
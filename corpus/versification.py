@@ -0,0 +1,216 @@
+"""
+Versification mapping between Bible versions.
+
+Translations do not all number verses the same way: the Statenvertaling
+counts most Psalm superscriptions as verse 1, and versions that follow
+the Hebrew chapter division put Malachi 4:1-6 at 3:19-24. Every version
+gets a ``VersificationMap`` that translates its own verse numbers to a
+canonical (English/KJV) verse ID and back in constant time.
+
+Canonical verse IDs are packed integers: ``book * 1000000 + chapter *
+1000 + verse``, with books numbered 1-66 in canonical order. Books are
+numbered by name (``corpus.books.book_number_from_name``), not by their
+place in the version, so a version with only some of the books or in
+another order maps the same; books with an unknown name have no
+canonical verses.
+"""
+
+from array import array
+from typing import Dict, List, Optional, Tuple, Union
+
+from .books import book_number_from_name
+from .structure import BibleStructure
+
+# Marks a verse that has no canonical counterpart (e.g. a Psalm title)
+NO_VERSE = -1
+
+PSALMS = 19
+JOEL = 29
+MALACHI = 39
+
+# Psalms whose superscription is numbered as a separate verse in the
+# Hebrew numbering, with the number of verses it takes
+PSALM_TITLE_VERSES = dict.fromkeys(
+    (3, 4, 5, 6, 7, 8, 9, 12, 13, 18, 19, 20, 21, 22, 30, 31, 34, 36, 38, 39,
+     40, 41, 42, 44, 45, 46, 47, 48, 49, 53, 55, 56, 57, 58, 59, 61, 62, 63,
+     64, 65, 67, 68, 69, 70, 75, 76, 77, 80, 81, 83, 84, 85, 88, 89, 92, 102,
+     108, 140, 142),
+    1,
+)
+PSALM_TITLE_VERSES.update(dict.fromkeys((51, 52, 54, 60), 2))
+
+# A rule maps local verses book chapter:first-last (last None = to the
+# end of the chapter) to canonical chapter:start onwards. A canonical
+# chapter of None means the verses have no canonical counterpart.
+Rule = Tuple[int, int, int, Optional[int], Optional[int], Optional[int]]
+
+
+def _psalm_title_rules() -> List[Rule]:
+    rules = []
+    for psalm, titles in PSALM_TITLE_VERSES.items():
+        rules.append((PSALMS, psalm, 1, titles, None, None))
+        rules.append((PSALMS, psalm, titles + 1, None, psalm, 1))
+    return rules
+
+
+# Versification schemes by name; "english" is the canonical scheme
+SCHEMES: Dict[str, List[Rule]] = {
+    "english": [],
+    # Statenvertaling: Hebrew Psalm numbering, English chapter division
+    "sv": _psalm_title_rules(),
+    # Hebrew chapter division (NBG, HSV and most modern Dutch versions)
+    "hebrew": _psalm_title_rules() + [
+        (JOEL, 3, 1, 5, 2, 28),
+        (JOEL, 4, 1, None, 3, 1),
+        (MALACHI, 3, 19, None, 4, 1),
+    ],
+}
+
+# Scheme used by a version when its metadata does not name one
+DEFAULT_SCHEMES = {
+    "statenvertaling": "sv",
+}
+
+
+def verse_id(book: int, chapter: int, verse: int) -> int:
+    """Pack a book number, chapter and verse into a verse ID."""
+    return book * 1000000 + chapter * 1000 + verse
+
+
+def split_verse_id(packed: int) -> Tuple[int, int, int]:
+    """Unpack a verse ID into (book number, chapter, verse)."""
+    book, rest = divmod(packed, 1000000)
+    chapter, verse = divmod(rest, 1000)
+    return book, chapter, verse
+
+
+def scheme_for_version(version_key: str, meta: Optional[dict] = None) -> str:
+    """Return the versification scheme of a version."""
+    if meta and meta.get("versification") in SCHEMES:
+        return meta["versification"]
+    return DEFAULT_SCHEMES.get(version_key.lower(), "english")
+
+
+class VersificationMap:
+    """Constant-time translation between a version's and canonical verse IDs."""
+
+    def __init__(self, structure: BibleStructure, scheme: str = "english"):
+        """
+        Build the mapping tables for one version.
+
+        Args:
+            structure: Structure table of the version
+            scheme: Name of a scheme in ``SCHEMES``
+
+        Raises:
+            KeyError: If the scheme is unknown
+        """
+        self.structure = structure
+        self.scheme = scheme
+        rules = SCHEMES[scheme]
+        # Canonical book number -> book name in this version
+        self._books: Dict[int, str] = {}
+        for book in structure.book_names():
+            self._books.setdefault(book_number_from_name(book), book)
+        self._books.pop(None, None)
+
+        # Canonical verse ID of every local ordinal (NO_VERSE if none)
+        self._to_canonical = array('q', [NO_VERSE]) * structure.total_verses
+        for book_number, book in self._books.items():
+            for chapter, max_verse in structure.books[book].items():
+                if not chapter.isdigit():
+                    continue
+                start = structure.ordinal(book, chapter, 1)
+                for verse in range(1, max_verse + 1):
+                    self._to_canonical[start + verse - 1] = verse_id(book_number, int(chapter), verse)
+
+        for book_number, chapter, first, last, target_chapter, target_verse in rules:
+            book = self._books.get(book_number)
+            max_verse = structure.max_verse(book, chapter) if book else None
+            if not max_verse:
+                continue
+            last = min(last or max_verse, max_verse)
+            start = structure.ordinal(book, chapter, 1)
+            for verse in range(first, last + 1):
+                if target_chapter is None:
+                    packed = NO_VERSE
+                else:
+                    packed = verse_id(book_number, target_chapter, target_verse + verse - first)
+                self._to_canonical[start + verse - 1] = packed
+
+        # Reverse lookups only need the verses whose number changes; the
+        # rest map onto themselves
+        self._from_canonical: Dict[int, int] = {}
+        for book_number, chapter, first, last, target_chapter, target_verse in rules:
+            book = self._books.get(book_number)
+            span = structure.chapter_span(book, chapter) if book else None
+            if not span:
+                continue
+            for ordinal in range(*span):
+                packed = self._to_canonical[ordinal]
+                if packed != NO_VERSE:
+                    self._from_canonical[packed] = ordinal
+
+    def to_canonical(self, book: Union[str, int], chapter: Union[str, int],
+                     verse: Union[str, int]) -> Optional[int]:
+        """
+        Translate a verse of this version to a canonical verse ID.
+
+        Args:
+            book: Book name as used by this version, or its canonical number
+            chapter: Chapter number in this version
+            verse: Verse number in this version
+
+        Returns:
+            The canonical verse ID, or None if the verse has no counterpart
+        """
+        if isinstance(book, int):
+            book = self._books.get(book)
+            if book is None:
+                return None
+        ordinal = self.structure.ordinal(book, chapter, verse)
+        if ordinal is None:
+            return None
+        packed = self._to_canonical[ordinal]
+        return None if packed == NO_VERSE else packed
+
+    def from_canonical(self, packed: int) -> Optional[Tuple[str, str, str]]:
+        """
+        Translate a canonical verse ID to a verse of this version.
+
+        Args:
+            packed: Canonical verse ID
+
+        Returns:
+            (book, chapter, verse) in this version, or None if missing
+        """
+        ordinal = self._from_canonical.get(packed)
+        if ordinal is None:
+            book_number, chapter, verse = split_verse_id(packed)
+            book = self._books.get(book_number)
+            if book is None:
+                return None
+            ordinal = self.structure.ordinal(book, chapter, verse)
+            # A verse that was renumbered no longer answers to its own ID
+            if ordinal is None or self._to_canonical[ordinal] != packed:
+                return None
+        return self.structure.reference(ordinal)
+
+    def translate(self, other: "VersificationMap", book: Union[str, int],
+                  chapter: Union[str, int], verse: Union[str, int]) -> Optional[Tuple[str, str, str]]:
+        """
+        Translate a verse of this version to the matching verse of another.
+
+        Args:
+            other: Map of the target version
+            book: Book name in this version, or its canonical number
+            chapter: Chapter number in this version
+            verse: Verse number in this version
+
+        Returns:
+            (book, chapter, verse) in the other version, or None
+        """
+        packed = self.to_canonical(book, chapter, verse)
+        if packed is None:
+            return None
+        return other.from_canonical(packed)
@@ -0,0 +1,30 @@
+"""
+Lazily initialised database access.
+
+SQLAlchemy and the models are only imported, and the tables only
+created, when the first session is requested. Importing the app stays
+cheap and workers that never touch the database never pay for it.
+"""
+
+import threading
+
+DATABASE_URL = "sqlite:///./test.db"
+
+_session_factory = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """Return a new database session, setting up the engine on first use."""
+    global _session_factory
+    if _session_factory is None:
+        with _lock:
+            if _session_factory is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.orm import sessionmaker
+                from models import Base
+
+                engine = create_engine(DATABASE_URL)
+                Base.metadata.create_all(bind=engine)
+                _session_factory = sessionmaker(bind=engine)
+    return _session_factory()
@@ -1,20 +1,45 @@
 # main.py
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi import Security, Depends
 from fastapi.security import APIKeyHeader
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-import json
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import os
 import random
+import re
 import hashlib
+import hmac
+import json
+import threading
+import time
 from datetime import date
-from models import APIKey, Base
+from commentary.store import CommentaryLibrary
+from corpus.books import book_number_from_name
+from corpus.parallel import align_versions
+from corpus.snapshot import CorpusHandle, warm_snapshot
+from corpus.export import EXPORT_FORMATS, MEDIA_TYPES, export_chunks, write_artifact
+from corpus.ingest import build_version, load_version
+from corpus.reading_plan import UNITS, VerseLengths, reading_plan
+from corpus.versification import split_verse_id
+from parsing.extractor import ReferenceExtractor, version_aliases
+from parsing.reference_parser import ReferenceParser
+from parsing.results import RESULT_FIELDS, ParseResult, Verse, VerseList, encode_json, parse_fields, select_fields
+from parsing.segments import load_segments
+from database import get_session
+from search.index import SEARCH_FIELDS, TOKEN_RE
+from search.pattern import PatternError, compile_pattern
+from search.related import RelatedVerses
+from search.normalize import SPELLING_MAP, Normalizer
+from search.scope import intersect_ranges, merge_ranges, sample_scope
+from billing.queue import WebhookQueue
+from billing.usage import UsageMeter
+from server.cache import snapshot_cache
+from server.disk_cache import DiskCache, cache_key
+from server.static import StaticSite
+from server.warmup import load_caches, read_warmup_file, replay, save_caches
 from dotenv import load_dotenv
-import stripe
-import uuid
 
 # SlowAPI imports voor rate limiting
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -26,11 +51,38 @@ import logging
 # Configure logging for analytics
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
+def preload_corpus():
+    try:
+        corpus.load()
+    except Exception:
+        logging.exception("Loading the corpus failed")
+
+@asynccontextmanager
+async def lifespan(app):
+    """Start loading the corpus once the server runs, instead of at import time.
+
+    With PRELOAD_CORPUS=0 the corpus is loaded by the first request that needs it.
+    """
+    if PRELOAD_CORPUS:
+        threading.Thread(target=preload_corpus, name="corpus-load", daemon=True).start()
+    if CORPUS_WATCH_INTERVAL > 0:
+        corpus.watch(CORPUS_WATCH_INTERVAL)
+    if STRIPE_WEBHOOK_SECRET:
+        # Picks up events left over from before a restart
+        webhook_queue.start()
+    yield
+    webhook_queue.stop()
+    usage_meter.stop()
+    if CACHE_SNAPSHOT_PATH and corpus.loaded:
+        count = save_caches(corpus.current(), CACHE_SNAPSHOT_PATH)
+        logging.info(f"Saved {count} cached responses to {CACHE_SNAPSHOT_PATH}")
+
 app = FastAPI(
     title="BijbelQuiz Scriptura",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # SlowAPI limiter setup
@@ -58,6 +110,23 @@ async def validation_exception_handler(request, exc):
         content={"error": 422, "message": "Validation error", "details": exc.errors()},
     )
 
+def compact_response(content):
+    """Serialize verse/passage results to JSON in one pass."""
+    return Response(encode_json(content), media_type="application/json")
+
+def get_fields(fields, default=None, allowed=RESULT_FIELDS):
+    """Parse a fields= selection, turning unknown names into a 400."""
+    try:
+        selected = parse_fields(fields, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return selected if selected is not None else default
+
+# Fields returned by /api/passage unless the client asks for others
+PASSAGE_FIELDS = frozenset({"ids", "verses"})
+# Fields returned by /api/search unless the client asks for others
+SEARCH_RESULT_FIELDS = frozenset({"text"})
+
 # Load environment variables from .env file
 load_dotenv()
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
@@ -71,14 +140,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Serve static files from /site
-app.mount("/site", __import__("fastapi.staticfiles", fromlist=["StaticFiles"]).StaticFiles(directory="site"), name="site")
+# Static site files, fingerprinted and compressed once at startup
+site = StaticSite("site", prefix="/site")
+
+def static_response(request: Request, asset, immutable: bool):
+    status, body, headers = site.respond(asset, immutable, request.headers.get("accept-encoding", ""),
+                                         request.headers.get("if-none-match", ""))
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        body = b""
+    return Response(body, status_code=status, headers=headers)
+
+@app.api_route("/site/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def serve_site_file(request: Request, name: str):
+    """Site files; fingerprinted names (``script.<hash>.js``) may be cached forever."""
+    asset, immutable = site.lookup(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Bestand niet gevonden")
+    return static_response(request, asset, immutable)
 
 # Simple analytics middleware (log endpoint and IP)
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     ip = request.client.host
     path = request.url.path
+    if request.url.query:
+        path = f"{path}?{request.url.query}"
     logging.info(f"Request: {ip} {path}")
     response = await call_next(request)
     return response
@@ -87,65 +174,394 @@ async def log_requests(request: Request, call_next):
 
 # --- Statenvertaling only ---
 # Note: App branded as BijbelQuiz Scriptura (Developed by BijbelQuiz)
-def load_statenvertaling():
+# Extra old -> modern spelling pairs for search and lookup, e.g. {"zeide": "zei"};
+# mapping a word to itself removes it from the built-in map
+SPELLING_PATH = os.path.join("data", "spelling.json")
+
+def load_normalizer():
+    spelling = dict(SPELLING_MAP)
+    if os.path.exists(SPELLING_PATH):
+        with open(SPELLING_PATH, encoding="utf-8") as f:
+            spelling.update(json.load(f))
+    return Normalizer(spelling)
+
+# Per-translation overrides of the half-verse splits (data/segments/<version>.json)
+SEGMENTS_DIRECTORY = os.path.join("data", "segments")
+
+def segments_path(version_key):
+    return os.path.join(SEGMENTS_DIRECTORY, f"{version_key}.json")
+
+def load_statenvertaling(normalizer=None):
     path = os.path.join("data", "statenvertaling.json")
+    segments = load_segments(segments_path("statenvertaling"))
     if not os.path.exists(path):
         logging.warning(f"Statenvertaling file '{path}' not found.")
-        return {"meta": {}, "data": {}}
-    with open(path, encoding="utf-8") as f:
-        raw_data = json.load(f)
-    structured_data = {}
-    for verse in raw_data.get("verses", []):
-        book = verse.get("book_name")
-        chapter = str(verse.get("chapter"))
-        verse_number = str(verse.get("verse"))
-        text = verse.get("text")
-        if book not in structured_data:
-            structured_data[book] = {}
-        if chapter not in structured_data[book]:
-            structured_data[book][chapter] = {}
-        structured_data[book][chapter][verse_number] = text
-    return {"meta": raw_data.get("metadata", {}), "data": structured_data}
-
-statenvertaling = load_statenvertaling()
-
-def normalize_book_name(book_name):
-    data = statenvertaling["data"]
-    for name in data:
-        if name.lower().replace("ë", "e") == book_name.lower().replace("ë", "e"):
-            return name
+        return build_version([], "statenvertaling", {}, normalizer, segments)
+    return load_version(path, "statenvertaling", "json", normalizer, segments)
+
+def load_added_versions(normalizer=None):
+    """Load the translations added with `python -m corpus` (data/versions/*.ndjson)."""
+    versions = {}
+    directory = os.path.join("data", "versions")
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".ndjson"):
+                version_key = name[:-len(".ndjson")]
+                versions[version_key] = load_version(os.path.join(directory, name), version_key, "ndjson",
+                                                     normalizer, load_segments(segments_path(version_key)))
+    return versions
+
+def load_all_versions():
+    """All translations, keyed by version name."""
+    normalizer = load_normalizer()
+    versions = {"statenvertaling": load_statenvertaling(normalizer)}
+    versions.update(load_added_versions(normalizer))
+    return versions
+
+def corpus_sources():
+    """Files the corpus is built from; a change to any of them triggers a reload."""
+    paths = [os.path.join("data", "statenvertaling.json"), SPELLING_PATH]
+    directory = os.path.join("data", "versions")
+    if os.path.isdir(directory):
+        paths += [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".ndjson")]
+    if os.path.isdir(SEGMENTS_DIRECTORY):
+        paths += [os.path.join(SEGMENTS_DIRECTORY, name) for name in os.listdir(SEGMENTS_DIRECTORY)
+                  if name.endswith(".json")]
+    return paths
+
+# Popular requests replayed before a snapshot serves traffic (python -m server warmup)
+WARMUP_FILE = os.getenv("WARMUP_FILE", os.path.join("data", "warmup.txt"))
+WARMUP_BUDGET = float(os.getenv("WARMUP_BUDGET", "30"))
+# Optional file to save the caches to on shutdown and restore them from on start
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH")
+
+CHAPTER_CACHE_SIZE = 2048
+PARSE_CACHE_SIZE = 4096
+SEARCH_CACHE_SIZE = 512
+FREQUENCY_CACHE_SIZE = 128
+RELATED_CACHE_SIZE = 16
+EXTRACTOR_CACHE_SIZE = 16
+LENGTHS_CACHE_SIZE = 16
+
+# Longest reading plan, in days
+READING_PLAN_MAX_DAYS = 3660
+
+# Longest text /api/extract scans, in characters
+EXTRACT_MAX_LENGTH = 1_000_000
+
+# Limits for regular expression and wildcard searches
+PATTERN_SEARCH_BUDGET = float(os.getenv("PATTERN_SEARCH_BUDGET", "0.5"))
+PATTERN_RESULT_LIMIT = 1000
+
+# Optional SQLite file shared by all workers on the host for rendered responses
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+RESPONSE_CACHE_MB = int(os.getenv("RESPONSE_CACHE_MB", "256"))
+response_cache = DiskCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MB * 1024 * 1024) if RESPONSE_CACHE_PATH else None
+
+def warm_caches(snapshot):
+    """Fill the caches of a new snapshot before it serves traffic."""
+    if CACHE_SNAPSHOT_PATH and load_caches(snapshot, CACHE_SNAPSHOT_PATH):
+        logging.info(f"Restored cached responses from {CACHE_SNAPSHOT_PATH}")
+        return
+    targets = read_warmup_file(WARMUP_FILE)
+    if targets:
+        started = time.monotonic()
+        warmed = replay(snapshot, targets, WARMERS, WARMUP_BUDGET)
+        logging.info(f"Warmed {warmed} of {len(targets)} requests in {time.monotonic() - started:.2f}s")
+
+# Reloadable handle on all loaded translations; each request works on the
+# snapshot that was current when it started. /ready only reports ready once
+# the first snapshot is warm.
+corpus = CorpusHandle(load_all_versions, corpus_sources, warmups=[warm_snapshot, warm_caches])
+
+PRELOAD_CORPUS = os.getenv("PRELOAD_CORPUS", "1") != "0"
+CORPUS_WATCH_INTERVAL = float(os.getenv("CORPUS_WATCH_INTERVAL", "0"))
+
+# Deterministic endpoints whose responses get an ETag tied to the corpus snapshot
+ETAG_PATHS = (
+    "/api/verse", "/api/passage", "/api/books", "/api/chapters", "/api/verses",
+    "/api/versification", "/api/search", "/api/chapter", "/api/parse/reference/",
+    "/api/parallel", "/api/commentary", "/api/concordance", "/api/frequency",
+    "/api/related", "/api/export", "/api/reading-plan",
+)
+# Random endpoints that are deterministic once a seed is given
+SEEDED_PATHS = ("/api/random/batch",)
+
+@app.middleware("http")
+async def use_corpus_snapshot(request: Request, call_next):
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    # The first load runs off the event loop so /ready keeps answering meanwhile
+    snapshot = corpus.current() if corpus.loaded else await run_in_threadpool(corpus.current)
+    request.state.corpus = snapshot
+    etag = None
+    if request.method == "GET" and (request.url.path.startswith(ETAG_PATHS) or (
+            request.url.path in SEEDED_PATHS and request.query_params.get("seed"))):
+        key = f"{request.url.path}?{request.url.query}".encode("utf-8")
+        etag = f'W/"{snapshot.etag}-{hashlib.sha256(key).hexdigest()[:16]}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+    response = await call_next(request)
+    if (etag and response.status_code == 200 and "etag" not in response.headers
+            and response.headers.get("cache-control") != "no-store"):
+        response.headers["ETag"] = etag
+    return response
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the corpus is loaded, 503 before that."""
+    if not corpus.loaded:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True, "generation": corpus.current().generation}
+
+RELOAD_TOKEN = os.getenv("RELOAD_TOKEN")
+
+@app.post("/admin/reload")
+@limiter.limit("5/minute")
+def reload_corpus(request: Request, force: bool = False):
+    """Rebuild the corpus in the background and swap it in once it is warm."""
+    token = request.headers.get("x-admin-token", "")
+    if not RELOAD_TOKEN or not hmac.compare_digest(token, RELOAD_TOKEN):
+        raise HTTPException(status_code=403, detail="Geen toegang")
+    corpus.reload_in_background(force=force)
+    return {"status": "reloading", "generation": corpus.current().generation}
+
+def get_snapshot(request):
+    """Corpus snapshot serving this request."""
+    return request.state.corpus
+
+def get_versions(request):
+    """Versions of the corpus snapshot serving this request."""
+    return request.state.corpus.versions
+
+def get_version_key(versions, version):
+    for key in versions:
+        if key.lower() == version.lower():
+            return key
     return None
 
+def normalize_book_name(versions, book_name, version_key="statenvertaling"):
+    """Book key for a name, ignoring case and accents (folded lookup built at load time)."""
+    version = versions[version_key]
+    return version["book_lookup"].get(version["search_index"].fold(book_name))
+
+def cached_response(snapshot, endpoint, params, render):
+    """Rendered response body from the shared disk cache, rendering it on a miss."""
+    if response_cache is None:
+        return render()
+    key = cache_key(snapshot.source_fingerprint, endpoint, params)
+    body = response_cache.get(key)
+    if body is None:
+        body = response_cache.put(key, render())
+    return body
+
+def json_body(body):
+    return Response(body, media_type="application/json")
+
+def render_chapter(snapshot, version, book, chapter):
+    """Encoded /api/chapter response, cached per snapshot."""
+    versions = snapshot.versions
+    version_key = get_version_key(versions, version)
+    if not version_key:
+        raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+    book_key = normalize_book_name(versions, book, version_key)
+    if not book_key:
+        raise HTTPException(status_code=404, detail="Boek niet gevonden")
+    cache = snapshot_cache(snapshot, "chapters", CHAPTER_CACHE_SIZE)
+    key = (version_key, book_key, chapter)
+    body = cache.get(key)
+    if body is None:
+        def render():
+            try:
+                verses = versions[version_key]["data"][book_key][chapter]
+            except KeyError:
+                raise HTTPException(status_code=404, detail="Hoofdstuk niet gevonden")
+            return encode_json({
+                "version": version_key,
+                "book": book_key,
+                "chapter": chapter,
+                "verses": verses,
+            })
+        params = {"version": version_key, "book": book_key, "chapter": chapter}
+        body = cache.put(key, cached_response(snapshot, "chapter", params, render))
+    return body
+
+def cached_parse(snapshot, reference, version):
+    """Parse a reference, reusing the result for repeated references in a snapshot."""
+    cache = snapshot_cache(snapshot, "parse", PARSE_CACHE_SIZE)
+    key = (version.lower(), reference)
+    result = cache.get(key)
+    if result is None:
+        parser = ReferenceParser(all_versions=snapshot.versions, version=version)
+        result = cache.put(key, parser.parse(reference, version))
+    return result
+
+def render_parse(snapshot, reference, version, selected):
+    """Encoded parse result with only the selected fields."""
+    params = {
+        "reference": reference,
+        "version": version.lower(),
+        "fields": ",".join(sorted(selected)) if selected is not None else None,
+    }
+    return cached_response(snapshot, "parse", params,
+                           lambda: encode_json(select_fields(cached_parse(snapshot, reference, version), selected)))
+
+def cached_search(snapshot, query, scope=None):
+    """Document numbers of the Statenvertaling verses matching a query."""
+    cache = snapshot_cache(snapshot, "search", SEARCH_CACHE_SIZE)
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    key = (search_index.fold(query), tuple(scope) if scope is not None else None)
+    docs = cache.get(key)
+    if docs is None:
+        docs = cache.put(key, search_index.search(query, scope))
+    return docs
+
+SEARCH_MODES = ("text", "regex", "wildcard")
+
+def cached_pattern_search(snapshot, pattern, scope=None):
+    """Verses of the Statenvertaling matching a compiled pattern, within the limits.
+
+    Returns:
+        The document numbers, and whether the time budget ran out; such
+        incomplete results are not cached
+    """
+    cache = snapshot_cache(snapshot, "search", SEARCH_CACHE_SIZE)
+    # Kept apart from the plain text searches sharing the cache
+    key = ("pattern", pattern.regex.pattern, tuple(scope) if scope is not None else None)
+    docs = cache.get(key)
+    if docs is not None:
+        return docs, False
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    docs, timed_out = search_index.pattern_search(pattern, scope, PATTERN_RESULT_LIMIT, PATTERN_SEARCH_BUDGET)
+    if not timed_out:
+        cache.put(key, docs)
+    return docs, timed_out
+
+# Last book of the Old Testament in canonical numbering (Malachi)
+OLD_TESTAMENT_BOOKS = 39
+
+# Book and chapter range without verses, e.g. "Mattheüs 5-7"
+CHAPTER_RANGE_RE = re.compile(r"^(.+?)\s+(\d+)\s*[-–]\s*(\d+)$")
+
+def search_scope(snapshot, books=None, testament=None, reference_range=None):
+    """Document ranges of the Statenvertaling to search; None searches everything.
+
+    Each given filter narrows the scope further. A range of chapters
+    (``Mattheüs 5-7``) covers those chapters whole; other references
+    cover the verses they parse to.
+    """
+    versions = snapshot.versions
+    search_index = versions["statenvertaling"]["search_index"]
+    scopes = []
+    if books:
+        ranges = []
+        for name in books.split(","):
+            book_key = normalize_book_name(versions, name.strip())
+            if not book_key:
+                raise HTTPException(status_code=404, detail=f"Boek niet gevonden: {name.strip()}")
+            ranges.append(search_index.book_range(book_key) or (0, 0))
+        scopes.append(merge_ranges(ranges))
+    if testament:
+        if testament.lower() not in ("ot", "nt"):
+            raise HTTPException(status_code=400, detail="Testament moet 'ot' of 'nt' zijn")
+        structure = versions["statenvertaling"]["structure"]
+        old = testament.lower() == "ot"
+        numbers = {name: book_number_from_name(name) for name in structure.book_names()}
+        scopes.append(merge_ranges(
+            search_index.book_range(name) or (0, 0) for name, number in numbers.items()
+            if number is not None and (number <= OLD_TESTAMENT_BOOKS) == old
+        ))
+    if reference_range:
+        ranges = []
+        for reference in reference_range.split(";"):
+            reference = reference.strip()
+            # "Mattheüs 5-7" is a range of whole chapters here, not Mattheüs 5:1-7
+            chapters = CHAPTER_RANGE_RE.match(reference)
+            if chapters:
+                book, first, last = chapters.group(1), int(chapters.group(2)), int(chapters.group(3))
+                if first > last:
+                    raise HTTPException(status_code=400, detail=f"Ongeldig hoofdstukbereik: {reference}")
+                reference = f"{book} {first}"
+            result = cached_parse(snapshot, reference, "statenvertaling")
+            if not result["parsed"]:
+                raise HTTPException(status_code=400, detail=result.get("error", "Ongeldige verwijzing"))
+            if chapters:
+                book_key = result["verses"][0].ref[0]
+                ranges.append(search_index.chapter_range(book_key, first, last))
+                continue
+            for verse in result["verses"]:
+                book, chapter = verse.ref
+                doc = search_index.doc_of(book, chapter, verse.verse)
+                if doc is not None:
+                    ranges.append((doc, doc + 1))
+        scopes.append(merge_ranges(ranges))
+    if not scopes:
+        return None
+    scope = scopes[0]
+    for other in scopes[1:]:
+        scope = intersect_ranges(scope, other)
+    return scope
+
+# Replay handlers for the warmup file, keyed by request path
+WARMERS = {
+    "/api/chapter": lambda snapshot, path, params: render_chapter(
+        snapshot, params.get("version", "statenvertaling"), params["book"], params["chapter"]),
+    "/api/parse/reference/": lambda snapshot, path, params: cached_parse(
+        snapshot, path[len("/api/parse/reference/"):], params.get("version", "asv")),
+    "/api/search": lambda snapshot, path, params: cached_search(snapshot, params["query"]),
+    "/api/related": lambda snapshot, path, params: related_verses(
+        snapshot, get_version_key(snapshot.versions, params.get("version", "statenvertaling"))),
+    "/api/frequency": lambda snapshot, path, params: word_ranking(snapshot, search_scope(
+        snapshot, params.get("books"), params.get("testament"), params.get("range"))),
+}
+
 
 # --- Serve index.html on /
-@app.get("/", response_class=FileResponse)
-def serve_index():
-    index_path = os.path.join("site", "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path, media_type="text/html")
-    raise HTTPException(status_code=404, detail="index.html niet gevonden")
+@app.api_route("/", methods=["GET", "HEAD"], response_class=HTMLResponse)
+def serve_index(request: Request):
+    asset, _ = site.lookup("index.html")
+    if asset is None:
+        raise HTTPException(status_code=404, detail="index.html niet gevonden")
+    return static_response(request, asset, immutable=False)
 
 # --- Existing Bible endpoints (unchanged) ---
 @app.get("/api/random")
 @limiter.limit("20/minute")
 def get_random_verse(request: Request):
-    data = statenvertaling["data"]
-    book = random.choice(list(data.keys()))
-    chapter = random.choice(list(data[book].keys()))
-    verse = random.choice(list(data[book][chapter].keys()))
-    return {
+    search_index = get_versions(request)["statenvertaling"]["search_index"]
+    # Verses are numbered in canonical order, so a random number is a random verse
+    return {"version": "statenvertaling", **search_index.result(random.randrange(len(search_index.refs)))}
+
+@app.get("/api/random/batch")
+@limiter.limit("20/minute")
+def get_random_batch(request: Request, count: int = Query(10, ge=1, le=100), unique: bool = True,
+                     seed: str = None, books: str = None, testament: str = None):
+    """Several random verses at once, e.g. for a quiz round.
+
+    With ``unique`` (the default) no verse appears twice; asking for more
+    verses than the books hold returns all of them. The same ``seed``
+    always gives the same verses for a corpus, so seeded rounds can be
+    shared and cached.
+    """
+    snapshot = get_snapshot(request)
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    scope = search_scope(snapshot, books, testament)
+    if scope is None:
+        scope = [(0, len(search_index.refs))]
+    rng = random.Random(seed) if seed else random.Random()
+    docs = sample_scope(rng, scope, count, unique)
+    return compact_response({
         "version": "statenvertaling",
-        "book": book,
-        "chapter": chapter,
-        "verse": verse,
-        "text": data[book][chapter][verse],
-    }
+        "seed": seed,
+        "verses": [search_index.result(doc) for doc in docs],
+    })
 
 @app.get("/api/verse")
 @limiter.limit("30/minute")
 def get_verse(book: str, chapter: str, verse: str, request: Request):
-    data = statenvertaling["data"]
-    book_key = normalize_book_name(book)
+    versions = get_versions(request)
+    data = versions["statenvertaling"]["data"]
+    book_key = normalize_book_name(versions, book)
     if not book_key:
         raise HTTPException(status_code=404, detail="Boek niet gevonden")
     try:
@@ -162,34 +578,48 @@ def get_verse(book: str, chapter: str, verse: str, request: Request):
 
 @app.get("/api/passage")
 @limiter.limit("10/minute")
-def get_passage(book: str, chapter: str, start: int, end: int, request: Request):
-    data = statenvertaling["data"]
-    book_key = normalize_book_name(book)
+def get_passage(book: str, chapter: str, start: int, end: int, request: Request, fields: str = None):
+    snapshot = get_snapshot(request)
+    versions = snapshot.versions
+    selected = get_fields(fields, default=PASSAGE_FIELDS)
+    data = versions["statenvertaling"]["data"]
+    book_key = normalize_book_name(versions, book)
     if not book_key:
         raise HTTPException(status_code=404, detail="Boek niet gevonden")
-    try:
-        verses = []
-        for i in range(start, end + 1):
-            verses.append({"verse": str(i), "text": data[book_key][str(chapter)][str(i)]})
-        return {
+
+    def render():
+        try:
+            chapter_verses = data[book_key][str(chapter)]
+            verses = VerseList()
+            for i in range(start, end + 1):
+                verse_key = str(i)
+                verses.append(Verse(verse_key, chapter_verses[verse_key]))
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Passage niet gevonden")
+        result = ParseResult({
             "version": "statenvertaling",
             "book": book_key,
             "chapter": chapter,
             "verses": verses,
-        }
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Passage niet gevonden")
+        })
+        return encode_json(select_fields(result, selected))
+
+    params = {"book": book_key, "chapter": chapter, "start": start, "end": end,
+              "fields": ",".join(sorted(selected))}
+    return json_body(cached_response(snapshot, "passage", params, render))
 
 @app.get("/api/books")
 @limiter.limit("30/minute")
 def get_books(request: Request):
-    return list(statenvertaling["data"].keys())
+    versions = get_versions(request)
+    return list(versions["statenvertaling"]["data"].keys())
 
 @app.get("/api/chapters")
 @limiter.limit("30/minute")
 def get_chapters(book: str, request: Request):
-    data = statenvertaling["data"]
-    book_key = normalize_book_name(book)
+    versions = get_versions(request)
+    data = versions["statenvertaling"]["data"]
+    book_key = normalize_book_name(versions, book)
     if not book_key:
         raise HTTPException(status_code=404, detail="Boek niet gevonden")
     return list(data[book_key].keys())
@@ -197,8 +627,9 @@ def get_chapters(book: str, request: Request):
 @app.get("/api/verses")
 @limiter.limit("30/minute")
 def get_verses(book: str, chapter: str, request: Request):
-    data = statenvertaling["data"]
-    book_key = normalize_book_name(book)
+    versions = get_versions(request)
+    data = versions["statenvertaling"]["data"]
+    book_key = normalize_book_name(versions, book)
     if not book_key:
         raise HTTPException(status_code=404, detail="Boek niet gevonden")
     try:
@@ -206,27 +637,280 @@ def get_verses(book: str, chapter: str, request: Request):
     except KeyError:
         raise HTTPException(status_code=404, detail="Hoofdstuk niet gevonden")
 
+@app.get("/api/structure")
+@limiter.limit("30/minute")
+def get_structure(request: Request, version: str = "statenvertaling"):
+    """Whole layout of a version: books, chapters per book and verses per chapter."""
+    versions = get_versions(request)
+    version_key = get_version_key(versions, version)
+    if not version_key:
+        raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+    structure = versions[version_key]["structure"]
+    headers = {"ETag": structure.etag(), "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == structure.etag():
+        return Response(status_code=304, headers=headers)
+    return Response(structure.encoded(), media_type="application/json", headers=headers)
+
+@app.get("/api/versification")
+@limiter.limit("30/minute")
+def map_verse(book: str, chapter: int, verse: int, request: Request,
+              version: str = "statenvertaling", target: str = None):
+    """Translate a verse number between the versification of two versions."""
+    versions = get_versions(request)
+    version_key = get_version_key(versions, version)
+    if not version_key:
+        raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+    book_key = normalize_book_name(versions, book, version_key)
+    if not book_key:
+        raise HTTPException(status_code=404, detail="Boek niet gevonden")
+    verse_map = versions[version_key]["verse_map"]
+    if versions[version_key]["structure"].ordinal(book_key, chapter, verse) is None:
+        raise HTTPException(status_code=404, detail="Vers niet gevonden")
+    packed = verse_map.to_canonical(book_key, chapter, verse)
+    result = {
+        "version": version_key,
+        "scheme": verse_map.scheme,
+        "book": book_key,
+        "chapter": str(chapter),
+        "verse": str(verse),
+        "canonical": None,
+    }
+    if packed is not None:
+        book_number, canonical_chapter, canonical_verse = split_verse_id(packed)
+        result["canonical"] = {
+            "id": packed,
+            "book_number": book_number,
+            "chapter": canonical_chapter,
+            "verse": canonical_verse,
+        }
+    if target:
+        target_key = get_version_key(versions, target)
+        if not target_key:
+            raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+        target_map = versions[target_key]["verse_map"]
+        mapped = target_map.from_canonical(packed) if packed is not None else None
+        result["target"] = None if mapped is None else {
+            "version": target_key,
+            "book": mapped[0],
+            "chapter": mapped[1],
+            "verse": mapped[2],
+        }
+    return result
+
 @app.get("/api/search")
 @limiter.limit("10/minute")
-def search_verses(request: Request, query: str = Query(..., min_length=1)):
-    data = statenvertaling["data"]
+def search_verses(request: Request, query: str = Query(..., min_length=1), fields: str = None,
+                  context: int = Query(8, ge=0, le=50), books: str = None, testament: str = None,
+                  reference_range: str = Query(None, alias="range"), mode: str = "text"):
+    """Find verses containing the query.
+
+    ``books`` (comma-separated), ``testament`` (``ot`` or ``nt``) and
+    ``range`` (references such as ``Mattheüs 5-7`` for whole chapters or
+    ``Johannes 3:16-21``; several separated by ``;``) limit the search to
+    part of the Bible.
+
+    ``mode=regex`` treats the query as a regular expression
+    (``Heere.*Israël``) and ``mode=wildcard`` as words with ``*`` and
+    ``?`` (``zalig*``). Pattern searches return at most
+    ``PATTERN_RESULT_LIMIT`` verses and stop after
+    ``PATTERN_SEARCH_BUDGET`` seconds; a cut-off result carries an
+    ``X-Results-Truncated`` header.
+
+    ``fields`` chooses what each result carries besides the reference:
+    ``text`` (the default), ``matches`` (character offsets of the matches
+    in the text) and ``snippet`` (the text around the matches, ``context``
+    words on either side, with offsets into the snippet).
+    """
+    snapshot = get_snapshot(request)
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail="Zoekmodus moet 'text', 'regex' of 'wildcard' zijn")
+    selected = get_fields(fields, default=SEARCH_RESULT_FIELDS, allowed=SEARCH_FIELDS)
+    scope = search_scope(snapshot, books, testament, reference_range)
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    headers = {}
+    if mode == "text":
+        docs = cached_search(snapshot, query, scope)
+    else:
+        try:
+            pattern = compile_pattern(query, mode == "wildcard", search_index.normalizer)
+        except PatternError as e:
+            raise HTTPException(status_code=400, detail=f"Ongeldig patroon: {e}")
+        docs, timed_out = cached_pattern_search(snapshot, pattern, scope)
+        if timed_out:
+            # Depends on the load of the server, so it must not be reused
+            headers = {"X-Results-Truncated": "timeout", "Cache-Control": "no-store"}
+        elif len(docs) == PATTERN_RESULT_LIMIT:
+            headers = {"X-Results-Truncated": "limit"}
+    results = []
+    for doc in docs:
+        result = search_index.result(doc)
+        if "text" not in selected:
+            del result["text"]
+        if "matches" in selected or "snippet" in selected:
+            if mode == "text":
+                spans = search_index.matches(doc, query)
+            else:
+                spans = search_index.pattern_matches(doc, pattern)
+            if "matches" in selected:
+                result["matches"] = [list(span) for span in spans]
+            if "snippet" in selected:
+                result["snippet"] = search_index.snippet(doc, spans, context)
+        results.append(result)
+    response = compact_response(results)
+    response.headers.update(headers)
+    return response
+
+def related_verses(snapshot, version_key):
+    """TF-IDF weights of a version, computed once per snapshot."""
+    cache = snapshot_cache(snapshot, "related", RELATED_CACHE_SIZE)
+    related = cache.get(version_key)
+    if related is None:
+        related = cache.put(version_key, RelatedVerses(snapshot.versions[version_key]["search_index"]))
+    return related
+
+@app.get("/api/related")
+@limiter.limit("20/minute")
+def get_related(request: Request, book: str, chapter: str, verse: str,
+                k: int = Query(10, ge=1, le=100), version: str = "statenvertaling"):
+    """Verses most similar to a verse by their words (TF-IDF cosine similarity)."""
+    snapshot = get_snapshot(request)
+    version_key = get_version_key(snapshot.versions, version)
+    if not version_key:
+        raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+    book_key = normalize_book_name(snapshot.versions, book, version_key)
+    if not book_key:
+        raise HTTPException(status_code=404, detail="Boek niet gevonden")
+    search_index = snapshot.versions[version_key]["search_index"]
+    doc = search_index.doc_of(book_key, chapter, verse)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Vers niet gevonden")
     results = []
-    for book, chapters in data.items():
-        for chapter, verses in chapters.items():
-            for verse_number, text in verses.items():
-                if query.lower() in text.lower():
-                    results.append({
-                        "book": book,
-                        "chapter": chapter,
-                        "verse": verse_number,
-                        "text": text,
-                    })
-    return results
+    for other, score in related_verses(snapshot, version_key).related(search_index, doc, k):
+        result = search_index.result(other)
+        result["score"] = round(score, 4)
+        results.append(result)
+    return compact_response({"version": version_key, **search_index.result(doc), "related": results})
+
+def word_ranking(snapshot, scope=None):
+    """Words of the Statenvertaling by descending count, with the total word count."""
+    cache = snapshot_cache(snapshot, "frequency", FREQUENCY_CACHE_SIZE)
+    key = tuple(scope) if scope is not None else None
+    ranking = cache.get(key)
+    if ranking is None:
+        counts = snapshot.versions["statenvertaling"]["search_index"].word_counts(scope)
+        words = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        ranking = cache.put(key, (words, sum(counts.values())))
+    return ranking
+
+@app.get("/api/concordance")
+@limiter.limit("20/minute")
+def get_concordance(request: Request, word: str = Query(..., min_length=1),
+                    limit: int = Query(500, ge=0, le=5000), offset: int = Query(0, ge=0),
+                    books: str = None, testament: str = None,
+                    reference_range: str = Query(None, alias="range")):
+    """Every verse containing a word, with counts per book and chapter.
+
+    The word is matched whole, ignoring case, accents and old spelling.
+    ``limit`` and ``offset`` page through the verse list; the counts always
+    cover every verse. ``books``, ``testament`` and ``range`` work as in
+    /api/search.
+    """
+    snapshot = get_snapshot(request)
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    tokens = TOKEN_RE.findall(search_index.fold(word))
+    if len(tokens) != 1:
+        raise HTTPException(status_code=400, detail="Geef precies één woord op")
+    scope = search_scope(snapshot, books, testament, reference_range)
+    occurrences = search_index.occurrences(tokens[0], scope)
+    per_book = {}
+    for doc, count in occurrences:
+        book, chapter, _ = search_index.refs[doc]
+        entry = per_book.get(book)
+        if entry is None:
+            entry = per_book[book] = {"book": book, "count": 0, "verses": 0, "chapters": {}}
+        entry["count"] += count
+        entry["verses"] += 1
+        entry["chapters"][chapter] = entry["chapters"].get(chapter, 0) + count
+    verses = []
+    for doc, count in occurrences[offset:offset + limit]:
+        book, chapter, verse = search_index.refs[doc]
+        verses.append({"book": book, "chapter": chapter, "verse": verse, "count": count})
+    return compact_response({
+        "word": tokens[0],
+        "count": sum(entry["count"] for entry in per_book.values()),
+        "verse_count": len(occurrences),
+        "books": list(per_book.values()),
+        "verses": verses,
+    })
+
+@app.get("/api/frequency")
+@limiter.limit("20/minute")
+def get_frequency(request: Request, limit: int = Query(100, ge=1, le=10000),
+                  min_length: int = Query(1, ge=1), books: str = None, testament: str = None,
+                  reference_range: str = Query(None, alias="range")):
+    """Most frequent words, in the whole Bible or within books, a testament or a range.
+
+    Words are counted in folded form (lowercase, without accents), as they are spelled.
+    """
+    snapshot = get_snapshot(request)
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    scope = search_scope(snapshot, books, testament, reference_range)
+    ranking, total = word_ranking(snapshot, scope)
+    words = []
+    for token, count in ranking:
+        if len(token) < min_length:
+            continue
+        words.append({"word": token, "count": count, "verses": search_index.verse_count(token, scope)})
+        if len(words) == limit:
+            break
+    return compact_response({"total": total, "distinct": len(ranking), "words": words})
+
+def verse_lengths(snapshot, version_key):
+    """Prefix sums of verse lengths of a version, computed once per snapshot."""
+    cache = snapshot_cache(snapshot, "lengths", LENGTHS_CACHE_SIZE)
+    lengths = cache.get(version_key)
+    if lengths is None:
+        lengths = cache.put(version_key, VerseLengths(snapshot.versions[version_key]["search_index"]))
+    return lengths
+
+@app.get("/api/reading-plan")
+@limiter.limit("20/minute")
+def get_reading_plan(request: Request, days: int = Query(..., ge=1, le=READING_PLAN_MAX_DAYS),
+                     scope: str = "bible", unit: str = "chars"):
+    """Split the Bible, a testament (``ot``/``nt``) or a range into days of equal reading length.
+
+    ``unit`` is ``chars`` or ``words``. A range is read as in /api/search:
+    ``Johannes 1-2`` is two whole chapters, several ranges are separated
+    by ``;``. Each day lists references that the parse endpoints accept.
+    """
+    snapshot = get_snapshot(request)
+    if unit not in UNITS:
+        raise HTTPException(status_code=400, detail="Eenheid moet 'chars' of 'words' zijn")
+    search_index = snapshot.versions["statenvertaling"]["search_index"]
+    if scope.lower() in ("bible", "all"):
+        ranges = [(0, len(search_index))]
+    elif scope.lower() in ("ot", "nt"):
+        ranges = search_scope(snapshot, testament=scope)
+    else:
+        ranges = search_scope(snapshot, reference_range=scope)
+    lengths = verse_lengths(snapshot, "statenvertaling")
+    try:
+        plan = reading_plan(search_index, lengths, ranges, days, unit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Het bereik heeft minder verzen dan dagen")
+    return compact_response({
+        "version": "statenvertaling",
+        "scope": scope,
+        "unit": unit,
+        "total": lengths.length(ranges, unit),
+        "days": plan,
+    })
 
 @app.get("/api/daytext")
 @limiter.limit("5/minute")
 def get_daytext(request: Request, seed: str = None):
-    data = statenvertaling["data"]
+    versions = get_versions(request)
+    data = versions["statenvertaling"]["data"]
     books = list(data.keys())
     base = seed if seed else date.today().isoformat()
     hash_val = int(hashlib.sha256(base.encode()).hexdigest(), 16)
@@ -247,81 +931,209 @@ def get_daytext(request: Request, seed: str = None):
 @app.get("/api/chapter")
 @limiter.limit("20/minute")
 def get_chapter(book: str, chapter: str, request: Request, version: str = "statenvertaling"):
-    version_key = get_version_key(version)
+    return json_body(render_chapter(get_snapshot(request), version, book, chapter))
+
+# Precompressed full-version exports, one file per version and corpus build
+EXPORT_DIRECTORY = os.getenv("EXPORT_DIRECTORY", os.path.join("data", "exports"))
+export_lock = threading.Lock()
+
+def export_version_key(snapshot, version):
+    version_key = get_version_key(snapshot.versions, version)
     if not version_key:
         raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
-    data = all_versions[version_key]["data"]
-    book_key = normalize_book_name(version_key, book)
-    if not book_key:
+    return version_key
+
+@app.get("/api/export")
+@limiter.limit("10/minute")
+def export_verses(request: Request, version: str = "statenvertaling", book: str = None,
+                  format: str = "ndjson", cursor: str = None, limit: int = Query(None, ge=1)):
+    """Stream the verses of a version, or of one book, in canonical order.
+
+    ``format`` is ``ndjson`` (one verse object per line), ``csv`` or
+    ``json``. ``limit`` cuts the export after that many verses; the
+    ``X-Next-Cursor`` header then holds the ``cursor`` to pass to
+    continue. A cursor names a verse (``book:chapter:verse``), so it stays
+    valid across corpus reloads.
+    """
+    snapshot = get_snapshot(request)
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Formaat moet 'ndjson', 'csv' of 'json' zijn")
+    version_key = export_version_key(snapshot, version)
+    search_index = snapshot.versions[version_key]["search_index"]
+    start, end = 0, len(search_index.refs)
+    if book:
+        book_key = normalize_book_name(snapshot.versions, book, version_key)
+        if not book_key or search_index.book_range(book_key) is None:
+            raise HTTPException(status_code=404, detail="Boek niet gevonden")
+        start, end = search_index.book_range(book_key)
+    if cursor:
+        parts = cursor.rsplit(":", 2)
+        doc = search_index.doc_of(*parts) if len(parts) == 3 else None
+        if doc is None or not start <= doc < end:
+            raise HTTPException(status_code=400, detail="Ongeldige cursor")
+        start = doc
+    headers = {}
+    if limit is not None and start + limit < end:
+        end = start + limit
+        headers["X-Next-Cursor"] = ":".join(search_index.refs[end])
+    refs, texts = search_index.refs, search_index.texts
+    records = (refs[doc] + (texts[doc],) for doc in range(start, end))
+    return StreamingResponse(export_chunks(records, format), media_type=MEDIA_TYPES[format], headers=headers)
+
+@app.get("/api/export/download")
+@limiter.limit("10/minute")
+def download_version(request: Request, version: str = "statenvertaling"):
+    """A whole version as gzip-compressed NDJSON, with byte-range support.
+
+    The file is written on the first download after each corpus load
+    and then served straight from disk.
+    """
+    snapshot = get_snapshot(request)
+    version_key = export_version_key(snapshot, version)
+    name = f"{version_key}-{snapshot.source_fingerprint[:16]}.ndjson.gz"
+    path = os.path.join(EXPORT_DIRECTORY, name)
+    if not os.path.exists(path):
+        with export_lock:
+            if not os.path.exists(path):
+                os.makedirs(EXPORT_DIRECTORY, exist_ok=True)
+                search_index = snapshot.versions[version_key]["search_index"]
+                write_artifact((ref + (text,) for ref, text in zip(search_index.refs, search_index.texts)), path)
+                # Exports of earlier corpus builds are no longer served
+                stale = re.compile(re.escape(version_key) + r"-[0-9a-f]{16}\.ndjson\.gz")
+                for old in os.listdir(EXPORT_DIRECTORY):
+                    if old != name and stale.fullmatch(old):
+                        os.remove(os.path.join(EXPORT_DIRECTORY, old))
+    return FileResponse(path, media_type="application/gzip", filename=f"{version_key}.ndjson.gz")
+
+
+# --- Commentaries ---
+commentaries = CommentaryLibrary(os.path.join("data", "commentary"))
+
+def commentary_book_number(versions, book):
+    """Resolve a book name via the canonical names or the Statenvertaling.
+
+    Books are matched by name only: a commentary numbers its books
+    canonically, which need not be their position in the Statenvertaling.
+    """
+    number = book_number_from_name(book)
+    if number is None:
+        book_key = normalize_book_name(versions, book)
+        if book_key:
+            number = book_number_from_name(book_key)
+    return number
+
+@app.get("/api/commentary")
+@limiter.limit("30/minute")
+def get_commentary(request: Request, source: str, book: str, chapter: int, verse: int = None):
+    store = commentaries.get(source)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Commentaar niet gevonden")
+    book_number = commentary_book_number(get_versions(request), book)
+    if book_number is None:
         raise HTTPException(status_code=404, detail="Boek niet gevonden")
-    try:
-        return {
-            "version": version_key,
-            "book": book_key,
-            "chapter": chapter,
-            "verses": data[book_key][chapter],
-        }
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Hoofdstuk niet gevonden")
+    result = {
+        "source": source,
+        "book": store.book_name(book_number) or book,
+        "chapter": str(chapter),
+    }
+    if verse is not None:
+        text = store.verse(book_number, chapter, verse)
+        if text is None:
+            raise HTTPException(status_code=404, detail="Geen commentaar op dit vers")
+        result["verse"] = str(verse)
+        result["text"] = text
+        return result
+    entries = store.chapter(book_number, chapter)
+    if not entries:
+        raise HTTPException(status_code=404, detail="Geen commentaar op dit hoofdstuk")
+    result["introduction"] = entries.pop(0, None)
+    result["verses"] = [{"verse": str(number), "text": text} for number, text in entries.items()]
+    return result
 
+@app.get("/api/commentary/sources")
+@limiter.limit("30/minute")
+def get_commentary_sources(request: Request):
+    return commentaries.sources()
 
-# --- API-key authenticatie ---
-# Database setup (SQLite)
-engine = create_engine("sqlite:///./test.db")
-SessionLocal = sessionmaker(bind=engine)
-Base.metadata.create_all(bind=engine)
 
+# --- API-key authenticatie ---
+# The database is set up on first use (see database.py)
 api_key_header = APIKeyHeader(name="x-api-key")
 
 def is_valid_key_in_db(key: str):
-    session = SessionLocal()
+    from models import APIKey
+    session = get_session()
     api_key = session.query(APIKey).filter_by(api_key=key, active=True).first()
     session.close()
     return api_key is not None
 
-def verify_api_key(key: str = Security(api_key_header)):
+# Requests per key and endpoint, counted in memory and flushed in batches (see billing/usage.py)
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))
+usage_meter = UsageMeter(get_session, USAGE_FLUSH_INTERVAL)
+
+def verify_api_key(request: Request, key: str = Security(api_key_header)):
     if not is_valid_key_in_db(key):
         raise HTTPException(status_code=403, detail="Invalid or expired key")
+    # The route template, so /api/parse/reference/{reference} is one endpoint
+    route = request.scope.get("route")
+    usage_meter.record(key, getattr(route, "path", request.url.path))
+    return key
 
 @app.get("/secure-data")
 @limiter.limit("10/minute")
 def secure_data(request: Request, _: str = Depends(verify_api_key)):
     return {"message": "Je bent geauthenticeerd!"}
+
+@app.get("/api/usage")
+@limiter.limit("10/minute")
+def get_usage(request: Request, since: date = None, key: str = Depends(verify_api_key)):
+    """Requests made with the caller's API key, per endpoint and day (UTC)."""
+    entries = usage_meter.usage(key, since.isoformat() if since else None)
+    return {"total": sum(entry["count"] for entry in entries), "usage": entries}
 # --- einde authenticatie ---
 
-# Import parsing modules
-from parsing.reference_parser import ReferenceParser
 from pydantic import BaseModel
+from typing import Optional
 
 # Pydantic models for parsing requests
 class ParseRequest(BaseModel):
     reference: str
     version: str = "asv"
+    fields: Optional[list[str]] = None
 
 class ParseMultipleRequest(BaseModel):
     references: list[str]
     version: str = "asv"
+    fields: Optional[list[str]] = None
+
+class ExtractRequest(BaseModel):
+    text: str
+    version: str = "statenvertaling"
+    limit: Optional[int] = None
 
 # Parsing endpoints
 @app.post("/api/parse/reference")
 @limiter.limit("20/minute")
 def parse_reference(request: Request, parse_req: ParseRequest):
     """Parse a single Bible reference with complex parsing support."""
+    snapshot = get_snapshot(request)
+    selected = get_fields(parse_req.fields)
     try:
-        parser = ReferenceParser(all_versions=all_versions, version=parse_req.version)
-        result = parser.parse(parse_req.reference, parse_req.version)
-        return result
+        return json_body(render_parse(snapshot, parse_req.reference, parse_req.version, selected))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/parse/reference/{reference}")
 @limiter.limit("20/minute")
-def parse_single_reference(request: Request, reference: str, version: str = "asv"):
-    """Parse a single Bible reference via GET request."""
+def parse_single_reference(request: Request, reference: str, version: str = "asv", fields: str = None):
+    """Parse a single Bible reference via GET request.
+
+    Use ``fields`` (e.g. ``ids,verses``) to return only part of the result.
+    """
+    snapshot = get_snapshot(request)
+    selected = get_fields(fields)
     try:
-        parser = ReferenceParser(all_versions=all_versions, version=version)
-        result = parser.parse(reference, version)
-        return result
+        return json_body(render_parse(snapshot, reference, version, selected))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -329,19 +1141,78 @@ def parse_single_reference(request: Request, reference: str, version: str = "asv
 @limiter.limit("10/minute")
 def parse_multiple_references(request: Request, parse_req: ParseMultipleRequest):
     """Parse multiple Bible references with complex parsing support."""
+    snapshot = get_snapshot(request)
+    selected = get_fields(parse_req.fields)
     try:
-        parser = ReferenceParser(all_versions=all_versions, version=parse_req.version)
         results = []
         for reference in parse_req.references:
-            result = parser.parse(reference, parse_req.version)
-            results.append(result)
-        return {"references": results}
+            result = cached_parse(snapshot, reference, parse_req.version)
+            results.append(select_fields(result, selected))
+        return compact_response({"references": results})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def reference_extractor(snapshot, version_key):
+    """Book name automaton of a version, compiled once per snapshot."""
+    cache = snapshot_cache(snapshot, "extractor", EXTRACTOR_CACHE_SIZE)
+    extractor = cache.get(version_key)
+    if extractor is None:
+        extractor = cache.put(version_key, ReferenceExtractor(version_aliases(snapshot.versions[version_key])))
+    return extractor
+
+@app.post("/api/extract")
+@limiter.limit("20/minute")
+def extract_references(request: Request, extract_req: ExtractRequest):
+    """Find the Bible references in a text, with their character spans.
+
+    Each reference is returned as written and in the form the parse
+    endpoints read, using the book names of ``version``.
+    """
+    snapshot = get_snapshot(request)
+    version_key = get_version_key(snapshot.versions, extract_req.version)
+    if not version_key:
+        raise HTTPException(status_code=404, detail="Vertaling niet gevonden")
+    if len(extract_req.text) > EXTRACT_MAX_LENGTH:
+        raise HTTPException(status_code=413, detail=f"Tekst is langer dan {EXTRACT_MAX_LENGTH} tekens")
+    if extract_req.limit is not None and extract_req.limit < 1:
+        raise HTTPException(status_code=400, detail="Limiet moet minstens 1 zijn")
+    references = reference_extractor(snapshot, version_key).extract(extract_req.text, extract_req.limit)
+    return compact_response({"version": version_key, "count": len(references), "references": references})
+
+@app.get("/api/parallel")
+@limiter.limit("20/minute")
+def get_parallel(request: Request, reference: str, versions: str = "statenvertaling"):
+    """Resolve one reference in several versions at once, aligned verse by verse.
+
+    The reference is parsed in the first version of ``versions``. A half
+    verse (``Habakuk 3:19a``) is cut to the same segment in every version,
+    each at its own clause boundaries.
+    """
+    loaded = get_versions(request)
+    version_keys = []
+    for name in versions.split(","):
+        version_key = get_version_key(loaded, name.strip())
+        if not version_key:
+            raise HTTPException(status_code=404, detail=f"Vertaling niet gevonden: {name.strip()}")
+        if version_key not in version_keys:
+            version_keys.append(version_key)
+    result = cached_parse(get_snapshot(request), reference, version_keys[0])
+    if not result["parsed"]:
+        raise HTTPException(status_code=400, detail=result.get("error", "Ongeldige verwijzing"))
+    rows = align_versions(result["verses"], {key: loaded[key] for key in version_keys})
+    return compact_response({
+        "reference": reference,
+        "versions": version_keys,
+        "rows": rows,
+    })
+
+# Stripe events are stored and acknowledged at once, then applied by a background worker
+webhook_queue = WebhookQueue(get_session)
+
 @app.post("/stripe/webhook")
 @limiter.limit("5/minute")
 async def stripe_webhook(request: Request):
+    import stripe
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
     try:
@@ -351,21 +1222,7 @@ async def stripe_webhook(request: Request):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    session = SessionLocal()
-
-    if event["type"] == "checkout.session.completed":
-        email = event["data"]["object"].get("customer_email")
-        if email:
-            api_key = str(uuid.uuid4())
-            session.add(APIKey(user_email=email, api_key=api_key, active=True))
-            session.commit()
-            # TODO: Stuur API-key per e-mail naar gebruiker
-    elif event["type"] in ["invoice.payment_failed", "customer.subscription.deleted"]:
-        email = event["data"]["object"].get("customer_email")
-        if email:
-            key = session.query(APIKey).filter_by(user_email=email).first()
-            if key:
-                key.active = False
-                session.commit()
-    session.close()
+    # A redelivered event is already stored and is acknowledged again
+    await run_in_threadpool(webhook_queue.enqueue, event["id"], event["type"], payload.decode("utf-8"))
+    webhook_queue.start()
     return {"status": "success"}
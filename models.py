@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, Float, Integer, String, Boolean, Text, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -9,3 +9,30 @@ class APIKey(Base):
     user_email = Column(String, unique=True)
     api_key = Column(String, unique=True)
     active = Column(Boolean, default=True)
+
+class WebhookEvent(Base):
+    """A received Stripe event, processed by the queue in billing/queue.py."""
+    __tablename__ = "webhook_events"
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String, unique=True, nullable=False)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)
+    # pending -> processing -> done, or failed after too many attempts
+    status = Column(String, default="pending", nullable=False, index=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(Float, default=0.0, nullable=False)
+    locked_until = Column(Float, default=0.0, nullable=False)
+    worker = Column(String)
+    last_error = Column(Text)
+    created_at = Column(Float, nullable=False)
+
+class APIUsage(Base):
+    """Requests per API key, endpoint and day, flushed by billing/usage.py."""
+    __tablename__ = "api_usage"
+    __table_args__ = (UniqueConstraint("api_key", "endpoint", "day"),)
+    id = Column(Integer, primary_key=True)
+    api_key = Column(String, nullable=False, index=True)
+    endpoint = Column(String, nullable=False)
+    # ISO date (UTC)
+    day = Column(String, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
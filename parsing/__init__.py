@@ -2,11 +2,16 @@
 Parsing module for enhanced Bible API.
 
 This module provides advanced Bible reference parsing capabilities,
-including support for complex references, discontinuous ranges, and
-cross-chapter references.
+including support for complex references, discontinuous ranges,
+cross-chapter references and half verses (19a), and extraction of
+references from free text.
 """
 
 from .reference_parser import ReferenceParser
 from .book_normalizer import BookNormalizer
+from .results import ParseResult, Verse, VerseList
+from .segments import SegmentTable, load_segments, split_offsets
+from .extractor import ReferenceExtractor, version_aliases
 
-__all__ = ['ReferenceParser', 'BookNormalizer']
+__all__ = ['ReferenceParser', 'BookNormalizer', 'ParseResult', 'Verse', 'VerseList',
+           'SegmentTable', 'load_segments', 'split_offsets', 'ReferenceExtractor', 'version_aliases']
@@ -0,0 +1,235 @@
+"""
+Reference extraction from free text.
+
+Sermon notes and articles mention references in running text ("zie
+Johannes 3:16 en 1 Kor. 13:4-7"). Every book name alias of a version is
+compiled into one Aho-Corasick automaton, so a single pass over the text
+finds all book names, however many aliases there are. Where a name is
+followed by a chapter (and verses) in the reference grammar, the
+reference is reported with its character span and in the form
+``ReferenceParser`` reads: whole chapters are written out as verse
+ranges ("Mattheüs 5-7" -> "Mattheüs 5:1-7:end"), since the parser reads
+"Mattheüs 5-7" as verses 5 to 7 of a one-chapter book. The pass is linear
+in the length of the text.
+
+Names are matched ignoring case, but the first letter of a name must be
+a capital, so words like "job" or "mark" in a sentence are skipped.
+"""
+
+import re
+import unicodedata
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from corpus.books import BOOKS, DUTCH_ABBREVIATIONS, DUTCH_NAMES
+from .book_normalizer import BookNormalizer
+
+# Verse number with an optional segment letter; see parsing.segments
+_VERSE = r"\d{1,3}[a-h]?\b"
+_DASH = r"[ \t]*[-–][ \t]*"
+# A list item followed by a capitalized word is the start of another reference ("23:1, 2 Kings")
+_ITEM = rf"[ \t]*,[ \t]*{_VERSE}(?:{_DASH}{_VERSE})?(?![ \t]*[A-ZÀ-Þ])"
+
+# What may follow a book name: chapter, then verses or a chapter range
+REFERENCE_TAIL = re.compile(
+    rf"\.?[ \t\u00a0]*(?P<chapter>\d{{1,3}})\b"
+    rf"(?::(?P<verses>{_VERSE}(?:{_DASH}(?:\d{{1,3}}:)?{_VERSE})?(?:{_ITEM})*)"
+    rf"|{_DASH}(?P<end_chapter>\d{{1,3}})\b(?!:))?"
+)
+
+
+def _fold(text: str) -> str:
+    """Lowercase ``text`` without changing its length, so offsets stay valid."""
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(lower if len(lower) == 1 else char
+                   for char, lower in ((char, char.lower()) for char in text))
+
+
+def _strip_accents(text: str) -> str:
+    decomposed = unicodedata.normalize("NFD", text)
+    return unicodedata.normalize("NFC", "".join(char for char in decomposed if not unicodedata.combining(char)))
+
+
+def alias_variants(alias: str) -> List[str]:
+    """Spellings of an alias to match: with and without accents, and "1Cor" / "1 Cor"."""
+    variants = {alias, _strip_accents(alias)}
+    for variant in list(variants):
+        match = re.match(r"([1-3])\s*(\S.*)", variant)
+        if match:
+            variants.add(f"{match.group(1)}{match.group(2)}")
+            variants.add(f"{match.group(1)} {match.group(2)}")
+    return sorted(variants)
+
+
+class BookAutomaton:
+    """Aho-Corasick automaton that finds every book name alias in a text."""
+
+    def __init__(self, aliases: Dict[str, str]):
+        """
+        Compile the automaton.
+
+        Args:
+            aliases: Alias -> book name it stands for
+        """
+        # Transitions, failure links and (alias length, book) outputs per state
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[Tuple[int, str], ...]] = [()]
+        for alias, book in aliases.items():
+            self._insert(_fold(alias), book)
+        self._link()
+
+    def _insert(self, alias: str, book: str) -> None:
+        if not alias:
+            return
+        state = 0
+        for char in alias:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if all(length != len(alias) for length, _ in self._output[state]):
+            self._output[state] += ((len(alias), book),)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                # Aliases that end here as a suffix of a longer one, longest first
+                self._output[next_state] += self._output[fail]
+                queue.append(next_state)
+
+    def matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """
+        Find every alias occurrence, including overlapping ones.
+
+        Yields:
+            (start, end, book) in order of the end offset
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(_fold(text)):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, book in output[state]:
+                yield position + 1 - length, position + 1, book
+
+
+def version_aliases(version: Dict[str, Any], normalizer: Optional[BookNormalizer] = None) -> Dict[str, str]:
+    """
+    Aliases of the books of a version.
+
+    Every book is known by its name in the version, and by its English
+    name, OSIS code, Statenvertaling name and Dutch abbreviations
+    ("1 Kor", "Ps") where the version has all books in canonical order
+    (or uses the English or Statenvertaling name itself);
+    ``BookNormalizer`` mappings are added for the books they resolve to.
+
+    Args:
+        version: Version entry from ``corpus.ingest.build_version``
+        normalizer: Extra mappings; defaults to a plain ``BookNormalizer``
+
+    Returns:
+        Alias -> book name in the version
+    """
+    structure = version.get("structure")
+    canonical = structure is not None and len(structure.book_names()) == len(BOOKS)
+    names: Dict[str, str] = {}
+    for name in version["data"]:
+        names[name] = name
+    for number, (osis, _, english) in enumerate(BOOKS, 1):
+        dutch = DUTCH_NAMES[number - 1]
+        name = structure.book_name(number) if canonical else None
+        if name is None:
+            name = next((known for known in (english, dutch) if known in version["data"]), None)
+        if name is not None:
+            for alias in (english, osis, dutch, *DUTCH_ABBREVIATIONS[number - 1]):
+                names.setdefault(alias, name)
+    for alias, target in (normalizer or BookNormalizer()).book_mappings.items():
+        if target in names:
+            names.setdefault(alias, names[target])
+    aliases: Dict[str, str] = {}
+    for alias, name in names.items():
+        for variant in alias_variants(alias):
+            aliases.setdefault(variant, name)
+    return aliases
+
+
+class ReferenceExtractor:
+    """Finds Bible references in free text."""
+
+    def __init__(self, aliases: Dict[str, str]):
+        """
+        Initialize an extractor.
+
+        Args:
+            aliases: Alias -> book name, e.g. from ``version_aliases``
+        """
+        self.automaton = BookAutomaton(aliases)
+
+    def extract(self, text: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find the references in a text.
+
+        Where references overlap, the one starting first wins, and of
+        those the longest ("1 John 3:16" rather than "John 3:16").
+
+        Args:
+            text: Text to scan
+            limit: Stop after this many references; None for all
+
+        Returns:
+            {"reference", "book", "text", "start", "end"} entries in text
+            order; "reference" uses the version's book name
+        """
+        found = []
+        for start, end, book in self.automaton.matches(text):
+            if start and text[start - 1].isalnum():
+                continue
+            initial = next((char for char in text[start:end] if char.isalpha()), "")
+            if not initial.isupper():
+                continue
+            tail = REFERENCE_TAIL.match(text, end)
+            if tail is None:
+                continue
+            found.append((start, -tail.end(), book, tail))
+        found.sort(key=lambda candidate: candidate[:2])
+        references = []
+        covered = 0
+        for start, negative_end, book, tail in found:
+            if start < covered:
+                continue
+            covered = -negative_end
+            references.append({
+                "reference": self._reference(book, tail),
+                "book": book,
+                "text": text[start:covered],
+                "start": start,
+                "end": covered,
+            })
+            if limit is not None and len(references) >= limit:
+                break
+        return references
+
+    @staticmethod
+    def _reference(book: str, tail: "re.Match") -> str:
+        reference = f"{book} {tail.group('chapter')}"
+        if tail.group("verses"):
+            verses = re.sub(r"\s+", "", tail.group("verses")).replace("–", "-")
+            return f"{reference}:{verses.replace(',', ', ')}"
+        if tail.group("end_chapter"):
+            return f"{reference}:1-{tail.group('end_chapter')}:end"
+        return f"{reference}:1-end"
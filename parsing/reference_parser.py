@@ -3,14 +3,17 @@ Main reference parser for complex Bible references.
 
 Handles parsing of complex Bible references including:
 - Discontinuous ranges (Psalm 139:1-5, 12-17)
-- Cross-chapter references (John 3:16-4:1)
+- Cross-chapter references (John 3:16-4:1, John 3:1-4:end)
 - Complex ranges (Mark 2:4, (6-10), 11-end)
 - Verse suffixes (Habakkuk 3:2-19a)
 """
 
 import re
 from typing import Dict, List, Any, Optional, Tuple
+from search.normalize import DEFAULT_NORMALIZER
 from .book_normalizer import BookNormalizer
+from .results import ParseResult, Verse, VerseList
+from .segments import parse_verse_token, segment_span, split_offsets
 
 class ReferenceParser:
     """Parses complex Bible references and fetches formatted text."""
@@ -112,17 +115,14 @@ class ReferenceParser:
             if not verses:
                 raise ValueError("No verses found")
             
-            # Return raw verses (formatting will be done by liturgical_display)
-            formatted_text = self._format_verses_simple(verses)
-            
-            return {
+            # Return raw verses; formatted_text is built lazily on access
+            return ParseResult({
                 "reference": reference,
                 "parsed": True,
                 "book": book,
                 "chapter": chapter,
                 "verses": verses,
-                "formatted_text": formatted_text
-            }
+            })
             
         except Exception as e:
             return {
@@ -168,7 +168,7 @@ class ReferenceParser:
         try:
             # Split by comma to get individual ranges
             parts = reference.split(',')
-            all_verses = []
+            all_verses = VerseList()
             
             # Parse the first part to get book and chapter
             first_part = parts[0].strip()
@@ -218,24 +218,19 @@ class ReferenceParser:
                     continue
                 
                 # Parse verse range
-                verse_part = self._clean_verse_suffix(verse_part)
                 verses = self._extract_verses_from_chapter(chapter_data, verse_part)
                 all_verses.extend(verses)
             
             if not all_verses:
                 raise ValueError("No verses found")
             
-            # Format text
-            formatted_text = self._format_verses_simple(all_verses)
-            
-            return {
+            return ParseResult({
                 "reference": reference,
                 "parsed": True,
                 "book": book,
                 "chapter": chapter,
                 "verses": all_verses,
-                "formatted_text": formatted_text
-            }
+            })
             
         except Exception as e:
             return {
@@ -246,10 +241,11 @@ class ReferenceParser:
             }
     
     def _handle_cross_chapter_reference(self, reference: str, version: str) -> Dict[str, Any]:
-        """Handle cross-chapter references like 'John 3:16-4:1'."""
+        """Handle cross-chapter references like 'John 3:16-4:1', 'John 3:16b-4:1a' or 'John 3:1-4:end'."""
         try:
-            # Parse cross-chapter reference
-            pattern = r'^(.+?)\s+(\d+):(\d+)-(\d+):(\d+)$'
+            # Parse cross-chapter reference; either end may be a half verse,
+            # and the last verse may be the end of its chapter
+            pattern = r'^(.+?)\s+(\d+):(\d+[a-hA-H]?)-(\d+):(\d+[a-hA-H]?|end)$'
             match = re.match(pattern, reference.strip())
             
             if not match:
@@ -257,21 +253,21 @@ class ReferenceParser:
             
             book = match.group(1).strip()
             start_chapter = int(match.group(2))
-            start_verse = int(match.group(3))
+            start_verse = match.group(3)
             end_chapter = int(match.group(4))
-            end_verse = int(match.group(5))
+            end_verse = match.group(5)
             
             # Normalize book name
             book = self.book_normalizer.normalize(book)
             
-            all_verses = []
+            all_verses = VerseList()
             
             # Handle verses from start chapter
             if start_chapter == end_chapter:
                 # Same chapter - just get the range
                 chapter_data = self._get_chapter_data(book, str(start_chapter), version)
                 if chapter_data:
-                    verses = self._extract_verses_from_range(chapter_data, start_verse, end_verse)
+                    verses = self._extract_verses_from_chapter(chapter_data, f"{start_verse}-{end_verse}")
                     all_verses.extend(verses)
             else:
                 # Cross-chapter - get verses from start chapter to end
@@ -279,33 +275,34 @@ class ReferenceParser:
                 chapter_data = self._get_chapter_data(book, str(start_chapter), version)
                 if chapter_data:
                     # Get all verses from start_verse to end of chapter
-                    verse_numbers = [int(v) for v in chapter_data['verses'].keys() if v.isdigit()]
-                    if verse_numbers:
-                        max_verse = max(verse_numbers)
-                        verses = self._extract_verses_from_range(chapter_data, start_verse, max_verse)
-                        all_verses.extend(verses)
+                    verses = self._extract_verses_from_chapter(chapter_data, f"{start_verse}-end")
+                    all_verses.extend(verses)
+                
+                # Then every chapter in between, whole
+                for chapter in range(start_chapter + 1, end_chapter):
+                    chapter_data = self._get_chapter_data(book, str(chapter), version)
+                    if chapter_data:
+                        max_verse = self._max_verse(chapter_data)
+                        if max_verse:
+                            all_verses.extend(self._extract_verses_from_range(chapter_data, 1, max_verse))
                 
                 # Then get verses from end chapter
                 chapter_data = self._get_chapter_data(book, str(end_chapter), version)
                 if chapter_data:
-                    verses = self._extract_verses_from_range(chapter_data, 1, end_verse)
+                    verses = self._extract_verses_from_chapter(chapter_data, f"1-{end_verse}")
                     all_verses.extend(verses)
             
             if not all_verses:
                 raise ValueError("No verses found")
             
-            # Format text
-            formatted_text = self._format_verses_simple(all_verses)
-            
-            return {
+            return ParseResult({
                 "reference": reference,
                 "parsed": True,
                 "book": book,
                 "start_chapter": start_chapter,
                 "end_chapter": end_chapter,
                 "verses": all_verses,
-                "formatted_text": formatted_text
-            }
+            })
             
         except Exception as e:
             return {
@@ -436,12 +433,19 @@ class ReferenceParser:
                 
             # Get chapter data
             if book_key in data and chapter in data[book_key]:
-                return {
+                chapter_data = {
                     "version": version_key,
                     "book": book_key,
                     "chapter": chapter,
                     "verses": data[book_key][chapter]
                 }
+                structure = self.all_versions[version_key].get("structure")
+                if structure is not None:
+                    chapter_data["max_verse"] = structure.max_verse(book_key, chapter)
+                segments = self.all_versions[version_key].get("segments")
+                if segments is not None:
+                    chapter_data["segments"] = segments
+                return chapter_data
             
             return None
             
@@ -451,86 +455,92 @@ class ReferenceParser:
     
     def _normalize_book_name_for_version(self, version_key: str, book_name: str) -> Optional[str]:
         """Normalize book name for a specific version (same logic as main.py)."""
-        data = self.all_versions[version_key]["data"]
-        for name in data:
-            if name.lower().replace("ë", "e") == book_name.lower().replace("ë", "e"):
+        version = self.all_versions[version_key]
+        book_lookup = version.get("book_lookup")
+        if book_lookup is not None:
+            return book_lookup.get(version["search_index"].fold(book_name))
+        # Hand-built version data without a precomputed lookup
+        key = DEFAULT_NORMALIZER.fold(book_name)
+        for name in version["data"]:
+            if DEFAULT_NORMALIZER.fold(name) == key:
                 return name
         return None
     
-    def _extract_verses_from_chapter(self, chapter_data: Dict[str, Any], verse_range: str) -> List[Dict[str, Any]]:
-        """Extract specific verses from chapter data."""
-        verses = []
+    def _max_verse(self, chapter_data: Dict[str, Any]) -> Optional[int]:
+        """Get the last verse number of a chapter."""
+        max_verse = chapter_data.get('max_verse')
+        if max_verse is not None:
+            return max_verse
+        # No precomputed structure table (e.g. hand-built data): scan the keys
+        verse_numbers = [int(v) for v in chapter_data['verses'].keys() if v.isdigit()]
+        return max(verse_numbers) if verse_numbers else None
+    
+    def _extract_verses_from_chapter(self, chapter_data: Dict[str, Any], verse_range: str) -> VerseList:
+        """Extract specific verses from chapter data, cutting half verses like '19a' to their segment."""
+        verses = VerseList()
+        ref = self._chapter_ref(chapter_data)
         
         if '-' in verse_range:
             # Range of verses
-            start_verse, end_verse = verse_range.split('-', 1)
-            start_verse = self._clean_verse_suffix(start_verse.strip())
-            start_verse = int(start_verse)
+            start_part, end_part = verse_range.split('-', 1)
+            start_verse, start_segment = parse_verse_token(start_part)
             
-            if end_verse.strip().lower() == 'end':
+            if end_part.strip().lower() == 'end':
                 # Find the last verse in the chapter
-                verse_numbers = [int(v) for v in chapter_data['verses'].keys() if v.isdigit()]
-                if verse_numbers:
-                    end_verse = max(verse_numbers)
-                else:
-                    end_verse = start_verse
+                end_verse, end_segment = self._max_verse(chapter_data) or start_verse, None
             else:
-                # Clean verse suffix before converting to int
-                end_verse = self._clean_verse_suffix(end_verse.strip())
-                end_verse = int(end_verse)
-            
-            # Extract verses from range
-            for verse_num in range(start_verse, end_verse + 1):
-                verse_text = chapter_data['verses'].get(str(verse_num))
-                if verse_text:
-                    verses.append({
-                        'verse': str(verse_num),
-                        'text': verse_text
-                    })
+                end_verse, end_segment = parse_verse_token(end_part)
         else:
             # Single verse
-            clean_verse_range = self._clean_verse_suffix(verse_range)
-            verse_text = chapter_data['verses'].get(clean_verse_range)
-            if verse_text:
-                verses.append({
-                    'verse': clean_verse_range,
-                    'text': verse_text
-                })
+            start_verse, start_segment = parse_verse_token(verse_range)
+            end_verse, end_segment = start_verse, start_segment
+        
+        for verse_num in range(start_verse, end_verse + 1):
+            verse_key = str(verse_num)
+            verse_text = chapter_data['verses'].get(verse_key)
+            if not verse_text:
+                continue
+            first = start_segment if verse_num == start_verse and start_segment is not None else None
+            last = end_segment if verse_num == end_verse and end_segment is not None else None
+            if first is None and last is None:
+                verses.append(Verse(verse_key, verse_text, ref))
+                continue
+            offsets = self._segment_offsets(chapter_data, verse_key, verse_text)
+            start, end, letters = segment_span(verse_text, offsets, first or 0,
+                                               len(offsets) if last is None else last)
+            verses.append(Verse(verse_key, verse_text[start:end], ref, letters))
         
         return verses
     
-    def _extract_verses_from_range(self, chapter_data: Dict[str, Any], start_verse: int, end_verse: int) -> List[Dict[str, Any]]:
+    def _segment_offsets(self, chapter_data: Dict[str, Any], verse: str, text: str) -> Tuple[int, ...]:
+        """Split offsets of a verse, from the version's segment table if it has one."""
+        segments = chapter_data.get('segments')
+        if segments is None:
+            return split_offsets(text)
+        return segments.offsets(chapter_data['book'], chapter_data['chapter'], verse, text)
+    
+    def _extract_verses_from_range(self, chapter_data: Dict[str, Any], start_verse: int, end_verse: int) -> VerseList:
         """Extract verses from a specific range."""
-        verses = []
+        verses = VerseList()
+        ref = self._chapter_ref(chapter_data)
+        chapter_verses = chapter_data['verses']
         for verse_num in range(start_verse, end_verse + 1):
-            verse_text = chapter_data['verses'].get(str(verse_num))
+            verse_key = str(verse_num)
+            verse_text = chapter_verses.get(verse_key)
             if verse_text:
-                verses.append({
-                    'verse': str(verse_num),
-                    'text': verse_text
-                })
+                verses.append(Verse(verse_key, verse_text, ref))
         return verses
     
-    def _clean_verse_suffix(self, verse_part: str) -> str:
-        """Clean verse suffixes like 'a', 'b' from verse references."""
-        # Remove common suffixes
-        suffixes = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
-        for suffix in suffixes:
-            if verse_part.endswith(suffix):
-                return verse_part[:-1]
-        
-        return verse_part
+    def _chapter_ref(self, chapter_data: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """Get the (book, chapter) that verses of this chapter are tagged with."""
+        if 'book' in chapter_data and 'chapter' in chapter_data:
+            return (chapter_data['book'], chapter_data['chapter'])
+        return None
     
-    def _format_verses_simple(self, verses: List[Dict[str, Any]]) -> str:
+    def _format_verses_simple(self, verses: List[Any]) -> str:
         """Simple formatting for verses (just join with spaces)."""
         if not verses:
             return ""
-        
-        formatted_verses = []
-        for verse in verses:
-            verse_num = verse.get('verse', '')
-            text = verse.get('text', '')
-            if verse_num and text:
-                formatted_verses.append(f"{verse_num} {text}")
-        
-        return " ".join(formatted_verses)
+        if not isinstance(verses, VerseList):
+            verses = VerseList(verses)
+        return verses.formatted_text()
@@ -0,0 +1,192 @@
+"""
+Compact result types for parsed references and passages.
+
+Verses are stored as small slot-based objects instead of per-verse
+dicts, and the formatted text of a passage is only built when it is
+actually requested. Results are serialized straight to JSON bytes with
+``encode_json``.
+"""
+
+import json
+from typing import AbstractSet, Any, Dict, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+# Parts of a result that clients can select with ``fields=``
+RESULT_FIELDS = ("ids", "verses", "formatted_text", "optional_verses")
+
+# Always returned, so a client can tell whether the reference resolved
+BASE_KEYS = ("reference", "parsed", "error")
+
+# Resolved identifiers, returned with the "ids" field
+ID_KEYS = ("version", "book", "chapter", "start_chapter", "end_chapter")
+
+
+class Verse:
+    """
+    A single verse: its number (as a string) and its text.
+
+    ``ref`` optionally holds the (book, chapter) the verse was read from;
+    it is shared by all verses of a chapter and never serialized.
+    ``segment`` holds the letters of the verse parts for a half-verse
+    reference such as 19a, and is None for a whole verse.
+    """
+
+    __slots__ = ("verse", "text", "ref", "segment")
+
+    def __init__(self, verse: str, text: str, ref: Optional[Tuple[str, str]] = None,
+                 segment: Optional[str] = None):
+        self.verse = verse
+        self.text = text
+        self.ref = ref
+        self.segment = segment
+
+    def __getitem__(self, key: str) -> str:
+        # Dict-style access keeps older callers (verse["text"]) working
+        if key in ("verse", "text"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "ref":
+            return default
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        if self.segment:
+            return {"verse": self.verse, "segment": self.segment, "text": self.text}
+        return {"verse": self.verse, "text": self.text}
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, Verse):
+            return self.verse == other.verse and self.text == other.text and self.segment == other.segment
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        if self.segment:
+            return f"Verse({self.verse!r}, {self.text!r}, segment={self.segment!r})"
+        return f"Verse({self.verse!r}, {self.text!r})"
+
+
+class VerseList(list):
+    """List of ``Verse`` objects with lazily formatted text."""
+
+    def formatted_text(self) -> str:
+        """Join the verses as '<number> <text>' separated by spaces."""
+        parts = []
+        for verse in self:
+            verse_num = verse.get("verse", "")
+            text = verse.get("text", "")
+            if verse_num and text:
+                parts.append(f"{verse_num}{verse.get('segment') or ''} {text}")
+        return " ".join(parts)
+
+
+class ParseResult(dict):
+    """
+    Result of parsing a reference.
+
+    ``formatted_text`` is not stored up front; it is built from the
+    verses the first time ``result["formatted_text"]`` is read.
+    """
+
+    def __missing__(self, key: str) -> Any:
+        if key == "formatted_text" and "verses" in self:
+            verses = self["verses"]
+            if not isinstance(verses, VerseList):
+                verses = VerseList(verses)
+            text = verses.formatted_text()
+            self[key] = text
+            return text
+        raise KeyError(key)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Verse):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def encode_json(content: Any) -> bytes:
+    """
+    Serialize a result to UTF-8 JSON in a single pass.
+
+    Args:
+        content: Result to serialize (dicts, lists, ``Verse`` objects)
+
+    Returns:
+        The encoded JSON document
+    """
+    return json.dumps(
+        content,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def parse_fields(value: Any, allowed: Sequence[str] = RESULT_FIELDS) -> Optional[FrozenSet[str]]:
+    """
+    Parse a field selection (``fields=ids,verses``).
+
+    Args:
+        value: Comma-separated string, list of names, or None
+        allowed: Field names that may be selected
+
+    Returns:
+        The selected field names, or None to select everything
+
+    Raises:
+        ValueError: If an unknown field name is given
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    fields = frozenset(name.strip() for name in value if name and name.strip())
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValueError(
+            f"Unknown field(s): {', '.join(sorted(unknown))}. "
+            f"Choose from: {', '.join(allowed)}"
+        )
+    return fields or None
+
+
+def select_fields(result: Dict[str, Any], fields: Optional[AbstractSet[str]] = None) -> Dict[str, Any]:
+    """
+    Return only the selected parts of a parse or passage result.
+
+    Parts that are not selected are never computed: ``formatted_text``
+    is only built when it is asked for.
+
+    Args:
+        result: Result from ``ReferenceParser.parse`` or a passage lookup
+        fields: Names from ``RESULT_FIELDS``; None selects all of them
+
+    Returns:
+        Plain dictionary ready for ``encode_json``
+    """
+    selected = {key: result[key] for key in BASE_KEYS if key in result}
+    if fields is None:
+        fields = RESULT_FIELDS
+    if "ids" in fields:
+        for key in ID_KEYS:
+            if key in result:
+                selected[key] = result[key]
+        if "verses" not in fields and "verses" in result:
+            # Without the verses themselves, still report which ones resolved
+            selected["verse_ids"] = [verse.get("verse") for verse in result["verses"]]
+    if "verses" in fields and "verses" in result:
+        selected["verses"] = result["verses"]
+    if "optional_verses" in fields and "optional_verses" in result:
+        selected["optional_verses"] = result["optional_verses"]
+    if "formatted_text" in fields and ("verses" in result or "formatted_text" in result):
+        selected["formatted_text"] = result["formatted_text"]
+    return selected
+
+
+def verse_list(pairs: Iterable) -> VerseList:
+    """Build a ``VerseList`` from (verse, text) pairs."""
+    return VerseList(Verse(verse, text) for verse, text in pairs)
@@ -0,0 +1,125 @@
+"""
+Verse segments for half-verse references.
+
+Lectionaries cite parts of verses: ``Habakkuk 3:2-19a`` ends with the
+first part of verse 19. A verse is split into segments a, b, c, ... at
+clause boundaries (after ``.;:!?``, or after commas if a verse has no
+such break). Only the split offsets are stored, per verse and computed
+on first use; the text of a segment is sliced from the verse when it is
+asked for. A translation can override the splits of single verses with
+a JSON file of character offsets::
+
+    {"Habakuk": {"3": {"19": [61, 112]}}}
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+SEGMENT_LETTERS = "abcdefgh"
+
+# A clause ends with punctuation (and any closing quotes) followed by whitespace
+CLAUSE_BREAK = re.compile(r"[.;:!?][\"'”’)]*\s+")
+COMMA_BREAK = re.compile(r",[\"'”’)]*\s+")
+
+# Verse number with an optional segment letter, e.g. "19a"
+VERSE_TOKEN = re.compile(r"(\d+)([a-h])?")
+
+Overrides = Dict[str, Dict[str, Dict[str, List[int]]]]
+
+
+def split_offsets(text: str) -> Tuple[int, ...]:
+    """
+    Find where the second and later segments of a verse start.
+
+    Args:
+        text: Verse text
+
+    Returns:
+        Start offsets of segments b, c, ...; empty for a single segment
+    """
+    for pattern in (CLAUSE_BREAK, COMMA_BREAK):
+        offsets = tuple(match.end() for match in pattern.finditer(text) if match.end() < len(text))
+        if offsets:
+            return offsets[:len(SEGMENT_LETTERS) - 1]
+    return ()
+
+
+def parse_verse_token(token: str) -> Tuple[int, Optional[int]]:
+    """
+    Parse a verse number with an optional segment letter.
+
+    Returns:
+        (verse number, segment index or None)
+
+    Raises:
+        ValueError: If ``token`` is not a verse
+    """
+    match = VERSE_TOKEN.fullmatch(token.strip().lower())
+    if match is None:
+        raise ValueError(f"Invalid verse: {token.strip()}")
+    letter = match.group(2)
+    return int(match.group(1)), SEGMENT_LETTERS.index(letter) if letter else None
+
+
+def segment_span(text: str, offsets: Tuple[int, ...], first: int, last: int) -> Tuple[int, int, str]:
+    """
+    Locate segments ``first`` through ``last`` of a verse.
+
+    Indexes past the last segment are clamped to it, so a reference that
+    assumes a finer split still returns text.
+
+    Args:
+        text: Verse text
+        offsets: Split offsets from ``split_offsets`` or an override
+        first: Index of the first segment (0 for a)
+        last: Index of the last segment
+
+    Returns:
+        (start, end, letters), e.g. (0, 61, "a")
+    """
+    count = len(offsets) + 1
+    first = min(first, count - 1)
+    last = max(min(last, count - 1), first)
+    start = offsets[first - 1] if first else 0
+    end = offsets[last] if last < count - 1 else len(text)
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end, SEGMENT_LETTERS[first:last + 1]
+
+
+class SegmentTable:
+    """Split offsets of the verses of one translation."""
+
+    def __init__(self, overrides: Optional[Overrides] = None):
+        """
+        Initialize a table.
+
+        Args:
+            overrides: Offsets per book, chapter and verse that replace
+                the computed ones
+        """
+        self.overrides = overrides or {}
+        self._offsets: Dict[Tuple[str, str, str], Tuple[int, ...]] = {}
+
+    def offsets(self, book: str, chapter: str, verse: str, text: str) -> Tuple[int, ...]:
+        """Split offsets of a verse, computed once."""
+        key = (book, chapter, verse)
+        offsets = self._offsets.get(key)
+        if offsets is None:
+            override = self.overrides.get(book, {}).get(chapter, {}).get(verse)
+            if override is not None:
+                offsets = tuple(sorted(offset for offset in set(override) if 0 < offset < len(text)))
+            else:
+                offsets = split_offsets(text)
+            self._offsets[key] = offsets
+        return offsets
+
+
+def load_segments(path: str) -> SegmentTable:
+    """Build a segment table with the overrides in ``path``, if the file exists."""
+    if not os.path.exists(path):
+        return SegmentTable()
+    with open(path, encoding="utf-8") as f:
+        return SegmentTable(json.load(f))
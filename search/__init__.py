@@ -0,0 +1,13 @@
+"""
+Search module for the Bible API.
+
+This module provides the in-memory search index that is filled while a
+Bible version is ingested, and the regular expression and wildcard
+patterns it can search for and the TF-IDF weights for related verses.
+"""
+
+from .index import SEARCH_FIELDS, SearchIndex
+from .pattern import Pattern, PatternError, compile_pattern
+from .related import RelatedVerses
+
+__all__ = ['SEARCH_FIELDS', 'SearchIndex', 'Pattern', 'PatternError', 'compile_pattern', 'RelatedVerses']
@@ -0,0 +1,436 @@
+"""
+Inverted index over the verses of one Bible version.
+
+Verses get a document number in the order they are added (canonical
+order when ingested from a Bible file). For every word the index keeps
+a sorted posting list of the documents it occurs in. A search narrows
+the candidates with the posting lists and only checks those verses
+against the query, instead of scanning the whole Bible.
+
+Verses and queries are compared in folded form (see ``search.normalize``):
+accents, case and old spellings do not matter. The start offset of every
+word is stored as well, so match offsets and snippets cut at word
+boundaries come straight from the index, and every posting carries the
+number of times the word occurs in that verse, for concordances and
+word frequencies. Searches can be limited to a scope of document ranges
+(see ``search.scope``). Regular expression and wildcard searches (see
+``search.pattern``) find their candidate verses through a trigram map of
+the indexed words.
+"""
+
+import re
+import time
+from array import array
+from collections import Counter
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from .normalize import DEFAULT_NORMALIZER, Normalizer, original_span
+from .pattern import Pattern
+from .scope import Range, posting_slices, restrict, scope_docs
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Parts a search result can include besides the reference (fields=...)
+SEARCH_FIELDS = ("text", "matches", "snippet")
+
+ELLIPSIS = "\u2026"
+
+Span = Tuple[int, int]
+
+
+class SearchIndex:
+    """Posting lists for the words of one version."""
+
+    def __init__(self, normalizer: Optional[Normalizer] = None):
+        """
+        Initialize an empty index.
+
+        Args:
+            normalizer: Folds verses and queries; defaults to
+                ``DEFAULT_NORMALIZER``
+        """
+        self.normalizer = normalizer or DEFAULT_NORMALIZER
+        self.refs: List[Tuple[str, str, str]] = []
+        self.texts: List[str] = []
+        self._folded: List[str] = []
+        # Folded -> original character offsets, None where they are equal
+        self._offsets: List[Optional[array]] = []
+        # Start offsets of the words of each verse, in the original text
+        self._starts: List[array] = []
+        self.postings: Dict[str, array] = {}
+        # Occurrences of the word in each document of its posting list
+        self.frequencies: Dict[str, array] = {}
+        # Occurrences of each word in the whole version
+        self.totals: Dict[str, int] = {}
+        # Book name -> [first document, last document + 1]
+        self._books: Dict[str, List[int]] = {}
+        # Trigram -> words containing it, built on first use
+        self._trigrams: Optional[Dict[str, Set[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, book: str, chapter: str, verse: str, text: str) -> int:
+        """
+        Add a verse to the index.
+
+        Args:
+            book: Book name
+            chapter: Chapter number
+            verse: Verse number
+            text: Verse text
+
+        Returns:
+            The document number of the verse
+        """
+        doc = len(self.texts)
+        self.refs.append((book, chapter, verse))
+        book_range = self._books.get(book)
+        if book_range is None:
+            self._books[book] = [doc, doc + 1]
+        else:
+            book_range[1] = doc + 1
+        self.texts.append(text)
+        folded, offsets = self.normalizer.fold_with_offsets(text)
+        self._folded.append(folded)
+        self._offsets.append(offsets)
+        words = list(TOKEN_RE.finditer(folded))
+        if offsets is None:
+            self._starts.append(array('I', (word.start() for word in words)))
+        else:
+            self._starts.append(array('I', (offsets[word.start()] for word in words)))
+        counts: Dict[str, int] = {}
+        for word in words:
+            token = word.group()
+            counts[token] = counts.get(token, 0) + 1
+        totals = self.totals
+        for token, count in counts.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array('I')
+                self._trigrams = None
+                self.frequencies[token] = array('I')
+            posting.append(doc)
+            self.frequencies[token].append(count)
+            totals[token] = totals.get(token, 0) + count
+        return doc
+
+    def folded_text(self, doc: int) -> str:
+        """Folded text of a document, as it is searched (see ``fold``)."""
+        return self._folded[doc]
+
+    def word_count(self, doc: int) -> int:
+        """Number of words in a document."""
+        return len(self._starts[doc])
+
+    def book_range(self, book: str) -> Optional[Range]:
+        """Document range ``(first, last + 1)`` of a book, or None."""
+        book_range = self._books.get(book)
+        return tuple(book_range) if book_range else None
+
+    def _lower_bound(self, book_range: List[int], target: Tuple[int, int]) -> int:
+        """First document of a book at or after (chapter, verse) ``target``."""
+        low, high = book_range
+        refs = self.refs
+        while low < high:
+            middle = (low + high) // 2
+            if (int(refs[middle][1]), int(refs[middle][2])) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def doc_of(self, book: str, chapter: str, verse: str) -> Optional[int]:
+        """Document number of a verse, or None if it is not indexed."""
+        book_range = self._books.get(book)
+        if book_range is None:
+            return None
+        try:
+            target = (int(chapter), int(verse))
+        except ValueError:
+            return None
+        low = self._lower_bound(book_range, target)
+        refs = self.refs
+        if low < book_range[1] and (int(refs[low][1]), int(refs[low][2])) == target:
+            return low
+        return None
+
+    def chapter_range(self, book: str, first: int, last: int) -> Optional[Range]:
+        """Document range of chapters ``first`` through ``last`` of a book, or None."""
+        book_range = self._books.get(book)
+        if book_range is None:
+            return None
+        return self._lower_bound(book_range, (first, 0)), self._lower_bound(book_range, (last + 1, 0))
+
+    def _posting(self, token: str, scope: Optional[Sequence[Range]]) -> Iterable[int]:
+        posting = self.postings.get(token, ())
+        return posting if scope is None else restrict(posting, scope)
+
+    def word_trigrams(self) -> Dict[str, Set[str]]:
+        """Map every three-letter sequence to the indexed words containing it."""
+        trigrams = self._trigrams
+        if trigrams is None:
+            trigrams = {}
+            for token in self.postings:
+                for start in range(len(token) - 2):
+                    trigram = token[start:start + 3]
+                    words = trigrams.get(trigram)
+                    if words is None:
+                        trigrams[trigram] = {token}
+                    else:
+                        words.add(token)
+            self._trigrams = trigrams
+        return trigrams
+
+    def words_containing(self, fragment: str) -> List[str]:
+        """Indexed words that contain ``fragment`` (folded)."""
+        if len(fragment) < 3:
+            return [token for token in self.postings if fragment in token]
+        trigrams = self.word_trigrams()
+        sets = sorted((trigrams.get(fragment[start:start + 3], set())
+                       for start in range(len(fragment) - 2)), key=len)
+        words = sets[0].intersection(*sets[1:])
+        return [token for token in words if fragment in token]
+
+    def _partial(self, fragment: str, scope: Optional[Sequence[Range]] = None) -> Set[int]:
+        """Documents containing a word that contains ``fragment``."""
+        docs: Set[int] = set()
+        for token in self.words_containing(fragment):
+            docs.update(self._posting(token, scope))
+        return docs
+
+    def candidates(self, query: str, scope: Optional[Sequence[Range]] = None) -> Optional[Iterable[int]]:
+        """
+        Documents that may contain ``query`` (already folded).
+
+        Words in the middle of the query must occur as whole words; the
+        first and last may be cut off, so any word containing them counts.
+        Other spellings of a word (see ``Normalizer.variants``) count as
+        whole words.
+
+        Args:
+            query: Folded query
+            scope: Only consider documents in these ranges; None for all
+
+        Returns:
+            Candidate document numbers, or None if the query has no words
+            and every document in scope is a candidate
+        """
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        sets = []
+        last = len(tokens) - 1
+        for position, token in enumerate(tokens):
+            if 0 < position < last:
+                docs = set(self._posting(token, scope))
+            else:
+                docs = self._partial(token, scope)
+            for other in self.normalizer.variants(token)[1:]:
+                docs.update(self._posting(other, scope))
+            sets.append(docs)
+        sets.sort(key=len)
+        docs = sets[0]
+        for other in sets[1:]:
+            docs &= other
+            if not docs:
+                break
+        return sorted(docs)
+
+    def fold(self, text: str) -> str:
+        """Fold a query the way the verses were folded."""
+        return self.normalizer.fold(text)
+
+    def search(self, query: str, scope: Optional[Sequence[Range]] = None) -> List[int]:
+        """
+        Find the verses that contain ``query``, ignoring case, accents and old spellings.
+
+        Args:
+            query: Text to find
+            scope: Only search documents in these ranges (from
+                ``search.scope.merge_ranges``); None searches everything
+
+        Returns:
+            Matching document numbers in canonical order
+        """
+        needle = self.fold(query)
+        docs = self.candidates(needle, scope)
+        if docs is None:
+            docs = range(len(self.texts)) if scope is None else scope_docs(scope)
+        folded = self._folded
+        regex = self.normalizer.spelling_regex(needle)
+        if regex is not None:
+            search = regex.search
+            return [doc for doc in docs if search(folded[doc])]
+        return [doc for doc in docs if needle in folded[doc]]
+
+    def pattern_search(self, pattern: Pattern, scope: Optional[Sequence[Range]] = None,
+                       limit: Optional[int] = None, budget: Optional[float] = None) -> Tuple[List[int], bool]:
+        """
+        Find the verses matching a regular expression or wildcard pattern.
+
+        Only verses containing every fragment of ``pattern`` of at least
+        three letters are matched against its expression; shorter ones
+        hardly narrow the search.
+
+        Args:
+            pattern: Pattern from ``search.pattern.compile_pattern``
+            scope: Only search documents in these ranges; None searches everything
+            limit: Stop after this many matching verses
+            budget: Stop after this many seconds
+
+        Returns:
+            Matching document numbers in canonical order, and whether the
+            search ran out of time before it was complete
+        """
+        deadline = time.monotonic() + budget if budget is not None else None
+        sets = sorted((self._partial(fragment, scope) for fragment in pattern.fragments
+                       if len(fragment) >= 3), key=len)
+        if sets:
+            docs = sorted(sets[0].intersection(*sets[1:]))
+        else:
+            docs = range(len(self.texts)) if scope is None else scope_docs(scope)
+        search = pattern.regex.search
+        folded = self._folded
+        found: List[int] = []
+        for doc in docs:
+            if deadline is not None and time.monotonic() > deadline:
+                return found, True
+            match = search(folded[doc])
+            if match and (match.end() > match.start() or self.pattern_matches(doc, pattern)):
+                found.append(doc)
+                if len(found) == limit:
+                    break
+        return found, False
+
+    def pattern_matches(self, doc: int, pattern: Pattern) -> List[Span]:
+        """
+        Character offsets of the non-empty matches of a pattern in a verse.
+
+        Returns:
+            (start, end) pairs into the original verse text
+        """
+        offsets = self._offsets[doc]
+        return [original_span(offsets, match.start(), match.end())
+                for match in pattern.regex.finditer(self._folded[doc]) if match.end() > match.start()]
+
+    def result(self, doc: int) -> dict:
+        """Return a document as a search result."""
+        book, chapter, verse = self.refs[doc]
+        return {"book": book, "chapter": chapter, "verse": verse, "text": self.texts[doc]}
+
+    def matches(self, doc: int, query: str) -> List[Span]:
+        """
+        Character offsets of the non-overlapping occurrences of ``query`` in a verse.
+
+        Returns:
+            (start, end) pairs into the original verse text
+        """
+        needle = self.fold(query)
+        folded = self._folded[doc]
+        offsets = self._offsets[doc]
+        spans = []
+        if not needle:
+            return spans
+        regex = self.normalizer.spelling_regex(needle)
+        if regex is not None:
+            return [original_span(offsets, match.start(), match.end()) for match in regex.finditer(folded)]
+        position = folded.find(needle)
+        while position != -1:
+            spans.append(original_span(offsets, position, position + len(needle)))
+            position = folded.find(needle, position + len(needle))
+        return spans
+
+    def occurrences(self, token: str, scope: Optional[Sequence[Range]] = None) -> List[Tuple[int, int]]:
+        """
+        Verses containing a word, with the number of times it occurs in each.
+
+        Other spellings of the word (see ``Normalizer.variants``) are
+        counted as the word.
+
+        Args:
+            token: Folded word (see ``fold``)
+            scope: Only these document ranges; None for all
+
+        Returns:
+            (document number, count) pairs in canonical order
+        """
+        spellings = self.normalizer.variants(token)
+        if len(spellings) > 1:
+            counts: Counter = Counter()
+            for spelling in spellings:
+                counts.update(dict(self._occurrences(spelling, scope)))
+            return sorted(counts.items())
+        return self._occurrences(token, scope)
+
+    def _occurrences(self, token: str, scope: Optional[Sequence[Range]]) -> List[Tuple[int, int]]:
+        posting = self.postings.get(token)
+        if posting is None:
+            return []
+        frequencies = self.frequencies[token]
+        if scope is None:
+            return list(zip(posting, frequencies))
+        pairs: List[Tuple[int, int]] = []
+        for low, high in posting_slices(posting, scope):
+            pairs.extend(zip(posting[low:high], frequencies[low:high]))
+        return pairs
+
+    def verse_count(self, token: str, scope: Optional[Sequence[Range]] = None) -> int:
+        """Number of verses containing a word, in the whole version or within a scope."""
+        posting = self.postings.get(token, ())
+        if scope is None:
+            return len(posting)
+        return sum(high - low for low, high in posting_slices(posting, scope))
+
+    def word_counts(self, scope: Optional[Sequence[Range]] = None) -> Dict[str, int]:
+        """
+        Occurrences of every word, in the whole version or within a scope.
+
+        The whole-version counts are kept while indexing; counts for a
+        scope are taken from the verses in it.
+        """
+        if scope is None:
+            return self.totals
+        counts: Counter = Counter()
+        folded = self._folded
+        for doc in scope_docs(scope):
+            counts.update(TOKEN_RE.findall(folded[doc]))
+        return counts
+
+    def snippet(self, doc: int, spans: List[Span], context: int = 8) -> dict:
+        """
+        Cut the part of a verse around its matches, on word boundaries.
+
+        Args:
+            doc: Document number
+            spans: Match offsets from ``matches``
+            context: Number of words to keep before the first and after
+                the last match
+
+        Returns:
+            Dictionary with the snippet "text" (with an ellipsis where the
+            verse was cut) and the "matches" as offsets into the snippet
+        """
+        text = self.texts[doc]
+        starts = self._starts[doc]
+        if not spans or not starts:
+            return {"text": text, "matches": [list(span) for span in spans]}
+        first_word = max(bisect_right(starts, spans[0][0]) - 1, 0)
+        last_word = bisect_left(starts, spans[-1][1]) - 1
+        begin_word = first_word - context
+        end_word = last_word + context
+        begin = starts[begin_word] if begin_word > 0 else 0
+        if end_word < len(starts) - 1:
+            word = TOKEN_RE.match(text, starts[end_word])
+            end = word.end() if word else starts[end_word] + 1
+        else:
+            end = len(text)
+        end = max(end, spans[-1][1])
+        prefix = ELLIPSIS if begin > 0 else ""
+        suffix = ELLIPSIS if end < len(text) else ""
+        shift = len(prefix) - begin
+        return {
+            "text": prefix + text[begin:end] + suffix,
+            "matches": [[start + shift, stop + shift] for start, stop in spans],
+        }
@@ -0,0 +1,163 @@
+"""
+Spelling-insensitive folding of Bible text.
+
+Search and book-name lookup compare folded text: Unicode NFKD with the
+combining marks dropped ("ë" -> "e") and case folding. Verses are folded
+once when they are indexed; queries are folded the same way, so "Israel"
+finds "Israël".
+
+Old Dutch spellings are not rewritten in the folded text, so a query for
+"Heer" still finds "HEERE" as a prefix. Instead, a word map from old
+spelling to modern ("heere" -> "here") widens the query: a query word
+that is spelled exactly as in the map also matches its other spellings
+as whole words, so "Here" finds "HEERE" and "menschen" finds "mensen".
+
+Folding can change the length of a text ("ß" -> "ss"), so
+``fold_with_offsets`` also returns where each folded character came
+from, letting match offsets point into the original.
+"""
+
+import re
+import unicodedata
+from array import array
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+# Old Dutch spelling (Statenvertaling) -> modern spelling, as folded words
+SPELLING_MAP: Dict[str, str] = {
+    "heere": "here",
+    "heeren": "heren",
+    "zoo": "zo",
+    "alzoo": "alzo",
+    "eene": "een",
+    "mensch": "mens",
+    "menschen": "mensen",
+    "vleesch": "vlees",
+    "visch": "vis",
+    "visschen": "vissen",
+    "wensch": "wens",
+    "wenschen": "wensen",
+    "zoodat": "zodat",
+    "zoowel": "zowel",
+}
+
+
+def _fold_char(char: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", char)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class _FoldTable(dict):
+    """``str.translate`` table that folds characters the first time they are seen."""
+
+    def __init__(self):
+        super().__init__((code, chr(code).lower()) for code in range(128))
+        # Characters that fold to nothing (combining marks)
+        self.dropped: Set[int] = set()
+
+    def __missing__(self, code: int) -> str:
+        folded = _fold_char(chr(code))
+        self[code] = folded
+        if not folded:
+            self.dropped.add(code)
+        return folded
+
+
+_TABLE = _FoldTable()
+
+_WORD_RE = re.compile(r"\w+")
+
+
+class Normalizer:
+    """Folds text for spelling-insensitive comparison."""
+
+    def __init__(self, spelling: Optional[Dict[str, str]] = None):
+        """
+        Initialize a normalizer.
+
+        Args:
+            spelling: Word -> replacement map of words that count as the
+                same after case and accent folding; defaults to
+                ``SPELLING_MAP``
+        """
+        if spelling is None:
+            spelling = SPELLING_MAP
+        self.spelling = {}
+        for word, replacement in spelling.items():
+            word, replacement = self.fold(word), self.fold(replacement)
+            if word != replacement and replacement:
+                self.spelling[word] = replacement
+        # Every spelling of a word -> all of its spellings, itself first
+        groups: Dict[str, List[str]] = {}
+        for word, replacement in self.spelling.items():
+            groups.setdefault(replacement, [replacement]).append(word)
+        self._variants: Dict[str, Tuple[str, ...]] = {}
+        for group in groups.values():
+            for word in group:
+                self._variants[word] = (word,) + tuple(other for other in group if other != word)
+
+    def fold(self, text: str) -> str:
+        """Fold ``text``: accents and case removed."""
+        if text.isascii():
+            return text.lower()
+        return text.translate(_TABLE)
+
+    def variants(self, word: str) -> Tuple[str, ...]:
+        """All spellings of a folded word, the word itself first."""
+        return self._variants.get(word, (word,))
+
+    def spelling_regex(self, folded: str) -> Optional[Pattern]:
+        """
+        Expression matching a folded query in any spelling.
+
+        Only words of the query that are spelled exactly as in the
+        spelling map are widened; their other spellings must match as
+        whole words, so "zoo" also finds "zo" but not "zon". Everything
+        else, including cut-off words at the ends, matches literally.
+
+        Returns:
+            The expression, or None if no word has other spellings and a
+            plain substring search suffices
+        """
+        pieces = []
+        last = 0
+        for word in _WORD_RE.finditer(folded):
+            others = self.variants(word.group())[1:]
+            if others:
+                pieces.append(re.escape(folded[last:word.start()]))
+                # Other spellings first, so a whole "mensch" wins over "mens" in it
+                spellings = [rf"\b{re.escape(other)}\b" for other in others] + [re.escape(word.group())]
+                pieces.append("(?:" + "|".join(spellings) + ")")
+                last = word.end()
+        if not pieces:
+            return None
+        pieces.append(re.escape(folded[last:]))
+        return re.compile("".join(pieces))
+
+    def fold_with_offsets(self, text: str) -> Tuple[str, Optional[array]]:
+        """
+        Fold ``text`` and map the folded characters back to the original.
+
+        Returns:
+            The folded text and, if its characters do not line up one to
+            one with ``text``, an array giving the index in ``text`` of
+            every folded character (otherwise None)
+        """
+        folded = self.fold(text)
+        # Same length means one character each, unless a dropped mark
+        # happens to cancel out an expansion
+        if len(folded) == len(text) and not (_TABLE.dropped and not _TABLE.dropped.isdisjoint(map(ord, text))):
+            return folded, None
+        offsets = array('I')
+        for index, char in enumerate(text):
+            offsets.extend([index] * len(self.fold(char)))
+        return folded, offsets
+
+
+def original_span(offsets: Optional[array], start: int, end: int) -> Tuple[int, int]:
+    """Map a (start, end) span in folded text back to the original text."""
+    if offsets is None:
+        return start, end
+    return offsets[start], offsets[end - 1] + 1
+
+
+DEFAULT_NORMALIZER = Normalizer()
@@ -0,0 +1,345 @@
+"""
+Regular expression and wildcard queries.
+
+Patterns are matched against the folded verse texts (see
+``search.normalize``), so the literal parts of a pattern are folded the
+same way: "Heere.*Israël" looks for "here.*israel". A wildcard pattern
+such as "zalig*" becomes a regular expression matching whole words.
+
+Running a user's regular expression over every verse is slow and can be
+made arbitrarily slow, so a compiled pattern also carries the literal
+word fragments every match must contain. The index uses them to find
+candidate verses first (see ``SearchIndex.pattern_search``).
+
+Python's ``re`` cannot be interrupted during a match, so patterns that
+can backtrack exponentially are refused up front: a repeated group with
+a repeated or optional part ("(a+)+", "(a?b?)*"), a repeated group with alternatives that can
+match the same text ("(.|\\w)*"), and unbounded repetitions of
+overlapping characters with nothing required in between (".*.*",
+"\\w*\\d+"). A required character in between does not help when the
+repetitions can match it too: ".*e.*e.*eq" backtracks polynomially, so
+at most two unbounded repetitions anywhere in a pattern may match the
+same character, and a pattern has at most ``MAX_UNBOUNDED_REPEATS`` of
+them.
+"""
+
+import re
+import string
+from collections import Counter
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+
+from .normalize import DEFAULT_NORMALIZER, Normalizer
+
+# Longest pattern accepted, in characters
+MAX_PATTERN_LENGTH = 200
+
+# Most unbounded repetitions (*, +, {n,}) in one pattern
+MAX_UNBOUNDED_REPEATS = 5
+
+# Escapes that stand for a class of characters or a position, not a literal
+_CLASS_ESCAPES = set("wWsSdDbBAZ0123456789")
+
+_REPEAT_RE = re.compile(r"\{(\d*)(,?)(\d*)\}")
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Prefix of a special group: (?:...), (?P<name>...), (?=...), (?i) and so on
+_GROUP_PREFIX_RE = re.compile(r"\?(?:P<\w+>|P=\w+\)?|<[=!]|[:=!>]|[aiLmsux-]+[:)]?)")
+
+# Syntax that is not folded: escapes and the prefixes of special groups
+_SYNTAX_RE = re.compile(r"(\\.|\(" + _GROUP_PREFIX_RE.pattern + ")", re.DOTALL)
+
+# A branch of an alternative without any special characters
+_LITERAL_BRANCH_RE = re.compile(r"[^\\.^$*+?{}\[\]|()]+")
+
+# Characters tried to decide whether two repeated items can match the same text
+_ALPHABET = string.printable + "àáâäèéêëìíîïòóôöùúûüçñ"
+
+
+class PatternError(ValueError):
+    """Raised for a pattern that is invalid or too expensive to run."""
+
+
+class Pattern:
+    """A folded, compiled pattern with the fragments a match must contain."""
+
+    def __init__(self, source: str, regex: "re.Pattern", fragments: List[str]):
+        """
+        Initialize a pattern.
+
+        Args:
+            source: The pattern as given
+            regex: Compiled expression over folded text
+            fragments: Folded word fragments that occur in every match
+        """
+        self.source = source
+        self.regex = regex
+        self.fragments = fragments
+
+
+def _fold_regex(pattern: str, normalizer: Normalizer) -> str:
+    # Escapes and group prefixes are kept as they are: folding "\W" to "\w"
+    # or "(?P<W>" to "(?p<w>" would change their meaning
+    pieces = _SYNTAX_RE.split(pattern)
+    return "".join(piece if index % 2 else normalizer.fold(piece) for index, piece in enumerate(pieces))
+
+
+def _quantifier(source: str, index: int):
+    """Return (length, optional, repeats, unbounded) of a quantifier at ``index``, or None."""
+    if index >= len(source):
+        return None
+    char = source[index]
+    if char in "*+?":
+        length, optional, repeats, unbounded = 1, char != "+", char != "?", char != "?"
+    elif char == "{":
+        match = _REPEAT_RE.match(source, index)
+        if not match or not (match.group(1) or match.group(3)):
+            return None
+        length = match.end() - index
+        optional = not match.group(1) or int(match.group(1)) == 0
+        repeats = bool(match.group(2)) or int(match.group(1) or 0) > 1
+        unbounded = bool(match.group(2)) and not match.group(3)
+    else:
+        return None
+    # Lazy or possessive suffix
+    if index + length < len(source) and source[index + length] in "?+":
+        length += 1
+    return length, optional, repeats, unbounded
+
+
+@lru_cache(maxsize=256)
+def _charset(atom: str) -> FrozenSet[str]:
+    """Characters of ``_ALPHABET`` that a single-character item can match."""
+    try:
+        regex = re.compile(atom, re.DOTALL)
+    except re.error:
+        return frozenset(_ALPHABET)
+    return frozenset(char for char in _ALPHABET if regex.fullmatch(char))
+
+
+def _distinct_literal_branches(body: str) -> bool:
+    """Whether every alternative is plain text and no two start with the same character."""
+    branches = body.split("|")
+    if not all(_LITERAL_BRANCH_RE.fullmatch(branch) for branch in branches):
+        return False
+    return len({branch[0] for branch in branches}) == len(branches)
+
+
+class _Level:
+    """State of the pattern or of one open group while scanning it."""
+
+    __slots__ = ("start", "repeats", "alternatives", "nested_alternatives", "chars",
+                 "pending", "initial", "tails")
+
+    def __init__(self, start: int, pending: Optional[List[FrozenSet[str]]] = None):
+        self.start = start
+        # Contains a quantified item, at any depth
+        self.repeats = False
+        # Has alternatives itself, or in a group inside it
+        self.alternatives = False
+        self.nested_alternatives = False
+        # Characters any item in it can match
+        self.chars: FrozenSet[str] = frozenset()
+        # Unbounded repetitions since the last required item, including
+        # the ones just before the group
+        self.initial: List[FrozenSet[str]] = list(pending or [])
+        self.pending: List[FrozenSet[str]] = list(self.initial)
+        # What is pending at the end of each finished alternative
+        self.tails: List[FrozenSet[str]] = []
+
+    def item(self, chars: FrozenSet[str], quantifier) -> None:
+        """Record an item; refuse a repetition that overlaps an adjacent one."""
+        self.chars |= chars
+        if quantifier is None or not (quantifier[1] or quantifier[3]):
+            self.pending.clear()
+        elif quantifier[3]:
+            if any(chars & other for other in self.pending):
+                raise PatternError("adjacent repetitions may not match the same characters")
+            if not quantifier[1]:
+                # Required at least once, so it separates the ones before it
+                self.pending.clear()
+            self.pending.append(chars)
+
+    def alternative(self) -> None:
+        """Start the next alternative, again right after what precedes the group."""
+        self.tails.extend(self.pending)
+        self.pending = list(self.initial)
+
+    def close(self, parent: "_Level", quantifier) -> None:
+        """Record a finished group as an item of ``parent``."""
+        ends = self.tails + self.pending
+        if quantifier is not None and (quantifier[1] or quantifier[3]):
+            # The group may be skipped, so what came before it stays adjacent
+            ends += parent.pending
+        parent.chars |= self.chars
+        if quantifier is not None and quantifier[3]:
+            if any(self.chars & other for other in parent.pending):
+                raise PatternError("adjacent repetitions may not match the same characters")
+            ends.append(self.chars)
+        parent.pending = list(dict.fromkeys(ends))
+
+
+def required_fragments(source: str) -> List[str]:
+    """
+    Word fragments every match of a regular expression must contain.
+
+    Only literals outside groups and character classes are used, and
+    none at all if the expression has a top-level alternative, so the
+    result may miss fragments but never lists one that is not required.
+
+    Raises:
+        PatternError: If the expression can backtrack exponentially (see
+            the module docstring)
+    """
+    runs: List[str] = []
+    current: List[str] = []
+    root = _Level(0)
+    groups: List[_Level] = []
+    # Characters of every unbounded repetition
+    unbounded: List[FrozenSet[str]] = []
+    index = 0
+
+    def end_run():
+        if current:
+            runs.append("".join(current))
+            current.clear()
+
+    while index < len(source):
+        char = source[index]
+        level = groups[-1] if groups else root
+        start = index
+        literal = None
+        atom = True
+        if char == "\\":
+            escaped = source[index + 1:index + 2]
+            index += 2
+            if escaped in _CLASS_ESCAPES:
+                end_run()
+                # Positions, not characters
+                atom = escaped not in "bBAZ"
+            else:
+                literal = escaped
+        elif char == "[":
+            end_run()
+            index += 1
+            if source[index:index + 1] == "^":
+                index += 1
+            if source[index:index + 1] == "]":
+                index += 1
+            while index < len(source) and source[index] != "]":
+                index += 2 if source[index] == "\\" else 1
+            index += 1
+        elif char == "(":
+            end_run()
+            index += 1
+            prefix = _GROUP_PREFIX_RE.match(source, index)
+            if prefix:
+                index = prefix.end()
+            groups.append(_Level(index, level.pending))
+            continue
+        elif char == ")":
+            end_run()
+            group = groups.pop() if groups else _Level(index)
+            body = source[group.start:index]
+            index += 1
+            level = groups[-1] if groups else root
+            quantifier = _quantifier(source, index)
+            if quantifier:
+                if quantifier[2]:
+                    if group.repeats:
+                        raise PatternError("a repeated group may not contain a repeated or optional part")
+                    if group.nested_alternatives and not _distinct_literal_branches(body):
+                        raise PatternError("a repeated group may not contain overlapping alternatives")
+                index += quantifier[0]
+            group.close(level, quantifier)
+            if quantifier and quantifier[3]:
+                unbounded.append(group.chars)
+            level.repeats = level.repeats or group.repeats or quantifier is not None
+            level.nested_alternatives = level.nested_alternatives or group.nested_alternatives
+            continue
+        elif char == "|":
+            end_run()
+            level.alternatives = level.nested_alternatives = True
+            level.alternative()
+            index += 1
+            continue
+        elif char in "^$":
+            end_run()
+            index += 1
+            atom = False
+        elif char == ".":
+            end_run()
+            index += 1
+        else:
+            literal = char
+            index += 1
+        quantifier = _quantifier(source, index)
+        if atom:
+            chars = _charset(source[start:index])
+            level.item(chars, quantifier)
+            if quantifier and quantifier[3]:
+                unbounded.append(chars)
+        if quantifier:
+            level.repeats = True
+            if literal is not None and not groups and not quantifier[1]:
+                current.append(literal)
+            literal = None
+            end_run()
+            index += quantifier[0]
+        if literal is not None and not groups:
+            current.append(literal)
+    end_run()
+    if len(unbounded) > MAX_UNBOUNDED_REPEATS:
+        raise PatternError(f"a pattern may have at most {MAX_UNBOUNDED_REPEATS} unbounded repetitions")
+    overlaps = Counter(char for chars in unbounded for char in chars)
+    if overlaps and max(overlaps.values()) > 2:
+        raise PatternError("at most two unbounded repetitions may match the same characters")
+    if root.alternatives:
+        return []
+    return [fragment for run in runs for fragment in _TOKEN_RE.findall(run)]
+
+
+def wildcard_to_regex(pattern: str) -> str:
+    """Whole-word regular expression for a folded wildcard pattern (``*`` and ``?``)."""
+    parts = []
+    # "**" means the same as "*" but would repeat twice in a row
+    pattern = re.sub(r"\*+", "*", pattern)
+    for piece in re.split(r"([*?])", pattern):
+        if piece == "*":
+            parts.append(r"\w*")
+        elif piece == "?":
+            parts.append(r"\w")
+        else:
+            parts.append(re.escape(piece))
+    return r"\b" + "".join(parts) + r"\b"
+
+
+def compile_pattern(pattern: str, wildcard: bool = False,
+                    normalizer: Optional[Normalizer] = None) -> Pattern:
+    """
+    Fold and compile a regular expression or wildcard pattern.
+
+    Args:
+        pattern: Regular expression, or wildcard pattern if ``wildcard``
+        wildcard: Treat ``*`` as any number of letters and ``?`` as one letter
+        normalizer: Folds the literal parts; defaults to ``DEFAULT_NORMALIZER``
+
+    Returns:
+        The compiled pattern
+
+    Raises:
+        PatternError: If the pattern is too long, invalid or too expensive
+    """
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        raise PatternError(f"pattern is longer than {MAX_PATTERN_LENGTH} characters")
+    normalizer = normalizer or DEFAULT_NORMALIZER
+    if wildcard:
+        source = wildcard_to_regex(normalizer.fold(pattern))
+    else:
+        source = _fold_regex(pattern, normalizer)
+    try:
+        regex = re.compile(source)
+    except re.error as error:
+        raise PatternError(str(error)) from None
+    return Pattern(pattern, regex, required_fragments(source))
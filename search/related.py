@@ -0,0 +1,86 @@
+"""
+Related verses by TF-IDF similarity.
+
+Every verse is a vector of its words, weighted by ``1 + log(count)``
+times the inverse document frequency of the word. Two verses are related
+by the cosine of their vectors. The posting lists of the search index
+already hold every word's verses and counts, so the vector of one verse
+is compared with all others by walking the posting lists of its words:
+only verses sharing a word are touched, and the work depends on the
+length of those lists rather than the size of the Bible. Words found in
+a large share of the verses ("de", "en") are left out; they say little
+about a verse and have the longest posting lists.
+"""
+
+import heapq
+import math
+from array import array
+from typing import Dict, List, Tuple
+
+from .index import TOKEN_RE, SearchIndex
+
+# Words in more than this share of the verses are ignored
+MAX_DOCUMENT_FREQUENCY = 0.05
+
+
+class RelatedVerses:
+    """
+    Verse vector norms and word weights for one search index.
+
+    The weights keep no reference to the index, so they can be saved with
+    the other per-snapshot caches; ``related`` takes the index as an
+    argument instead.
+    """
+
+    def __init__(self, index: SearchIndex, max_df: float = MAX_DOCUMENT_FREQUENCY):
+        """
+        Compute the word weights and the length of every verse vector.
+
+        Args:
+            index: Search index of the version
+            max_df: Ignore words occurring in more than this share of the verses
+        """
+        documents = len(index)
+        limit = max(1, int(documents * max_df))
+        # Word -> inverse document frequency, for the words that count
+        self.idf: Dict[str, float] = {}
+        squares = [0.0] * documents
+        for token, posting in index.postings.items():
+            if len(posting) > limit:
+                continue
+            idf = math.log(documents / len(posting))
+            self.idf[token] = idf
+            for doc, count in zip(posting, index.frequencies[token]):
+                squares[doc] += ((1 + math.log(count)) * idf) ** 2
+        self.norms = array('d', (math.sqrt(square) for square in squares))
+
+    def related(self, index: SearchIndex, doc: int, k: int = 10) -> List[Tuple[int, float]]:
+        """
+        Verses most similar to a verse.
+
+        Args:
+            index: The search index the weights were computed from
+            doc: Document number of the verse
+            k: Number of verses to return
+
+        Returns:
+            (document number, cosine similarity) pairs, most similar first
+        """
+        counts: Dict[str, int] = {}
+        for token in TOKEN_RE.findall(index.folded_text(doc)):
+            counts[token] = counts.get(token, 0) + 1
+        scores: Dict[int, float] = {}
+        for token, count in counts.items():
+            idf = self.idf.get(token)
+            if idf is None:
+                continue
+            weight = (1 + math.log(count)) * idf * idf
+            for other, other_count in zip(index.postings[token], index.frequencies[token]):
+                scores[other] = scores.get(other, 0.0) + weight * (1 + math.log(other_count))
+        norm = self.norms[doc]
+        scores.pop(doc, None)
+        if not norm:
+            return []
+        norms = self.norms
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1] / norms[item[0]], -item[0]))
+        return [(other, score / (norm * norms[other])) for other, score in best]
@@ -0,0 +1,117 @@
+"""
+Search scopes as ranges of document numbers.
+
+Verses are numbered in canonical order, so a book, a testament or a
+passage is a contiguous run of document numbers. A scope is a sorted
+list of non-overlapping half-open ``(start, end)`` ranges. Restricting
+a posting list to a scope only reads the slices that fall inside it,
+so a narrower scope makes a search cheaper.
+"""
+
+import random
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+Range = Tuple[int, int]
+
+
+def merge_ranges(ranges: Iterable[Range]) -> List[Range]:
+    """Sort ranges and join the ones that overlap or touch."""
+    merged: List[Range] = []
+    for start, end in sorted(ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect_ranges(first: Sequence[Range], second: Sequence[Range]) -> List[Range]:
+    """Ranges covered by both scopes."""
+    result: List[Range] = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def posting_slices(posting: Sequence[int], scope: Sequence[Range]) -> Iterator[Range]:
+    """
+    Index ranges of a sorted posting list whose documents fall inside a scope.
+
+    Args:
+        posting: Sorted document numbers
+        scope: Ranges from ``merge_ranges``
+
+    Yields:
+        (low, high) slices of ``posting``
+    """
+    low = 0
+    for start, end in scope:
+        low = bisect_left(posting, start, low)
+        high = bisect_left(posting, end, low)
+        if low < high:
+            yield low, high
+        low = high
+
+
+def restrict(posting: Sequence[int], scope: Sequence[Range]) -> List[int]:
+    """Documents of a sorted posting list that fall inside a scope, in order."""
+    docs: List[int] = []
+    for low, high in posting_slices(posting, scope):
+        docs.extend(posting[low:high])
+    return docs
+
+
+def scope_docs(scope: Sequence[Range]) -> Iterable[int]:
+    """Every document number in a scope."""
+    for start, end in scope:
+        yield from range(start, end)
+
+
+def scope_size(scope: Sequence[Range]) -> int:
+    """Number of documents in a scope."""
+    return sum(end - start for start, end in scope)
+
+
+def sample_scope(rng: random.Random, scope: Sequence[Range], count: int, unique: bool = True) -> List[int]:
+    """
+    Draw random document numbers from a scope.
+
+    Positions are drawn from ``range(scope_size(scope))`` and mapped to
+    documents, so nothing is materialised per document.
+
+    Args:
+        rng: Random generator; seed it for reproducible draws
+        scope: Ranges from ``merge_ranges``
+        count: Number of documents to draw
+        unique: Draw without replacement (at most every document once)
+
+    Returns:
+        Document numbers in the order they were drawn
+    """
+    size = scope_size(scope)
+    if size == 0:
+        return []
+    if unique:
+        positions = rng.sample(range(size), min(count, size))
+    else:
+        positions = [rng.randrange(size) for _ in range(count)]
+    # Position of the first document of each range
+    firsts = list(accumulate((end - start for start, end in scope), initial=0))
+    docs = []
+    for position in positions:
+        index = bisect_right(firsts, position) - 1
+        docs.append(scope[index][0] + position - firsts[index])
+    return docs
@@ -0,0 +1,15 @@
+"""
+Serving infrastructure for the Bible API.
+
+Response caches that live on a corpus snapshot, the shared on-disk
+cache behind them, the warmup that fills them before a snapshot serves
+traffic, and the static site files served from memory.
+"""
+
+from .cache import LRUCache, snapshot_cache
+from .disk_cache import DiskCache, cache_key
+from .static import StaticSite
+from .warmup import harvest, load_caches, read_warmup_file, replay, save_caches
+
+__all__ = ['LRUCache', 'snapshot_cache', 'DiskCache', 'cache_key', 'harvest', 'load_caches', 'read_warmup_file',
+           'replay', 'save_caches', 'StaticSite']
@@ -0,0 +1,30 @@
+"""
+Server maintenance from the command line.
+
+Usage: python -m server warmup <access.log> [--limit 1000] [--output data/warmup.txt]
+
+Writes the most requested API targets of an access log to the warmup
+file that is replayed before a new corpus snapshot serves traffic.
+"""
+
+import argparse
+import os
+
+from .warmup import harvest
+
+arg_parser = argparse.ArgumentParser(description="Server maintenance tasks.")
+commands = arg_parser.add_subparsers(dest="command", required=True)
+warmup_parser = commands.add_parser("warmup", help="Build the warmup file from an access log")
+warmup_parser.add_argument("log", help="Access log (app request log or uvicorn/common format)")
+warmup_parser.add_argument("--limit", type=int, default=1000, help="Number of requests to keep")
+warmup_parser.add_argument("--output", default=os.path.join("data", "warmup.txt"))
+args = arg_parser.parse_args()
+
+if args.command == "warmup":
+    with open(args.log, encoding="utf-8", errors="replace") as f:
+        targets = harvest(f, args.limit)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("# Popular requests, replayed before a new corpus snapshot serves traffic\n")
+        for target in targets:
+            f.write(target + "\n")
+    print(f"Wrote {len(targets)} requests to {args.output}")
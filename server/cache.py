@@ -0,0 +1,73 @@
+"""
+In-memory response caches.
+
+Caches hang off a ``CorpusSnapshot``: everything they hold was computed
+from that snapshot, so a reload starts with fresh caches and nothing
+has to be invalidated.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """Thread-safe mapping that drops the least recently used entries."""
+
+    def __init__(self, maxsize: int):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize: Maximum number of entries
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` and mark it as recently used."""
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any) -> Any:
+        """Store ``value`` under ``key`` and return it."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Entries from least to most recently used."""
+        with self._lock:
+            return list(self._entries.items())
+
+
+def snapshot_cache(snapshot, name: str, maxsize: int) -> LRUCache:
+    """
+    Return the cache called ``name`` of a snapshot, creating it if needed.
+
+    Args:
+        snapshot: ``CorpusSnapshot`` the cached values were computed from
+        name: Cache name, e.g. "chapters"
+        maxsize: Size of the cache when it is created
+
+    Returns:
+        The snapshot's cache
+    """
+    cache: Optional[LRUCache] = snapshot.caches.get(name)
+    if cache is None:
+        cache = snapshot.caches.setdefault(name, LRUCache(maxsize))
+    return cache
@@ -0,0 +1,141 @@
+"""
+Shared on-disk cache for rendered responses.
+
+A second cache tier behind the per-snapshot memory caches: rendered
+response bodies are stored in a SQLite file in WAL mode and read through
+a memory map, so every worker on the host shares them and they survive
+restarts. Keys include the corpus fingerprint and, as for the saved
+memory caches (see ``server.warmup``), the cache format and a hash of the
+code that rendered them, so entries of an old corpus or an old deploy
+are never served; they are evicted like any other cold entry once the
+file grows past its size limit.
+"""
+
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+
+from .warmup import CACHE_FORMAT, code_fingerprint
+
+# Only record a hit if the entry was last touched longer ago than this,
+# so popular entries do not turn every read into a write
+TOUCH_INTERVAL = 60.0
+# Check the total size after this many writes per process
+EVICT_CHECK_EVERY = 64
+
+
+def cache_key(fingerprint: str, endpoint: str, params: Dict[str, object]) -> str:
+    """
+    Build the key of a rendered response.
+
+    Args:
+        fingerprint: Source fingerprint of the corpus it was rendered from
+        endpoint: Endpoint name, e.g. "chapter"
+        params: Request parameters; None values are left out and the
+            order does not matter
+
+    Returns:
+        Key string
+    """
+    query = urlencode(sorted((name, str(value)) for name, value in params.items() if value is not None))
+    return f"{CACHE_FORMAT}|{code_fingerprint()[:16]}|{fingerprint[:16]}|{endpoint}|{query}"
+
+
+class DiskCache:
+    """Size-bounded key-value store for response bodies, shared between processes."""
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        Initialize the cache; the file is opened on first use.
+
+        Args:
+            path: SQLite file, created if missing
+            max_bytes: Evict least recently used entries beyond this total size
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        # Writes by this process; next() on a count is atomic, so threads need no lock
+        self._writes = itertools.count(1)
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the body stored under ``key``, or None."""
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT body, accessed FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > TOUCH_INTERVAL:
+                connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            return bytes(row[0])
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache read failed: {e}")
+            return None
+
+    def put(self, key: str, body: bytes) -> bytes:
+        """Store ``body`` under ``key`` and return it; failures are logged, not raised."""
+        try:
+            connection = self._connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), time.time()),
+            )
+            if next(self._writes) % EVICT_CHECK_EVERY == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            logging.warning(f"Response cache write failed: {e}")
+        return body
+
+    def size(self) -> int:
+        """Total size of the stored bodies in bytes."""
+        return int(self._connection().execute("SELECT total(size) FROM responses").fetchone()[0])
+
+    def evict(self) -> int:
+        """
+        Drop least recently used entries until the cache is below 90% of its limit.
+
+        Returns:
+            Number of entries removed
+        """
+        connection = self._connection()
+        total = self.size()
+        if total <= self.max_bytes:
+            return 0
+        excess = total - int(self.max_bytes * 0.9)
+        keys = []
+        freed = 0
+        for key, size in connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+        return len(keys)
+
+    def close(self) -> None:
+        """Close the connection of the calling thread."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,169 @@
+"""
+Static site files served from memory.
+
+The site is small, so every file is read once at startup together with
+a gzip-compressed copy and a content hash. Each asset is reachable under
+its own name and under a fingerprinted name with the hash in it
+(``script.3f2a1b9c0d4e.js``). HTML files are rewritten to link to the
+fingerprinted names, which never change content and can be cached by
+browsers for good; the plain names, and the HTML pages themselves, are
+revalidated with their ETag and answered with 304 when unchanged.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+# Files larger than this are not kept in memory
+MAX_ASSET_SIZE = 1 << 20
+
+# Compressed copies are only kept when they save at least this share
+MIN_GZIP_SAVING = 0.1
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class Asset:
+    """One site file with its compressed copy and validators."""
+
+    def __init__(self, name: str, body: bytes, media_type: str):
+        """
+        Initialize an asset and compute its hash and gzip copy.
+
+        Args:
+            name: Path relative to the site directory, with ``/`` separators
+            body: File contents
+            media_type: Content type to send
+        """
+        self.name = name
+        self.body = body
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.etag = f'"{self.digest}"'
+        self.gzip_body: Optional[bytes] = None
+        self.gzip_etag = f'"{self.digest}-gzip"'
+        if not media_type.startswith(("image/", "font/")) or media_type == "image/svg+xml":
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) <= len(body) * (1 - MIN_GZIP_SAVING):
+                self.gzip_body = compressed
+
+    @property
+    def hashed_name(self) -> str:
+        """Name with the content hash before the extension."""
+        base, extension = os.path.splitext(self.name)
+        return f"{base}.{self.digest}{extension}"
+
+
+def _media_type(name: str) -> str:
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/javascript", "image/svg+xml"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def _matches(if_none_match: str, etags: Iterable[str]) -> bool:
+    """Whether an If-None-Match header matches one of ``etags`` (weak comparison)."""
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or not candidates.isdisjoint(etags)
+
+
+class StaticSite:
+    """The files of a site directory, ready to serve."""
+
+    def __init__(self, directory: str, prefix: str = "/site"):
+        """
+        Read, fingerprint and compress every file under ``directory``.
+
+        Args:
+            directory: Site directory; a missing directory gives an empty site
+            prefix: URL path the files are served under
+        """
+        self.directory = directory
+        self.prefix = prefix.rstrip("/")
+        self.assets: Dict[str, Asset] = {}
+        # Fingerprinted name -> plain name
+        self.hashed: Dict[str, str] = {}
+        for name in self._walk():
+            path = os.path.join(directory, *name.split("/"))
+            if os.path.getsize(path) > MAX_ASSET_SIZE:
+                continue
+            with open(path, "rb") as f:
+                self.assets[name] = Asset(name, f.read(), _media_type(name))
+        for asset in list(self.assets.values()):
+            if asset.media_type.startswith("text/html"):
+                self.assets[asset.name] = Asset(asset.name, self._rewrite(asset.body), asset.media_type)
+        for name, asset in self.assets.items():
+            self.hashed[asset.hashed_name] = name
+
+    def _walk(self) -> Iterable[str]:
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            relative = os.path.relpath(root, self.directory)
+            for file_name in sorted(files):
+                name = file_name if relative == "." else os.path.join(relative, file_name)
+                yield name.replace(os.sep, "/")
+
+    def url(self, name: str) -> str:
+        """Fingerprinted URL of an asset, or its plain URL if it is not in memory."""
+        asset = self.assets.get(name)
+        return f"{self.prefix}/{asset.hashed_name if asset else name}"
+
+    def _rewrite(self, html: bytes) -> bytes:
+        """Point ``src`` and ``href`` links to site files at their fingerprinted URLs."""
+        names = sorted((name for name, asset in self.assets.items()
+                        if not asset.media_type.startswith("text/html")), key=len, reverse=True)
+        if not names:
+            return html
+        pattern = re.compile(r"""((?:src|href)\s*=\s*["'])(?:/?%s/|\./)?(%s)(["'?#])""" % (
+            re.escape(self.prefix.lstrip("/")), "|".join(map(re.escape, names))))
+        text = html.decode("utf-8")
+        text = pattern.sub(lambda match: match.group(1) + self.url(match.group(2)) + match.group(3), text)
+        return text.encode("utf-8")
+
+    def lookup(self, name: str) -> Tuple[Optional[Asset], bool]:
+        """
+        Find an asset by plain or fingerprinted name.
+
+        Returns:
+            The asset (None if unknown) and whether the name was fingerprinted
+        """
+        asset = self.assets.get(name)
+        if asset is not None:
+            return asset, False
+        plain = self.hashed.get(name)
+        if plain is not None:
+            return self.assets[plain], True
+        return None, False
+
+    def respond(self, asset: Asset, immutable: bool, accept_encoding: str = "",
+                if_none_match: str = "") -> Tuple[int, bytes, Dict[str, str]]:
+        """
+        Status, body and headers for a request of ``asset``.
+
+        Args:
+            asset: Asset from ``lookup``
+            immutable: Send long-lived cache headers (fingerprinted name)
+            accept_encoding: Accept-Encoding request header
+            if_none_match: If-None-Match request header
+
+        Returns:
+            (status code, body, headers); 304 with an empty body if the
+            client's copy is current
+        """
+        compressed = asset.gzip_body is not None and "gzip" in accept_encoding.lower()
+        etag = asset.gzip_etag if compressed else asset.etag
+        headers = {"ETag": etag, "Cache-Control": IMMUTABLE if immutable else REVALIDATE}
+        if asset.gzip_body is not None:
+            headers["Vary"] = "Accept-Encoding"
+        if if_none_match and _matches(if_none_match, (asset.etag, asset.gzip_etag)):
+            return 304, b"", headers
+        headers["Content-Type"] = asset.media_type
+        if compressed:
+            headers["Content-Encoding"] = "gzip"
+            return 200, asset.gzip_body, headers
+        return 200, asset.body, headers
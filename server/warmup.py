@@ -0,0 +1,189 @@
+"""
+Cache warmup for new corpus snapshots.
+
+A warmup file lists popular requests, one per line (e.g.
+``/api/chapter?book=Genesis&chapter=1``), usually harvested from the
+access log with ``python -m server warmup``. Before a snapshot serves
+traffic, those requests are replayed through the cache layers so the
+first real requests after a deploy or reload hit warm caches.
+
+The caches of the current snapshot can also be saved to disk on
+shutdown; a restart with unchanged corpus files and unchanged code then
+restores them instead of replaying the warmup file.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from .cache import LRUCache
+
+# Handler that recomputes (and thereby caches) the response to one request
+Warmer = Callable[[object, str, Dict[str, str]], object]
+
+# Version of the saved cache file layout; bump when it changes
+CACHE_FORMAT = 1
+
+# "Request: <ip> <target>" lines from the app's own request log
+_APP_LOG_RE = re.compile(r"Request: \S+ (/\S*)")
+# "GET <target> HTTP/1.1" in uvicorn and common/combined log formats
+_ACCESS_LOG_RE = re.compile(r'"GET (/\S*) HTTP/[\d.]+"')
+
+
+def harvest(lines: Iterable[str], limit: int = 1000, prefix: str = "/api/") -> List[str]:
+    """
+    Find the most requested targets in an access log.
+
+    Args:
+        lines: Log lines
+        limit: Maximum number of targets to return
+        prefix: Only count request targets starting with this path
+
+    Returns:
+        Request targets (path and query), most frequent first
+    """
+    counts: Counter = Counter()
+    for line in lines:
+        match = _APP_LOG_RE.search(line) or _ACCESS_LOG_RE.search(line)
+        if match and match.group(1).startswith(prefix):
+            counts[match.group(1)] += 1
+    return [target for target, _ in counts.most_common(limit)]
+
+
+def read_warmup_file(path: Optional[str]) -> List[str]:
+    """Request targets listed in a warmup file; blank lines and # comments are skipped."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def find_warmer(warmers: Dict[str, Warmer], path: str) -> Optional[Warmer]:
+    """Warmer for a path; keys ending in "/" match every path below them."""
+    warmer = warmers.get(path)
+    if warmer is None:
+        for key, candidate in warmers.items():
+            if key.endswith("/") and path.startswith(key):
+                return candidate
+    return warmer
+
+
+def replay(snapshot, targets: Iterable[str], warmers: Dict[str, Warmer],
+           budget: Optional[float] = None) -> int:
+    """
+    Replay request targets through the warmers of their paths.
+
+    Targets without a warmer, and requests that fail (e.g. a book that
+    is not in this snapshot), are skipped.
+
+    Args:
+        snapshot: ``CorpusSnapshot`` whose caches are filled
+        targets: Request targets (path and query)
+        warmers: Warmers keyed by path
+        budget: Stop after this many seconds; None replays everything
+
+    Returns:
+        Number of requests replayed successfully
+    """
+    started = time.monotonic()
+    warmed = 0
+    for target in targets:
+        if budget is not None and time.monotonic() - started > budget:
+            logging.info(f"Warmup stopped after {budget}s budget")
+            break
+        parts = urlsplit(target)
+        path = unquote(parts.path)
+        warmer = find_warmer(warmers, path)
+        if warmer is None:
+            continue
+        try:
+            warmer(snapshot, path, dict(parse_qsl(parts.query)))
+        except Exception:
+            continue
+        warmed += 1
+    return warmed
+
+
+@lru_cache(maxsize=1)
+def code_fingerprint() -> str:
+    """
+    Hash of the application's Python sources.
+
+    Cached values are built by this code (and may be instances of its
+    classes), so caches saved by other code are not reused.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = [os.path.join(root, name) for name in os.listdir(root) if name.endswith(".py")]
+    for name in os.listdir(root):
+        package = os.path.join(root, name)
+        if name != "tests" and os.path.isfile(os.path.join(package, "__init__.py")):
+            paths += [os.path.join(package, module) for module in os.listdir(package) if module.endswith(".py")]
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, root).encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _cache_fingerprint(snapshot) -> Dict[str, object]:
+    return {"format": CACHE_FORMAT, "code": code_fingerprint(), "corpus": snapshot.source_fingerprint}
+
+
+def save_caches(snapshot, path: str) -> int:
+    """
+    Save the caches of a snapshot for the next start.
+
+    Args:
+        snapshot: ``CorpusSnapshot`` to save the caches of
+        path: File to write; replaced atomically
+
+    Returns:
+        Number of cached entries written
+    """
+    caches = {name: (cache.maxsize, cache.items()) for name, cache in snapshot.caches.items()}
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump({"fingerprint": _cache_fingerprint(snapshot), "caches": caches}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+    return sum(len(items) for _, items in caches.values())
+
+
+def load_caches(snapshot, path: str) -> bool:
+    """
+    Restore caches saved by ``save_caches`` into a new snapshot.
+
+    The file is only used if it was saved from the same corpus files, by
+    the same code and in the same format (``CACHE_FORMAT``); a file that
+    cannot be read is ignored. It is trusted like any other file in the
+    data directory.
+
+    Returns:
+        True if the caches were restored
+    """
+    try:
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if saved["fingerprint"] != _cache_fingerprint(snapshot):
+            return False
+        caches = {}
+        for name, (maxsize, items) in saved["caches"].items():
+            cache = caches[name] = LRUCache(maxsize)
+            for key, value in items:
+                cache.put(key, value)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        # Unreadable, truncated, or pickled by code that no longer exists
+        logging.warning(f"Ignoring cache snapshot '{path}': {e!r}")
+        return False
+    snapshot.caches.update(caches)
+    return True
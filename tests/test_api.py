@@ -0,0 +1,130 @@
+"""
+Tests for the API endpoints.
+
+Tests the endpoints through a test client against a small synthetic
+corpus instead of the Bible files.
+"""
+
+import pytest
+import sys
+import os
+
+# Add the parent directory to the path so we can import main
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("PRELOAD_CORPUS", "0")
+
+from fastapi.testclient import TestClient
+
+import main
+from commentary.store import CommentaryLibrary, build_store
+from corpus.books import BOOKS
+from corpus.ingest import build_version
+from corpus.snapshot import CorpusHandle
+
+# Every book has 7 chapters of 3 verses; two have their Statenvertaling name
+NAMES = {"Matthew": "Mattheüs", "John": "Johannes"}
+RECORDS = [(NAMES.get(english, english), str(chapter), str(verse), f"{english} {chapter}:{verse} licht")
+           for _, _, english in BOOKS for chapter in range(1, 8) for verse in range(1, 4)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    corpus = CorpusHandle(lambda: {"statenvertaling": build_version(RECORDS, "statenvertaling", {})},
+                          lambda: [])
+    monkeypatch.setattr(main, "corpus", corpus)
+    monkeypatch.setattr(main, "response_cache", None)
+    monkeypatch.setattr(main.limiter, "enabled", False)
+    return TestClient(main.app)
+
+
+def references(response):
+    assert response.status_code == 200, response.text
+    return [f"{verse['book']} {verse['chapter']}:{verse['verse']}" for verse in response.json()]
+
+
+class TestSearchScope:
+    """Test limiting /api/search to books, a testament or ranges."""
+
+    def test_books(self, client):
+        found = references(client.get("/api/search", params={"query": "licht", "books": "Ruth,Jude"}))
+        assert len(found) == 2 * 21
+        assert {reference.split(" ")[0] for reference in found} == {"Ruth", "Jude"}
+
+    def test_testament(self, client):
+        found = references(client.get("/api/search", params={"query": "licht", "testament": "nt"}))
+        assert found[0] == "Mattheüs 1:1"
+        assert len(found) == 27 * 21
+        assert client.get("/api/search", params={"query": "licht", "testament": "x"}).status_code == 400
+
+    def test_testament_of_a_partial_version(self, client, monkeypatch):
+        records = [record for record in RECORDS if record[0] in ("Johannes", "Mattheüs", "Genesis")]
+        monkeypatch.setattr(main, "corpus", CorpusHandle(
+            lambda: {"statenvertaling": build_version(records, "statenvertaling", {})}, lambda: []))
+        found = references(client.get("/api/search", params={"query": "licht", "testament": "nt"}))
+        assert {reference.split(" ")[0] for reference in found} == {"Mattheüs", "Johannes"}
+        found = references(client.get("/api/search", params={"query": "licht", "testament": "ot"}))
+        assert {reference.split(" ")[0] for reference in found} == {"Genesis"}
+    
+    def test_chapter_range_covers_whole_chapters(self, client):
+        found = references(client.get("/api/search", params={"query": "licht", "range": "Mattheüs 5-7"}))
+        assert found == [f"Mattheüs {chapter}:{verse}" for chapter in range(5, 8) for verse in range(1, 4)]
+        found = references(client.get("/api/search", params={"query": "licht", "range": "johannes 1 - 2"}))
+        assert found == [f"Johannes {chapter}:{verse}" for chapter in range(1, 3) for verse in range(1, 4)]
+
+    def test_verse_ranges_and_filters_combine(self, client):
+        params = {"query": "licht", "range": "Johannes 3:2-4:1; Genesis 1", "testament": "nt"}
+        found = references(client.get("/api/search", params=params))
+        assert found == ["Johannes 3:2", "Johannes 3:3", "Johannes 4:1"]
+        params = {"query": "licht", "range": "Mattheüs 7-5"}
+        assert client.get("/api/search", params=params).status_code == 400
+
+
+class TestReadingPlanEndpoint:
+    """Test /api/reading-plan scopes."""
+
+    def test_chapter_range(self, client):
+        response = client.get("/api/reading-plan", params={"days": 3, "scope": "Johannes 1-2"})
+        assert response.status_code == 200, response.text
+        days = response.json()["days"]
+        assert [day["references"] for day in days] == [
+            ["Johannes 1:1-2"], ["Johannes 1:3-2:1"], ["Johannes 2:2-3"],
+        ]
+
+    def test_testament_and_errors(self, client):
+        response = client.get("/api/reading-plan", params={"days": 27, "scope": "nt", "unit": "words"})
+        assert response.status_code == 200, response.text
+        days = response.json()["days"]
+        assert len(days) == 27
+        assert days[0]["references"][0].startswith("Mattheüs 1:1-")
+        assert sum(day["verses"] for day in days) == 27 * 21
+        params = {"days": 7, "scope": "Johannes 1-2"}
+        assert client.get("/api/reading-plan", params=params).status_code == 400
+        params = {"days": 1, "scope": "Johannes 1-2", "unit": "lines"}
+        assert client.get("/api/reading-plan", params=params).status_code == 400
+
+
+class TestCommentaryEndpoint:
+    """Test /api/commentary book lookup."""
+
+    def test_books_by_name(self, client, tmp_path, monkeypatch):
+        # A partial commentary: only John (book 43) and Jude (book 65)
+        names = [None] * len(BOOKS)
+        names[42], names[64] = "Johannes", "Judas"
+        build_store([(43, 3, 16, "Want alzo lief."), (65, 1, 3, "Strijdt voor het geloof.")],
+                    names, str(tmp_path / "notes"))
+        monkeypatch.setattr(main, "commentaries", CommentaryLibrary(str(tmp_path)))
+        for book in ("Johannes", "John", "JHN"):
+            params = {"source": "notes", "book": book, "chapter": 3, "verse": 16}
+            response = client.get("/api/commentary", params=params)
+            assert response.status_code == 200, response.text
+            assert response.json()["book"] == "Johannes"
+            assert response.json()["text"] == "Want alzo lief."
+        response = client.get("/api/commentary", params={"source": "notes", "book": "Jude", "chapter": 1})
+        assert response.json()["verses"] == [{"verse": "3", "text": "Strijdt voor het geloof."}]
+        response = client.get("/api/commentary", params={"source": "notes", "book": "Genesis", "chapter": 1})
+        assert response.status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,191 @@
+"""
+Tests for the billing webhook queue and usage metering.
+
+Tests that Stripe events are stored once, applied in batches by the
+worker and retried with backoff when their handler fails, and that
+usage counts are flushed in batches without losing requests.
+"""
+
+import pytest
+import sys
+import os
+
+# Add the parent directory to the path so we can import billing modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from billing.events import handle_event
+from billing.queue import WebhookQueue
+from billing.usage import UsageMeter
+from models import APIKey, APIUsage, Base, WebhookEvent
+
+
+def event(event_id, event_type, email="a@example.com"):
+    return event_id, event_type, json.dumps({"id": event_id, "type": event_type,
+                                             "data": {"object": {"customer_email": email}}})
+
+
+def memory_sessions():
+    """Session factory for an in-memory database shared with worker threads."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+def file_sessions(path):
+    """Session factory for a database file, with a connection per session.
+
+    The in-memory database shares one connection, so a session closed in
+    the test thread would roll back a transaction the worker has open.
+    """
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+class TestWebhookQueue:
+    """Test the durable webhook queue."""
+
+    def setup_method(self):
+        self.sessions = memory_sessions()
+
+    def keys(self):
+        session = self.sessions()
+        try:
+            return {key.user_email: key.active for key in session.query(APIKey)}
+        finally:
+            session.close()
+
+    def jobs(self):
+        session = self.sessions()
+        try:
+            return {job.event_id: (job.status, job.attempts) for job in session.query(WebhookEvent)}
+        finally:
+            session.close()
+
+    def test_events_are_stored_once(self):
+        queue = WebhookQueue(self.sessions)
+        assert queue.enqueue(*event("evt_1", "checkout.session.completed"))
+        assert not queue.enqueue(*event("evt_1", "checkout.session.completed"))
+        assert queue.run_once() == 1
+        assert queue.run_once() == 0
+        assert self.keys() == {"a@example.com": True}
+        assert self.jobs() == {"evt_1": ("done", 1)}
+
+    def test_activation_and_deactivation_are_idempotent(self):
+        queue = WebhookQueue(self.sessions)
+        queue.enqueue(*event("evt_1", "checkout.session.completed"))
+        queue.enqueue(*event("evt_2", "checkout.session.completed"))
+        queue.enqueue(*event("evt_3", "customer.subscription.deleted"))
+        queue.enqueue(*event("evt_4", "customer.created"))
+        assert queue.run_once() == 4
+        assert self.keys() == {"a@example.com": False}
+        queue.enqueue(*event("evt_5", "checkout.session.completed"))
+        queue.run_once()
+        assert self.keys() == {"a@example.com": True}
+
+    def test_failing_event_is_retried_alone(self):
+        def handler(session, data):
+            if data["id"] == "evt_bad":
+                raise RuntimeError("boom")
+            handle_event(session, data)
+
+        queue = WebhookQueue(self.sessions, handler, max_attempts=2)
+        queue.enqueue(*event("evt_bad", "checkout.session.completed", "b@example.com"))
+        queue.enqueue(*event("evt_good", "checkout.session.completed"))
+        assert queue.run_once(now=1000.0) == 2
+        assert self.keys() == {"a@example.com": True}
+        assert self.jobs() == {"evt_bad": ("pending", 1), "evt_good": ("done", 1)}
+        # Not due again until the backoff has passed
+        assert queue.run_once(now=1001.0) == 0
+        assert queue.run_once(now=1010.0) == 1
+        assert self.jobs()["evt_bad"] == ("failed", 2)
+
+    def test_expired_claims_are_taken_over(self):
+        queue = WebhookQueue(self.sessions)
+        queue.enqueue(*event("evt_1", "checkout.session.completed"))
+        session = self.sessions()
+        assert len(queue._claim(session, now=1000.0)) == 1
+        session.close()
+        # Still claimed by the first worker
+        assert queue.run_once(now=1001.0) == 0
+        assert queue.run_once(now=1000.0 + 301) == 1
+        assert self.jobs() == {"evt_1": ("done", 1)}
+
+    def test_background_worker(self, tmp_path):
+        self.sessions = file_sessions(tmp_path / "billing.db")
+        queue = WebhookQueue(self.sessions, poll_interval=0.01)
+        queue.start()
+        try:
+            queue.enqueue(*event("evt_1", "checkout.session.completed"))
+            for _ in range(200):
+                if self.jobs()["evt_1"][0] == "done":
+                    break
+                queue._stop.wait(0.01)
+        finally:
+            queue.stop()
+        assert self.keys() == {"a@example.com": True}
+
+
+class TestUsageMeter:
+    """Test the batched usage counters."""
+
+    def setup_method(self):
+        self.sessions = memory_sessions()
+        # Flushed by hand in the tests
+        self.meter = UsageMeter(self.sessions, flush_interval=3600)
+
+    def rows(self):
+        session = self.sessions()
+        try:
+            return {(row.api_key, row.endpoint, row.day): row.count for row in session.query(APIUsage)}
+        finally:
+            session.close()
+
+    def test_flush_adds_to_stored_counts(self):
+        for _ in range(3):
+            self.meter.record("key1", "/api/verse", "2026-01-01")
+        self.meter.record("key2", "/api/verse", "2026-01-01")
+        assert self.meter.flush() == 2
+        assert self.meter.flush() == 0
+        self.meter.record("key1", "/api/verse", "2026-01-01")
+        self.meter.flush()
+        assert self.rows() == {("key1", "/api/verse", "2026-01-01"): 4, ("key2", "/api/verse", "2026-01-01"): 1}
+        self.meter.stop()
+
+    def test_usage_includes_unflushed_counts(self):
+        self.meter.record("key1", "/api/verse", "2026-01-01")
+        self.meter.flush()
+        self.meter.record("key1", "/api/verse", "2026-01-01")
+        self.meter.record("key1", "/api/search", "2026-01-02")
+        self.meter.record("key2", "/api/search", "2026-01-02")
+        assert self.meter.usage("key1") == [
+            {"endpoint": "/api/search", "day": "2026-01-02", "count": 1},
+            {"endpoint": "/api/verse", "day": "2026-01-01", "count": 2},
+        ]
+        assert self.meter.usage("key1", since="2026-01-02") == [
+            {"endpoint": "/api/search", "day": "2026-01-02", "count": 1},
+        ]
+        self.meter.stop()
+        assert self.meter.pending() == {}
+        assert sum(self.rows().values()) == 4
+
+    def test_failed_flush_keeps_counts(self):
+        def broken_sessions():
+            raise RuntimeError("database unavailable")
+
+        meter = UsageMeter(broken_sessions, flush_interval=3600)
+        meter.record("key1", "/api/verse", "2026-01-01")
+        with pytest.raises(RuntimeError):
+            meter.flush()
+        assert meter.pending() == {("key1", "/api/verse", "2026-01-01"): 1}
+        meter.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
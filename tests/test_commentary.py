@@ -0,0 +1,88 @@
+"""
+Tests for the commentary store.
+
+Tests building the on-disk store and reading verses and chapters back
+through the offset table.
+"""
+
+import pytest
+import sys
+import os
+import json
+
+# Add the parent directory to the path so we can import commentary modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commentary.store import CommentaryLibrary, CommentaryStore, build_store, build_store_from_json
+
+
+class TestCommentaryStore:
+    """Test the indexed commentary store."""
+    
+    def setup_method(self):
+        self.entries = [
+            (40, 5, 3, "Blessed are the poor in spirit."),
+            (1, 1, 0, "Introduction to Genesis 1."),
+            (1, 1, 1, "In the beginning — the first verse."),
+            (1, 2, 7, "Formed of the dust."),
+            (1, 1, 2, "Without form, and void."),
+        ]
+        self.book_names = [f"Book {number}" for number in range(1, 67)]
+        self.book_names[0] = "Genesis"
+        self.book_names[39] = "Matthew"
+    
+    def test_verse_lookup(self, tmp_path):
+        path = str(tmp_path / "henry")
+        assert build_store(self.entries, self.book_names, path) == 5
+        store = CommentaryStore(path)
+        assert len(store) == 5
+        assert store.verse(1, 1, 1) == "In the beginning — the first verse."
+        assert store.verse(40, 5, 3) == "Blessed are the poor in spirit."
+        assert store.verse(1, 1, 3) is None
+        store.close()
+    
+    def test_chapter_lookup(self, tmp_path):
+        path = str(tmp_path / "henry")
+        build_store(self.entries, self.book_names, path)
+        store = CommentaryStore(path)
+        assert store.chapter(1, 1) == {
+            0: "Introduction to Genesis 1.",
+            1: "In the beginning — the first verse.",
+            2: "Without form, and void.",
+        }
+        assert store.chapter(1, 3) == {}
+        store.close()
+    
+    def test_library(self, tmp_path):
+        build_store(self.entries, self.book_names, str(tmp_path / "matthew-henry"))
+        library = CommentaryLibrary(str(tmp_path))
+        assert library.sources() == ["matthew-henry"]
+        store = library.get("matthew-henry")
+        assert store is library.get("matthew-henry")
+        assert store.book_name(40) == "Matthew"
+        assert library.get("../matthew-henry") is None
+    
+    def test_partial_reordered_json(self, tmp_path):
+        source = tmp_path / "notes.json"
+        source.write_text(json.dumps({
+            "Johannes": {"3": {"16": "Want alzo lief."}},
+            "Genesis": {"1": {"0": "Inleiding.", "1": "In den beginne."}},
+        }), encoding="utf-8")
+        path = str(tmp_path / "notes")
+        assert build_store_from_json(str(source), path) == 3
+        store = CommentaryStore(path)
+        assert store.verse(43, 3, 16) == "Want alzo lief."
+        assert store.chapter(1, 1) == {0: "Inleiding.", 1: "In den beginne."}
+        assert store.book_name(43) == "Johannes"
+        assert store.book_name(1) == "Genesis"
+        assert store.book_name(2) is None
+        store.close()
+    
+    def test_unknown_book_in_json(self, tmp_path):
+        source = tmp_path / "notes.json"
+        source.write_text(json.dumps({"Henoch": {"1": {"1": "?"}}}), encoding="utf-8")
+        with pytest.raises(ValueError):
+            build_store_from_json(str(source), str(tmp_path / "notes"))
+
+if __name__ == "__main__":
+    pytest.main([__file__])
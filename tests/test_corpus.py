@@ -0,0 +1,368 @@
+"""
+Tests for the corpus tables.
+
+Tests the structures that are precomputed when a Bible version is
+loaded.
+"""
+
+import pytest
+import sys
+import os
+
+# Add the parent directory to the path so we can import corpus modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import gzip
+import io
+import json
+
+from corpus import ingest
+from corpus import export
+from corpus.books import english_name
+from corpus.export import export_chunks, write_artifact
+from corpus.ingest import load_version, read_json, read_osis, read_usfm, write_compact, read_ndjson
+from corpus.parallel import align_versions
+from corpus.reading_plan import VerseLengths, compact_references, reading_plan
+from corpus.snapshot import CorpusHandle
+from corpus.structure import BibleStructure
+from corpus.versification import VersificationMap, scheme_for_version, split_verse_id, verse_id
+from parsing.reference_parser import ReferenceParser
+
+
+def make_data():
+    """Small two-book corpus used by the tests."""
+    return {
+        "Genesis": {
+            "1": {str(v): f"Genesis 1:{v}" for v in range(1, 32)},
+            "2": {str(v): f"Genesis 2:{v}" for v in range(1, 26)},
+        },
+        "Maleachi": {
+            "3": {str(v): f"Maleachi 3:{v}" for v in range(1, 19)},
+            "4": {str(v): f"Maleachi 4:{v}" for v in range(1, 7)},
+        },
+    }
+
+
+class TestBibleStructure:
+    """Test the versification structure table."""
+    
+    def test_counts(self):
+        structure = BibleStructure.from_data(make_data())
+        assert structure.book_names() == ["Genesis", "Maleachi"]
+        assert structure.chapter_count("Genesis") == 2
+        assert structure.max_verse("Genesis", 1) == 31
+        assert structure.max_verse("Genesis", "2") == 25
+        assert structure.max_verse("Genesis", "3") is None
+        assert structure.chapter_count("Exodus") == 0
+    
+    def test_to_dict_and_etag(self):
+        structure = BibleStructure.from_data(make_data())
+        assert structure.to_dict()["books"][1] == {
+            "name": "Maleachi",
+            "chapters": 2,
+            "verses": {"3": 18, "4": 6},
+        }
+        assert structure.etag() == BibleStructure.from_data(make_data()).etag()
+    
+    def test_parser_uses_structure_for_end(self):
+        data = make_data()
+        versions = {"sv": {"data": data, "structure": BibleStructure.from_data(data)}}
+        parser = ReferenceParser(all_versions=versions, version="sv")
+        chapter_data = parser._get_chapter_data("Genesis", "2", "sv")
+        assert chapter_data["max_verse"] == 25
+        result = parser.parse("Genesis 2:20-end", "sv")
+        assert [verse["verse"] for verse in result["verses"]] == ["20", "21", "22", "23", "24", "25"]
+    
+    def test_ordinals(self):
+        structure = BibleStructure.from_data(make_data())
+        assert structure.total_verses == 31 + 25 + 18 + 6
+        assert structure.ordinal("Genesis", "1", "1") == 0
+        assert structure.ordinal("Genesis", 2, 1) == 31
+        assert structure.ordinal("Genesis", 2, 26) is None
+        assert structure.reference(31) == ("Genesis", "2", "1")
+        assert structure.reference(structure.total_verses - 1) == ("Maleachi", "4", "6")
+        assert structure.chapter_span("Maleachi", 3) == (56, 74)
+
+
+def make_structure(psalm_51, malachi):
+    """Structure with 66 books where only Psalm 51 and Malachi matter."""
+    books = {english_name(number): {"1": 3} for number in range(1, 67)}
+    books["Psalms"] = {"50": 23, "51": psalm_51}
+    books["Malachi"] = malachi
+    return BibleStructure(books)
+
+
+class TestVersification:
+    """Test versification mapping between schemes."""
+    
+    def setup_method(self):
+        self.english = VersificationMap(make_structure(19, {"3": 18, "4": 6}), "english")
+        self.sv = VersificationMap(make_structure(21, {"3": 18, "4": 6}), "sv")
+        self.hebrew = VersificationMap(make_structure(21, {"3": 24}), "hebrew")
+    
+    def test_verse_ids(self):
+        assert verse_id(19, 51, 3) == 19051003
+        assert split_verse_id(19051003) == (19, 51, 3)
+    
+    def test_psalm_titles(self):
+        assert self.sv.to_canonical("Psalms", "51", "3") == verse_id(19, 51, 1)
+        assert self.sv.to_canonical(19, 51, 1) is None  # superscription
+        assert self.sv.translate(self.english, 19, 51, 21) == ("Psalms", "51", "19")
+        assert self.english.translate(self.sv, 19, 51, 1) == ("Psalms", "51", "3")
+        assert self.sv.translate(self.english, 19, 50, 5) == ("Psalms", "50", "5")
+    
+    def test_malachi_chapters(self):
+        assert self.hebrew.translate(self.english, 39, 3, 19) == ("Malachi", "4", "1")
+        assert self.english.translate(self.hebrew, 39, 4, 6) == ("Malachi", "3", "24")
+        assert self.english.translate(self.hebrew, 39, 3, 18) == ("Malachi", "3", "18")
+        assert self.sv.translate(self.hebrew, 39, 4, 2) == ("Malachi", "3", "20")
+    
+    def test_books_are_numbered_by_name(self):
+        # Only some books, out of order, one of them unknown and one Dutch
+        partial = VersificationMap(BibleStructure({
+            "Mattheüs": {"1": 25}, "Apocrypha": {"1": 5}, "Psalmen": {"51": 21}, "Malachi": {"3": 24},
+        }), "hebrew")
+        assert partial.to_canonical("Mattheüs", 1, 1) == verse_id(40, 1, 1)
+        assert partial.to_canonical("Apocrypha", 1, 1) is None
+        assert partial.translate(self.english, "Psalmen", 51, 3) == ("Psalms", "51", "1")
+        assert partial.translate(self.english, "Malachi", 3, 19) == ("Malachi", "4", "1")
+        assert self.english.translate(partial, 40, 1, 1) == ("Mattheüs", "1", "1")
+        assert self.english.translate(partial, 1, 1, 1) is None
+    
+    def test_renumbered_verse_does_not_map_to_itself(self):
+        # Canonical Psalm 51:20 does not exist, even though the SV has a 51:20
+        assert self.sv.from_canonical(verse_id(19, 51, 20)) is None
+    
+    def test_scheme_for_version(self):
+        assert scheme_for_version("Statenvertaling") == "sv"
+        assert scheme_for_version("kjv") == "english"
+        assert scheme_for_version("nbg", {"versification": "hebrew"}) == "hebrew"
+
+
+def make_version(psalm_51_verses, scheme):
+    """Loaded version with 66 books where only Psalm 51 has verses that matter."""
+    data = {english_name(number): {"1": {"1": f"{scheme} {number} 1:1"}} for number in range(1, 67)}
+    data["Psalms"] = {"51": {str(v): f"{scheme} 51:{v}" for v in range(1, psalm_51_verses + 1)}}
+    structure = BibleStructure.from_data(data)
+    return {"data": data, "structure": structure, "verse_map": VersificationMap(structure, scheme)}
+
+
+class TestParallel:
+    """Test aligning a parsed passage across versions."""
+    
+    def test_align_psalm_with_titles(self):
+        versions = {"sv": make_version(21, "sv"), "kjv": make_version(19, "english")}
+        parser = ReferenceParser(all_versions=versions, version="sv")
+        result = parser.parse("Psalms 51:2-4", "sv")
+        rows = align_versions(result["verses"], versions)
+        assert [row["canonical"] for row in rows] == [None, verse_id(19, 51, 1), verse_id(19, 51, 2)]
+        assert rows[0]["verses"]["kjv"] is None
+        assert rows[1]["verses"]["sv"]["text"] == "sv 51:3"
+        assert rows[1]["verses"]["kjv"] == {"book": "Psalms", "chapter": "51", "verse": "1", "text": "english 51:1"}
+    
+    def test_half_verses_are_cut_in_every_version(self):
+        versions = {"sv": make_version(21, "sv"), "kjv": make_version(19, "english")}
+        versions["sv"]["data"]["Psalms"]["51"]["4"] = "Was mij wel van mijn ongerechtigheid; en reinig mij."
+        versions["kjv"]["data"]["Psalms"]["51"]["2"] = "Wash me throughly from mine iniquity, and cleanse me."
+        parser = ReferenceParser(all_versions=versions, version="sv")
+        rows = align_versions(parser.parse("Psalms 51:3-4a", "sv")["verses"], versions)
+        assert rows[0]["verses"]["kjv"]["text"] == "english 51:1"
+        assert rows[1]["verses"]["sv"] == {"book": "Psalms", "chapter": "51", "verse": "4", "segment": "a",
+                                           "text": "Was mij wel van mijn ongerechtigheid;"}
+        # Split at the English verse's own clause boundary (a comma here)
+        assert rows[1]["verses"]["kjv"] == {"book": "Psalms", "chapter": "51", "verse": "2", "segment": "a",
+                                            "text": "Wash me throughly from mine iniquity,"}
+
+
+class TestIngest:
+    """Test the streaming readers and the single-pass version build."""
+    
+    def write_json(self, tmp_path):
+        path = tmp_path / "sv.json"
+        path.write_text(json.dumps({
+            "metadata": {"name": "Statenvertaling", "year": 1637},
+            "verses": [
+                {"book_name": "Genesis", "chapter": 1, "verse": 1, "text": "In den beginne schiep God den hemel en de aarde."},
+                {"book_name": "Genesis", "chapter": 1, "verse": 2, "text": "De aarde nu was woest en ledig."},
+                {"book_name": "Johannes", "chapter": 3, "verse": 16, "text": "Want alzo lief heeft God de wereld gehad."},
+            ],
+        }, ensure_ascii=False), encoding="utf-8")
+        return str(path)
+    
+    def test_read_json_in_small_chunks(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(ingest, "CHUNK_SIZE", 7)
+        meta = {}
+        records = list(read_json(self.write_json(tmp_path), meta))
+        assert records[0] == ("Genesis", "1", "1", "In den beginne schiep God den hemel en de aarde.")
+        assert records[2][:3] == ("Johannes", "3", "16")
+        assert meta == {"name": "Statenvertaling", "year": 1637}
+    
+    def test_load_version(self, tmp_path):
+        version = load_version(self.write_json(tmp_path), "statenvertaling")
+        assert version["data"]["Genesis"]["1"]["2"] == "De aarde nu was woest en ledig."
+        assert version["structure"].max_verse("Johannes", "3") == 16
+        assert version["verse_map"].scheme == "sv"
+        assert len(version["search_index"]) == 3
+    
+    def test_compact_round_trip(self, tmp_path):
+        meta = {}
+        path = str(tmp_path / "sv.ndjson")
+        assert write_compact(read_json(self.write_json(tmp_path), meta), path, meta) == 3
+        meta_back = {}
+        assert list(read_ndjson(path, meta_back)) == list(read_json(self.write_json(tmp_path)))
+        assert meta_back["year"] == 1637
+    
+    def test_read_osis(self, tmp_path):
+        path = tmp_path / "kjv.xml"
+        path.write_text(
+            '<osis xmlns="http://www.bibletechnologies.net/2003/OSIS/namespace"><osisText>'
+            '<header><work><title>King James Version</title></work></header>'
+            '<div type="book" osisID="Gen"><chapter osisID="Gen.1">'
+            '<verse osisID="Gen.1.1">In the <w>beginning</w> God<note>n</note> created</verse>'
+            '</chapter></div>'
+            '<div type="book" osisID="Ps"><chapter sID="Ps.3"/><title>A Psalm</title>'
+            '<verse sID="Ps.3.1" osisID="Ps.3.1"/>LORD, how are they <i>increased</i><verse eID="Ps.3.1"/>'
+            '<chapter eID="Ps.3"/></div></osisText></osis>',
+            encoding="utf-8",
+        )
+        meta = {}
+        assert list(read_osis(str(path), meta)) == [
+            ("Genesis", "1", "1", "In the beginning God created"),
+            ("Psalms", "3", "1", "LORD, how are they increased"),
+        ]
+        assert meta["name"] == "King James Version"
+    
+    def test_read_usfm(self, tmp_path):
+        path = tmp_path / "jhn.usfm"
+        path.write_text(
+            "\\id JHN\n\\h John\n\\c 3\n\\s1 God's love\n\\p\n"
+            "\\v 16 For God so \\w loved|strong=\"G25\"\\w* the world,\\f + \\ft note\\f*\n"
+            "\\q1 that he gave \\v 17 For God sent not\n",
+            encoding="utf-8",
+        )
+        assert list(read_usfm(str(path))) == [
+            ("John", "3", "16", "For God so loved the world, that he gave"),
+            ("John", "3", "17", "For God sent not"),
+        ]
+
+
+class TestCorpusHandle:
+    """Test reloading corpus snapshots."""
+    
+    def setup_method(self):
+        self.loads = 0
+    
+    def loader(self):
+        self.loads += 1
+        return {"sv": {"data": {}, "generation": self.loads}}
+    
+    def test_reload_only_on_change(self, tmp_path):
+        source = tmp_path / "sv.json"
+        source.write_text("{}")
+        handle = CorpusHandle(self.loader, lambda: [str(source)], warmups=[])
+        first = handle.current()
+        assert first.generation == 1
+        assert handle.reload() is None
+        source.write_text('{"changed": true}')
+        second = handle.reload()
+        assert second.generation == 2
+        assert handle.current() is second
+        assert second.etag != first.etag
+        # The old snapshot is untouched for requests still holding it
+        assert first.versions["sv"]["generation"] == 1
+    
+    def test_warmup_runs_before_swap(self, tmp_path):
+        seen = []
+        handle = CorpusHandle(self.loader, lambda: [], warmups=[
+            lambda snapshot: seen.append(handle.loaded and handle.current() is snapshot)
+        ])
+        handle.load()
+        handle.reload(force=True)
+        assert seen == [False, False]
+        assert handle.current().generation == 2
+    
+    def test_failed_reload_keeps_snapshot(self):
+        handle = CorpusHandle(self.loader, lambda: [], warmups=[])
+        first = handle.load()
+        handle.loader = lambda: 1 / 0
+        assert handle.reload(force=True) is None
+        assert handle.current() is first
+
+class TestExport:
+    """Test the streaming bulk export."""
+    
+    RECORDS = [("Genesis", "1", str(v), f"Tekst, \"{v}\"") for v in range(1, 6)]
+    
+    def export(self, fmt):
+        return b"".join(export_chunks(iter(self.RECORDS), fmt)).decode("utf-8")
+    
+    @pytest.mark.parametrize("batch_size", [2, 512])
+    def test_formats(self, monkeypatch, batch_size):
+        monkeypatch.setattr(export, "BATCH_SIZE", batch_size)
+        expected = [dict(zip(("book", "chapter", "verse", "text"), record)) for record in self.RECORDS]
+        assert [json.loads(line) for line in self.export("ndjson").splitlines()] == expected
+        assert json.loads(self.export("json")) == expected
+        assert list(csv.DictReader(io.StringIO(self.export("csv")))) == expected
+    
+    def test_empty_export(self):
+        assert b"".join(export_chunks(iter([]), "json")) == b"[]"
+        assert b"".join(export_chunks(iter([]), "csv")).decode("utf-8").strip() == "book,chapter,verse,text"
+        with pytest.raises(ValueError):
+            list(export_chunks(iter([]), "xml"))
+    
+    def test_write_artifact(self, tmp_path):
+        path = str(tmp_path / "sv.ndjson.gz")
+        size = write_artifact(iter(self.RECORDS), path)
+        assert size == os.path.getsize(path)
+        with open(path, "rb") as f:
+            assert gzip.decompress(f.read()).decode("utf-8") == self.export("ndjson")
+        assert os.listdir(tmp_path) == ["sv.ndjson.gz"]
+
+class TestReadingPlan:
+    """Test the balanced reading plans."""
+    
+    def setup_method(self):
+        # Verse v of chapter c has c * v words
+        records = [(book, str(c), str(v), " ".join(["woord"] * (c * v)))
+                   for book in ("Genesis", "1 Samuel") for c in range(1, 4) for v in range(1, 5)]
+        self.version = ingest.build_version(records, "test", {})
+        self.index = self.version["search_index"]
+        self.lengths = VerseLengths(self.index)
+    
+    def test_plan_covers_scope_in_balanced_days(self):
+        scope = [(0, len(self.index))]
+        plan = reading_plan(self.index, self.lengths, scope, 4, "words")
+        assert [day["length"] for day in plan] == [30, 30, 30, 30]
+        assert plan[0]["references"] == ["Genesis 1:1-2:4"]
+        assert plan[1]["references"] == ["Genesis 3:1-4"]
+        assert sum(day["verses"] for day in plan) == len(self.index)
+        # Every reference parses back to exactly the planned verses
+        parser = ReferenceParser({"test": self.version}, "test")
+        docs = []
+        for day in plan:
+            for reference in day["references"]:
+                for verse in parser.parse(reference, "test")["verses"]:
+                    docs.append(self.index.doc_of(verse.ref[0], verse.ref[1], verse.verse))
+        assert docs == list(range(len(self.index)))
+    
+    def test_plan_with_gaps(self):
+        # Two separate ranges; a day may span the gap
+        scope = [(2, 4), (12, 13)]
+        assert self.lengths.plan(scope, 2, "words") == [0, 1, 3]
+        plan = reading_plan(self.index, self.lengths, scope, 2, "words")
+        assert plan[0]["references"] == ["Genesis 1:3"]
+        assert plan[1]["references"] == ["Genesis 1:4", "1 Samuel 1:1"]
+        assert plan[1]["length"] == 5
+    
+    def test_every_day_reads_a_verse(self):
+        scope = [(0, 3)]
+        assert self.lengths.plan(scope, 3) == [0, 1, 2, 3]
+        with pytest.raises(ValueError):
+            self.lengths.plan(scope, 4)
+    
+    def test_compact_references_split_books(self):
+        assert compact_references(self.index, [(11, 13)]) == ["Genesis 3:4", "1 Samuel 1:1"]
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -14,6 +14,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from parsing.reference_parser import ReferenceParser
 from parsing.book_normalizer import BookNormalizer
+from parsing.results import ParseResult, Verse, VerseList, encode_json, parse_fields, select_fields
+from parsing.extractor import BookAutomaton, ReferenceExtractor, version_aliases
+from parsing.segments import SegmentTable, parse_verse_token, segment_span, split_offsets
+from corpus.books import DUTCH_NAMES
+from corpus.ingest import build_version
 
 class TestBookNormalizer:
     """Test book name normalization."""
@@ -146,6 +151,14 @@ class TestReferenceParser:
         assert result["end_chapter"] == 4
         assert len(result["verses"]) == 7  # 6 from ch 3 + 1 from ch 4
     
+    def test_parse_cross_chapter_reference_with_middle_chapters(self):
+        """Test that chapters between the start and end chapter are included whole."""
+        self.parser._get_chapter_data = lambda book, chapter, version: {
+            "verses": {"1": f"{chapter}.1", "2": f"{chapter}.2"}
+        }
+        result = self.parser.parse("John 1:2-4:1", "asv")
+        assert [verse.text for verse in result["verses"]] == ["1.2", "2.1", "2.2", "3.1", "3.2", "4.1"]
+    
     def test_parse_verse_with_suffix(self):
         """Test parsing verses with suffixes like 'Habakkuk 3:2-19a'."""
         # Mock Habakkuk data
@@ -178,6 +191,55 @@ class TestReferenceParser:
         assert result["reference"] == "Habakkuk 3:2-19a"
         assert len(result["verses"]) == 18  # 2 through 19
         assert result["formatted_text"]  # Just check that we have formatted text
+        # Verse 19 stops after its first clause
+        last = result["verses"][-1]
+        assert (last.verse, last.segment, last.text) == ("19", "a", "God, the Lord, is my strength;")
+        assert result["verses"][0].segment is None
+        assert result["formatted_text"].endswith("19a God, the Lord, is my strength;")
+    
+    def test_parse_half_verses(self):
+        """Test references that start or end inside a verse."""
+        result = self.parser.parse("Jeremiah 18:6c-7", "asv")
+        assert result["parsed"] == True
+        first = result["verses"][0]
+        assert first.segment == "c"
+        assert first.text.startswith("Just like the clay")
+        assert result["verses"][1].segment is None
+        
+        # A single half verse, and a letter past the last segment
+        result = self.parser.parse("Jeremiah 18:11b", "asv")
+        assert result["verses"][0].text == "Thus says the Lord:"
+        result = self.parser.parse("Jeremiah 18:1c", "asv")
+        assert result["verses"][0].segment == "a"
+        assert result["verses"][0].text == "The word that came to Jeremiah from the Lord:"
+        
+        # Discontinuous parts keep their letters
+        result = self.parser.parse("Jeremiah 18:1-2a, 4b", "asv")
+        assert [(verse.verse, verse.segment) for verse in result["verses"]] == [("1", None), ("2", "a"), ("4", "b")]
+        assert encode_json(result["verses"][1]) == b'{"verse":"2","segment":"a","text":"Arise and go down to the potter\'s house,"}'
+    
+    def test_parse_cross_chapter_half_verses(self):
+        """Test cross-chapter references that start or end inside a verse."""
+        self.parser.all_versions["asv"]["data"]["Jeremiah"]["19"] = {
+            "1": "Thus says the Lord: Go and buy a potter's earthenware jug.",
+            "2": "Go out to the valley of the son of Hinnom.",
+        }
+        result = self.parser.parse("Jeremiah 18:11b-19:1a", "asv")
+        assert result["parsed"] == True
+        first, last = result["verses"][0], result["verses"][-1]
+        assert (first.verse, first.segment) == ("11", "bcd")
+        assert first.text.startswith("Thus says the Lord: Look")
+        assert (last.ref, last.verse, last.segment, last.text) == (("Jeremiah", "19"), "1", "a", "Thus says the Lord:")
+        result = self.parser.parse("Jeremiah 18:10-19:2", "asv")
+        assert [verse.segment for verse in result["verses"]] == [None] * 4
+    
+    def test_segment_overrides(self):
+        """Test that a version's segment table replaces the computed splits."""
+        self.parser.all_versions["asv"]["segments"] = SegmentTable(
+            {"Jeremiah": {"18": {"2": [41, 999]}}}
+        )
+        result = self.parser.parse("Jeremiah 18:2b", "asv")
+        assert result["verses"][0].text == "and there I will let you hear my words."
     
     def test_parse_end_reference(self):
         """Test parsing references with 'end' like 'Jeremiah 18:5-end'."""
@@ -333,5 +395,158 @@ class TestReferenceParser:
         assert result["chapter"] == "104"
         assert len(result["verses"]) == 12  # 26-36 (11 verses) + 37 (1 verse) = 12 total
 
+
+class TestResults:
+    """Test the compact verse and passage result types."""
+    
+    def test_verse_dict_access(self):
+        verse = Verse("16", "For God so loved the world")
+        assert verse["verse"] == "16"
+        assert verse.get("text") == "For God so loved the world"
+        assert verse == {"verse": "16", "text": "For God so loved the world"}
+    
+    def test_formatted_text_is_lazy(self):
+        result = ParseResult({"verses": VerseList([Verse("1", "a"), Verse("2", "b")])})
+        assert "formatted_text" not in result
+        assert result["formatted_text"] == "1 a 2 b"
+        assert "formatted_text" in result
+    
+    def test_encode_json(self):
+        result = ParseResult({"verses": VerseList([Verse("1", "ë")])})
+        assert encode_json(result) == '{"verses":[{"verse":"1","text":"ë"}]}'.encode("utf-8")
+    
+    def test_select_ids_only(self):
+        result = ParseResult({
+            "reference": "John 3:16-17",
+            "parsed": True,
+            "book": "John",
+            "chapter": "3",
+            "verses": VerseList([Verse("16", "a"), Verse("17", "b")]),
+        })
+        selected = select_fields(result, parse_fields("ids"))
+        assert selected == {
+            "reference": "John 3:16-17",
+            "parsed": True,
+            "book": "John",
+            "chapter": "3",
+            "verse_ids": ["16", "17"],
+        }
+        assert "formatted_text" not in result  # never built
+    
+    def test_select_all_fields(self):
+        result = ParseResult({"reference": "x", "parsed": True, "verses": VerseList([Verse("1", "a")])})
+        selected = select_fields(result)
+        assert selected["formatted_text"] == "1 a"
+        assert "verse_ids" not in selected
+    
+    def test_parse_fields_rejects_unknown(self):
+        with pytest.raises(ValueError):
+            parse_fields("ids,colour")
+        assert parse_fields(None) is None
+        assert parse_fields(["verses", " formatted_text"]) == {"verses", "formatted_text"}
+
+class TestSegments:
+    """Test verse segment splitting."""
+    
+    def test_split_offsets(self):
+        text = "In the beginning; God created. The end"
+        assert split_offsets(text) == (18, 31)
+        # Commas only count when there is no clause break
+        assert split_offsets("one, two, three") == (5, 10)
+        assert split_offsets("no break here.") == ()
+    
+    def test_segment_span(self):
+        text = "one; two; three"
+        offsets = split_offsets(text)
+        assert segment_span(text, offsets, 0, 0) == (0, 4, "a")
+        assert segment_span(text, offsets, 1, 2) == (5, 15, "bc")
+        assert segment_span(text, offsets, 5, 5) == (10, 15, "c")
+    
+    def test_parse_verse_token(self):
+        assert parse_verse_token("19a") == (19, 0)
+        assert parse_verse_token(" 7 ") == (7, None)
+        with pytest.raises(ValueError):
+            parse_verse_token("end")
+    
+    def test_table_computes_once(self):
+        table = SegmentTable({"Gen": {"1": {"1": [3, 0, 3]}}})
+        assert table.offsets("Gen", "1", "1", "abc def") == (3,)
+        assert table.offsets("Gen", "1", "2", "a; b") == (3,)
+        assert table._offsets[("Gen", "1", "2")] == (3,)
+
+class TestExtractor:
+    """Test reference extraction from free text."""
+    
+    def setup_method(self):
+        self.extractor = ReferenceExtractor({
+            "Johannes": "Johannes", "Joh": "Johannes", "1 Johannes": "1 Johannes",
+            "1Johannes": "1 Johannes", "Psalmen": "Psalmen", "2 Koningen": "2 Koningen",
+            "Job": "Job",
+        })
+    
+    def test_automaton_finds_overlapping_aliases(self):
+        automaton = BookAutomaton({"he": "A", "she": "B", "hers": "C"})
+        assert list(automaton.matches("ushers")) == [(1, 4, "B"), (2, 4, "A"), (2, 6, "C")]
+    
+    def test_extract(self):
+        text = "Lees Joh. 3:16 en 1 Johannes 4:7–8, 12. Vgl. Psalmen 23:1, 2 Koningen 3:4 en Psalmen 1-2."
+        references = self.extractor.extract(text)
+        assert [r["reference"] for r in references] == [
+            "Johannes 3:16", "1 Johannes 4:7-8, 12", "Psalmen 23:1", "2 Koningen 3:4", "Psalmen 1:1-2:end",
+        ]
+        for reference in references:
+            assert text[reference["start"]:reference["end"]] == reference["text"]
+        assert references[0]["text"] == "Joh. 3:16"
+    
+    def test_extract_skips_words(self):
+        # Lowercase names, names inside words and names without a chapter are not references
+        text = "a job 3 times, Johannesburg 12, Johannes said, SJob 4"
+        assert self.extractor.extract(text) == []
+        assert len(self.extractor.extract("Job 1:1 Job 2:2", limit=1)) == 1
+    
+    def test_version_aliases(self):
+        version = {"data": {"Genesis": {}, "John": {}}}
+        aliases = version_aliases(version)
+        assert aliases["John"] == "John"
+        assert aliases["Gen"] == "Genesis"
+        assert aliases["Johannes"] == "John"
+        assert "Exodus" not in aliases
+    
+    @pytest.mark.parametrize("text, reference", [
+        ("zie Johannes 3:16", "Johannes 3:16"),
+        ("en 1 Kor. 13:4-7.", "1 Korinthe 13:4-7"),
+        ("Psalm 23", "Psalmen 23:1-end"),
+        ("Ps. 23:1", "Psalmen 23:1"),
+        ("Mt 5:3", "Mattheüs 5:3"),
+        ("John 3:16", "Johannes 3:16"),
+    ])
+    def test_dutch_names_and_abbreviations(self, text, reference):
+        records = [(name, "1", "1", "tekst") for name in DUTCH_NAMES]
+        extractor = ReferenceExtractor(version_aliases(build_version(records, "statenvertaling", {})))
+        assert [r["reference"] for r in extractor.extract(text)] == [reference]
+    
+    def test_references_parse(self):
+        records = [(name, str(chapter), str(verse), f"{name} {chapter}:{verse}")
+                   for name in DUTCH_NAMES for chapter in range(1, 9) for verse in range(1, 5)]
+        versions = {"statenvertaling": build_version(records, "statenvertaling", {})}
+        extractor = ReferenceExtractor(version_aliases(versions["statenvertaling"]))
+        parser = ReferenceParser(all_versions=versions, version="statenvertaling")
+        text = ("Lees Mattheüs 5-7, 1 Korinthe 3 en Hooglied 2. Zie ook Hoogl. 2:4-3:1, "
+                "1 Kor. 3:1-2, 4 en Joh 3:4.")
+        expected = [
+            [f"Mattheüs {chapter}:{verse}" for chapter in (5, 6, 7) for verse in range(1, 5)],
+            [f"1 Korinthe 3:{verse}" for verse in range(1, 5)],
+            [f"Hooglied 2:{verse}" for verse in range(1, 5)],
+            ["Hooglied 2:4", "Hooglied 3:1"],
+            ["1 Korinthe 3:1", "1 Korinthe 3:2", "1 Korinthe 3:4"],
+            ["Johannes 3:4"],
+        ]
+        found = []
+        for reference in extractor.extract(text):
+            result = parser.parse(reference["reference"])
+            assert result["parsed"], (reference, result.get("error"))
+            found.append([verse["text"] for verse in result["verses"]])
+        assert found == expected
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,287 @@
+"""
+Tests for the search index.
+
+Tests that index-backed searches return exactly what a full scan of
+the verse texts would return.
+"""
+
+import pytest
+import random
+import sys
+import os
+
+# Add the parent directory to the path so we can import search modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search.index import SearchIndex
+from search.normalize import DEFAULT_NORMALIZER, Normalizer, original_span
+from search.pattern import PatternError, compile_pattern, required_fragments
+from search.related import RelatedVerses
+from search.scope import intersect_ranges, merge_ranges, restrict, sample_scope
+
+VERSES = [
+    ("Genesis", "1", "1", "In den beginne schiep God den hemel en de aarde."),
+    ("Genesis", "1", "2", "De aarde nu was woest en ledig, en duisternis was op den afgrond."),
+    ("Psalmen", "23", "1", "Een psalm van David. De HEERE is mijn Herder, mij zal niets ontbreken."),
+    ("Johannes", "3", "16", "Want alzo lief heeft God de wereld gehad, dat Hij Zijn eniggeboren Zoon gegeven heeft."),
+]
+
+
+class TestSearchIndex:
+    """Test searching through posting lists."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+    
+    def scan(self, query):
+        return [i for i, verse in enumerate(VERSES) if query.lower() in verse[3].lower()]
+    
+    @pytest.mark.parametrize("query", [
+        "God", "god de", "heere is mijn", "aarde", "ard", "n den", ".", "e", "zoon gegeven", "niet gevonden",
+    ])
+    def test_matches_full_scan(self, query):
+        assert self.index.search(query) == self.scan(query)
+    
+    def test_result(self):
+        assert self.index.result(3) == {
+            "book": "Johannes",
+            "chapter": "3",
+            "verse": "16",
+            "text": VERSES[3][3],
+        }
+
+class TestMatchOffsets:
+    """Test match offsets and snippets computed from the index."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+    
+    def test_matches(self):
+        text = VERSES[1][3]
+        spans = self.index.matches(1, "WAS")
+        assert spans == [(text.index("was"), text.index("was") + 3), (text.rindex("was"), text.rindex("was") + 3)]
+        assert self.index.matches(1, "Hemel") == []
+    
+    def test_snippet_cuts_on_words(self):
+        spans = self.index.matches(1, "duisternis")
+        snippet = self.index.snippet(1, spans, context=2)
+        assert snippet["text"] == "\u2026ledig, en duisternis was op\u2026"
+        start, end = snippet["matches"][0]
+        assert snippet["text"][start:end] == "duisternis"
+    
+    def test_snippet_keeps_verse_edges(self):
+        spans = self.index.matches(0, "in den")
+        snippet = self.index.snippet(0, spans, context=1)
+        assert snippet == {"text": "In den beginne\u2026", "matches": [[0, 6]]}
+        spans = self.index.matches(0, "aarde.")
+        snippet = self.index.snippet(0, spans, context=0)
+        assert snippet["text"] == "\u2026aarde."
+        assert snippet["matches"] == [[1, 7]]
+    
+    def test_offsets_survive_length_changing_lowercase(self):
+        index = SearchIndex()
+        index.add("Handelingen", "1", "1", "\u0130stanbul en Antiochi\u00eb")
+        assert index.search("antiochië") == [0]
+        assert index.matches(0, "Antiochië") == [(12, 21)]
+
+class TestScope:
+    """Test searches limited to ranges of documents."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+    
+    def test_range_helpers(self):
+        assert merge_ranges([(5, 8), (0, 2), (2, 3), (7, 9), (4, 4)]) == [(0, 3), (5, 9)]
+        assert intersect_ranges([(0, 3), (5, 9)], [(2, 6), (8, 20)]) == [(2, 3), (5, 6), (8, 9)]
+        assert restrict([0, 1, 4, 5, 8, 12], [(1, 5), (8, 9)]) == [1, 4, 8]
+    
+    def test_book_range_and_doc_of(self):
+        assert self.index.book_range("Genesis") == (0, 2)
+        assert self.index.book_range("Openbaring") is None
+        assert self.index.doc_of("Genesis", "1", "2") == 1
+        assert self.index.doc_of("Johannes", "3", "16") == 3
+        assert self.index.doc_of("Genesis", "1", "3") is None
+    
+    @pytest.mark.parametrize("query", ["God", "de", ".", "aarde", "heere is mijn"])
+    def test_scoped_search_matches_filtered_scan(self, query):
+        scope = [(0, 1), (2, 4)]
+        expected = [doc for doc in self.index.search(query) if doc == 0 or 2 <= doc < 4]
+        assert self.index.search(query, scope) == expected
+    
+    def test_empty_scope(self):
+        assert self.index.search("God", []) == []
+    
+    def test_sample_scope(self):
+        scope = [(0, 3), (10, 12)]
+        docs = sample_scope(random.Random("ronde 1"), scope, 4)
+        assert len(set(docs)) == 4
+        assert all(0 <= doc < 3 or 10 <= doc < 12 for doc in docs)
+        assert sample_scope(random.Random("ronde 1"), scope, 4) == docs
+        assert sorted(sample_scope(random.Random(), scope, 10)) == [0, 1, 2, 10, 11]
+        assert len(sample_scope(random.Random(), [(4, 5)], 3, unique=False)) == 3
+        assert sample_scope(random.Random(), [], 3) == []
+
+class TestWordStats:
+    """Test per-word counts kept with the posting lists."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+    
+    def test_occurrences(self):
+        assert self.index.occurrences("den") == [(0, 2), (1, 1)]
+        assert self.index.occurrences("den", [(1, 4)]) == [(1, 1)]
+        assert self.index.occurrences("onbekend") == []
+    
+    def test_totals_match_verse_texts(self):
+        assert self.index.totals["god"] == 2
+        assert self.index.totals["de"] == 4
+        assert sum(self.index.totals.values()) == sum(len(verse[3].split()) for verse in VERSES)
+    
+    def test_scoped_counts(self):
+        counts = self.index.word_counts([(0, 2)])
+        assert counts["aarde"] == 2
+        assert counts["den"] == 3
+        assert "zoon" not in counts
+        assert self.index.verse_count("de") == 4
+        assert self.index.verse_count("de", [(2, 4)]) == 2
+
+class TestNormalize:
+    """Test accent-, case- and spelling-insensitive folding."""
+    
+    def test_fold(self):
+        fold = DEFAULT_NORMALIZER.fold
+        assert fold("Israël") == fold("ISRAEL") == "israel"
+        assert fold("De HEERE is mijn Herder") == "de heere is mijn herder"
+        assert fold("Zoo lief") == "zoo lief"
+    
+    def test_variants(self):
+        assert DEFAULT_NORMALIZER.variants("here") == ("here", "heere")
+        assert DEFAULT_NORMALIZER.variants("heere") == ("heere", "here")
+        assert DEFAULT_NORMALIZER.variants("heer") == ("heer",)
+        assert DEFAULT_NORMALIZER.spelling_regex("zoon") is None
+    
+    def test_offsets_point_into_original(self):
+        text = "Straße, zoo sprak de HEERE tot Ezechiël"
+        folded, offsets = DEFAULT_NORMALIZER.fold_with_offsets(text)
+        assert folded == DEFAULT_NORMALIZER.fold(text)
+        for word, original in [("strasse", "Straße"), ("zoo", "zoo"), ("heere", "HEERE"), ("ezechiel", "Ezechiël")]:
+            start = folded.index(word)
+            begin, end = original_span(offsets, start, start + len(word))
+            assert text[begin:end] == original
+    
+    def test_custom_spelling_map(self):
+        normalizer = Normalizer({"zeide": "zei", "zoo": "zoo"})
+        assert normalizer.variants("zei") == ("zei", "zeide")
+        assert normalizer.variants("zoo") == ("zoo",)
+    
+    def test_search_ignores_accents_and_spelling(self):
+        index = SearchIndex()
+        index.add("Genesis", "32", "28", "Gij zult niet meer Jakob heten, maar Israël.")
+        index.add("Psalmen", "23", "1", "De HEERE is mijn Herder.")
+        assert index.search("israel") == [0]
+        assert index.search("Here is") == [1]
+        assert index.matches(1, "here") == [(3, 8)]
+        snippet = index.snippet(1, index.matches(1, "here"), context=0)
+        assert snippet == {"text": "\u2026HEERE\u2026", "matches": [[1, 6]]}
+    
+    def test_prefix_of_old_spelling(self):
+        index = SearchIndex()
+        index.add("Psalmen", "23", "1", "De HEERE is mijn Herder.")
+        index.add("Genesis", "6", "7", "Ik zal den mensch verdelgen, van den mensch tot het vee.")
+        index.add("Genesis", "6", "1", "Het geschiedde nu, als de menschen begonnen te vermenigvuldigen.")
+        index.add("Psalmen", "8", "5", "Wat is de mens, dat Gij zijner gedenkt?")
+        assert index.search("Heer") == [0]
+        assert index.search("mensche") == [2]
+        assert index.search("mens") == [1, 2, 3]
+        assert index.search("mensen") == [2]
+        assert index.search("zoo") == []
+        assert index.matches(1, "mens") == [(11, 17), (37, 43)]
+        assert index.occurrences("mens") == [(1, 2), (3, 1)]
+
+class TestPattern:
+    """Test regular expression and wildcard searches."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+    
+    def scan(self, pattern):
+        return [doc for doc in range(len(self.index)) if pattern.regex.search(self.index.folded_text(doc))]
+    
+    @pytest.mark.parametrize("query, wildcard", [
+        ("Heere.*Herder", False), ("d(e|en) a", False), ("^de", False), ("\\bgod\\b", False),
+        ("aard*", True), ("ge?even", True), ("*ed*", True),
+    ])
+    def test_pattern_search_matches_full_scan(self, query, wildcard):
+        pattern = compile_pattern(query, wildcard)
+        assert self.index.pattern_search(pattern) == (self.scan(pattern), False)
+    
+    def test_required_fragments(self):
+        assert required_fragments("here.*israel") == ["here", "israel"]
+        assert required_fragments("ab?c(de)+f") == ["a", "c", "f"]
+        assert required_fragments("god|here") == []
+        assert compile_pattern("zalig*", wildcard=True).regex.pattern == "\\bzalig\\w*\\b"
+    
+    def test_words_containing(self):
+        assert sorted(self.index.words_containing("aard")) == ["aarde"]
+        assert sorted(self.index.words_containing("ee")) == ["een", "heeft", "heere"]
+    
+    def test_pattern_matches(self):
+        pattern = compile_pattern("HEERE is", normalizer=self.index.normalizer)
+        assert self.index.pattern_matches(2, pattern) == [(24, 32)]
+    
+    def test_limit_and_budget(self):
+        pattern = compile_pattern("e")
+        assert self.index.pattern_search(pattern, limit=2) == ([0, 1], False)
+        assert self.index.pattern_search(pattern, budget=-1) == ([], True)
+    
+    @pytest.mark.parametrize("query", [
+        "(a+)+", "(x*y)*", "[", "a" * 201, "(.|\\w)*#", "(a|ab)*c", ".*.*x", "(\\w+\\s?)*",
+        "\\w*\\d+", "( ? ){2,}", "[ab]+(b*|c)?#", ".*e.*e.*e.*e.*e.*e.*e.*eq", ".*e.*e.*eq",
+        "(a|b)+.(a|c)+#[ab]*",
+    ])
+    def test_rejected_patterns(self, query):
+        with pytest.raises(PatternError):
+            compile_pattern(query)
+    
+    @pytest.mark.parametrize("query", ["(ab|cd)*", "\\w+\\s+\\w+", "a.*b.*c", "Heere.*Israël"])
+    def test_accepted_patterns(self, query):
+        compile_pattern(query)
+    
+    def test_group_prefixes_are_not_folded(self):
+        pattern = compile_pattern("(?P<W>Heere) (?P=W)")
+        assert pattern.regex.pattern == "(?P<W>heere) (?P=W)"
+        assert pattern.regex.search("de heere heere").group("W") == "heere"
+
+class TestRelated:
+    """Test related verses by TF-IDF similarity."""
+    
+    def setup_method(self):
+        self.index = SearchIndex()
+        for verse in VERSES:
+            self.index.add(*verse)
+        self.index.add("Genesis", "1", "3", "En God zeide: Daar zij licht op de aarde.")
+    
+    def test_related(self):
+        related = RelatedVerses(self.index, max_df=0.6)
+        results = related.related(self.index, 0, k=2)
+        assert [doc for doc, _ in results] == [1, 4]
+        assert 0 < results[1][1] < results[0][1] <= 1
+        assert all(doc != 0 for doc, _ in related.related(self.index, 0, k=10))
+    
+    def test_common_words_are_ignored(self):
+        related = RelatedVerses(self.index, max_df=0.6)
+        assert "de" not in related.idf
+        assert related.related(self.index, 2, k=3) == []
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,237 @@
+"""
+Tests for the server caches and warmup.
+
+Tests the LRU cache, harvesting popular requests from access logs,
+replaying them through warmers, saving caches between restarts and
+serving the static site.
+"""
+
+import pytest
+import sys
+import os
+import pickle
+import threading
+
+# Add the parent directory to the path so we can import server modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from corpus.snapshot import CorpusSnapshot
+from server.cache import LRUCache, snapshot_cache
+from server import disk_cache
+from server.disk_cache import EVICT_CHECK_EVERY, DiskCache, cache_key
+from server.static import IMMUTABLE, StaticSite
+from server import warmup
+from server.warmup import harvest, load_caches, read_warmup_file, replay, save_caches
+
+
+class TestLRUCache:
+    """Test the in-memory LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get("b", "missing") == "missing"
+        assert len(cache) == 2
+
+    def test_snapshot_cache_is_per_snapshot(self):
+        first = CorpusSnapshot({}, 1, "a" * 64)
+        second = CorpusSnapshot({}, 2, "b" * 64)
+        snapshot_cache(first, "chapters", 10).put("key", b"body")
+        assert snapshot_cache(first, "chapters", 10).get("key") == b"body"
+        assert snapshot_cache(second, "chapters", 10).get("key") is None
+
+
+class TestWarmup:
+    """Test harvesting, replaying and persisting warm caches."""
+
+    def test_harvest_counts_both_log_formats(self):
+        lines = [
+            "2025-01-01 10:00:00,000 INFO Request: 1.2.3.4 /api/chapter?book=Genesis&chapter=1",
+            "2025-01-01 10:00:01,000 INFO Request: 1.2.3.5 /api/chapter?book=Genesis&chapter=1",
+            '5.6.7.8:1234 - "GET /api/search?query=liefde HTTP/1.1" 200',
+            '5.6.7.8:1234 - "GET /api/search?query=liefde HTTP/1.1" 200',
+            '5.6.7.8:1234 - "GET /api/search?query=liefde HTTP/1.1" 200',
+            "2025-01-01 10:00:02,000 INFO Request: 1.2.3.4 /site/index.html",
+            '5.6.7.8:1234 - "POST /api/parse/references HTTP/1.1" 200',
+        ]
+        assert harvest(lines) == ["/api/search?query=liefde", "/api/chapter?book=Genesis&chapter=1"]
+        assert harvest(lines, limit=1) == ["/api/search?query=liefde"]
+
+    def test_read_warmup_file(self, tmp_path):
+        path = tmp_path / "warmup.txt"
+        path.write_text("# popular\n/api/search?query=God\n\n/api/chapter?book=Ruth&chapter=1\n")
+        assert read_warmup_file(str(path)) == ["/api/search?query=God", "/api/chapter?book=Ruth&chapter=1"]
+        assert read_warmup_file(str(tmp_path / "missing.txt")) == []
+
+    def test_replay(self):
+        snapshot = CorpusSnapshot({}, 1, "a" * 64)
+        seen = []
+
+        def search(snapshot, path, params):
+            seen.append(params["query"])
+
+        def parse(snapshot, path, params):
+            if "fout" in path:
+                raise ValueError("not a reference")
+            seen.append(path)
+
+        warmers = {"/api/search": search, "/api/parse/reference/": parse}
+        targets = [
+            "/api/search?query=in%20den%20beginne",
+            "/api/parse/reference/Genesis%201:1",
+            "/api/parse/reference/fout",
+            "/api/chapter?book=Ruth&chapter=1",
+        ]
+        assert replay(snapshot, targets, warmers) == 2
+        assert seen == ["in den beginne", "/api/parse/reference/Genesis 1:1"]
+        assert replay(snapshot, targets, warmers, budget=-1) == 0
+
+    def test_save_and_load_caches(self, tmp_path):
+        path = str(tmp_path / "caches.pickle")
+        snapshot = CorpusSnapshot({}, 3, "a" * 64)
+        snapshot_cache(snapshot, "chapters", 5).put(("statenvertaling", "Ruth", "1"), b"{}")
+        snapshot_cache(snapshot, "search", 5).put("god", [1, 2, 3])
+        assert save_caches(snapshot, path) == 2
+
+        restarted = CorpusSnapshot({}, 1, "a" * 64)
+        assert load_caches(restarted, path)
+        assert restarted.caches["search"].get("god") == [1, 2, 3]
+        assert restarted.caches["chapters"].maxsize == 5
+
+        changed = CorpusSnapshot({}, 1, "b" * 64)
+        assert not load_caches(changed, path)
+        assert changed.caches == {}
+        assert not load_caches(changed, str(tmp_path / "missing.pickle"))
+
+    def test_caches_from_other_code_are_ignored(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "caches.pickle")
+        snapshot = CorpusSnapshot({}, 3, "a" * 64)
+        snapshot_cache(snapshot, "search", 5).put("god", [1, 2, 3])
+        save_caches(snapshot, path)
+        monkeypatch.setattr(warmup, "CACHE_FORMAT", warmup.CACHE_FORMAT + 1)
+        assert not load_caches(CorpusSnapshot({}, 1, "a" * 64), path)
+        monkeypatch.undo()
+        monkeypatch.setattr(warmup, "code_fingerprint", lambda: "0" * 64)
+        assert not load_caches(CorpusSnapshot({}, 1, "a" * 64), path)
+
+    def test_unreadable_caches_are_a_miss(self, tmp_path):
+        path = tmp_path / "caches.pickle"
+        path.write_bytes(b"\x80\x05truncated")
+        snapshot = CorpusSnapshot({}, 1, "a" * 64)
+        assert not load_caches(snapshot, str(path))
+        # A class that cannot be found when unpickling
+        path.write_bytes(b"cmissing\nCache\n.")
+        assert not load_caches(snapshot, str(path))
+        path.write_bytes(pickle.dumps({"caches": {}}))
+        assert not load_caches(snapshot, str(path))
+        assert snapshot.caches == {}
+
+
+class TestDiskCache:
+    """Test the shared on-disk response cache."""
+
+    def test_cache_key_normalizes_params(self):
+        first = cache_key("f" * 64, "chapter", {"book": "Ruth", "chapter": "1", "version": None})
+        second = cache_key("f" * 64, "chapter", {"chapter": "1", "book": "Ruth"})
+        assert first == second
+        assert first != cache_key("e" * 64, "chapter", {"chapter": "1", "book": "Ruth"})
+
+    def test_code_change_misses(self, tmp_path, monkeypatch):
+        cache = DiskCache(str(tmp_path / "responses.sqlite"), 1024 * 1024)
+        params = {"book": "Ruth", "chapter": "1"}
+        monkeypatch.setattr(disk_cache, "code_fingerprint", lambda: "0" * 64)
+        cache.put(cache_key("f" * 64, "chapter", params), b"{}")
+        assert cache.get(cache_key("f" * 64, "chapter", params)) == b"{}"
+        monkeypatch.setattr(disk_cache, "code_fingerprint", lambda: "1" * 64)
+        assert cache.get(cache_key("f" * 64, "chapter", params)) is None
+        cache.close()
+
+    def test_get_and_put(self, tmp_path):
+        path = str(tmp_path / "responses.sqlite")
+        cache = DiskCache(path, 1024 * 1024)
+        assert cache.get("a") is None
+        assert cache.put("a", b'{"text":"In den beginne"}') == b'{"text":"In den beginne"}'
+        # A second process (here: a second handle) sees the same entries
+        other = DiskCache(path, 1024 * 1024)
+        assert other.get("a") == b'{"text":"In den beginne"}'
+        cache.close()
+        other.close()
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        cache = DiskCache(str(tmp_path / "responses.sqlite"), 1000)
+        for number in range(10):
+            cache.put(f"key{number}", bytes(100))
+        assert cache.size() == 1000
+        assert cache.evict() == 0
+        cache.put("key10", bytes(100))
+        assert cache.evict() == 2
+        assert cache.size() == 900
+        assert cache.get("key0") is None
+        assert cache.get("key1") is None
+        assert cache.get("key10") is not None
+        cache.close()
+
+    def test_eviction_check_counts_writes_of_all_threads(self, tmp_path, monkeypatch):
+        cache = DiskCache(str(tmp_path / "responses.sqlite"), 1024 * 1024)
+        checks = []
+        monkeypatch.setattr(cache, "evict", lambda: checks.append(1))
+
+        def write(thread):
+            for number in range(EVICT_CHECK_EVERY):
+                cache.put(f"{thread}-{number}", b"{}")
+            cache.close()
+
+        threads = [threading.Thread(target=write, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(checks) == 8
+
+
+class TestStaticSite:
+    """Test the in-memory static site."""
+
+    def make_site(self, tmp_path):
+        (tmp_path / "css").mkdir()
+        (tmp_path / "css" / "style.css").write_text("body { color: black; }\n" * 50)
+        (tmp_path / "index.html").write_text(
+            '<link href="/site/css/style.css"><script src="script.js"></script><a href="https://x/script.js">')
+        (tmp_path / "script.js").write_text("console.log('x');")
+        return StaticSite(str(tmp_path))
+
+    def test_fingerprinted_links(self, tmp_path):
+        site = self.make_site(tmp_path)
+        style, script = site.assets["css/style.css"], site.assets["script.js"]
+        assert style.hashed_name == f"css/style.{style.digest}.css"
+        html = site.assets["index.html"].body.decode("utf-8")
+        assert f'href="/site/{style.hashed_name}"' in html
+        assert f'src="/site/{script.hashed_name}"' in html
+        assert 'href="https://x/script.js"' in html
+        assert site.lookup(style.hashed_name) == (style, True)
+        assert site.lookup("css/style.css") == (style, False)
+        assert site.lookup("missing.js") == (None, False)
+
+    def test_respond(self, tmp_path):
+        site = self.make_site(tmp_path)
+        style = site.assets["css/style.css"]
+        status, body, headers = site.respond(style, True, "gzip, br")
+        assert status == 200 and headers["Content-Encoding"] == "gzip" and len(body) < len(style.body)
+        assert headers["Cache-Control"] == IMMUTABLE
+        status, body, headers = site.respond(style, False)
+        assert body == style.body and "Content-Encoding" not in headers and headers["Cache-Control"] == "no-cache"
+        assert site.respond(style, False, "", f'"other", W/{style.etag}')[:2] == (304, b"")
+        # Too small to gain from compression
+        assert site.assets["script.js"].gzip_body is None
+
+    def test_missing_directory(self, tmp_path):
+        assert StaticSite(str(tmp_path / "missing")).assets == {}
+
+if __name__ == "__main__":
+    pytest.main([__file__])